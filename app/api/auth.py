@@ -1,23 +1,53 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Depends, Header
 from sqlalchemy.orm import Session
 from app import crud
 from app.database import get_db
 from app.services import auth
+from app.services.hashing import HasherBusy
 from app.schemas.auth import RefreshTokenRequest, UserLogin, RefershToken
 from app.schemas.user import UserAuthResponse
 
 router = APIRouter()
 
 
+@router.get("/token-cache/stats")
+def token_cache_stats():
+    return auth.token_cache.stats()
+
+
+@router.get("/password-hasher/stats")
+def password_hasher_stats():
+    return auth.password_hasher.stats()
+
+
 @router.post("/login/", response_model=UserAuthResponse)
 async def login(login_data: UserLogin, db: Session = Depends(get_db)):
-    user = crud.get_user_by_email(db, email=login_data.email)
+    # The session is sync, its queries run off the event loop
+    user = await asyncio.to_thread(crud.get_user_by_email, db, login_data.email)
 
-    if user is None or not auth.verify_password(
-        login_data.password, user.hashed_password
-    ):
+    if user is None:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
+    try:
+        is_valid, new_hash = await auth.password_hasher.verify_and_update(
+            login_data.password, user.hashed_password
+        )
+    except HasherBusy:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    if not is_valid:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+
+    # The work factor changed since this hash was made
+    if new_hash:
+        await asyncio.to_thread(crud.update_password_hash, db, user, new_hash)
+
     access_token = auth.create_access_token({"username": user.username, "id": user.id})
     refresh_token = auth.create_refresh_token(
         {"username": user.username, "id": user.id}
@@ -1,15 +1,172 @@
-from fastapi import APIRouter
+import asyncio
+import io
+from typing import List, Optional, Tuple
 
-# from app.services.stockfish import get_best_move
+import chess
+import chess.pgn
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+import orjson
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_async_db
+from app.models.game import Game, GameMove
+from app.schemas.chess import GameAnalysisRequest
+from app.services.analysis_cache import AnalysisCache, DiskTier
+from app.services.engine import EngineBusy, EnginePool, EngineUnavailable
+from app.services.game_review import review_game
+from app.utils.chess import decode_move
 
 router = APIRouter()
 
+# How often a request waiting on the engine checks its client is still there
+DISCONNECT_POLL_SECONDS = 0.1
+
+engine_pool = EnginePool(
+    settings.ENGINE_PATH,
+    size=settings.ENGINE_PROCESSES,
+    options={"Hash": settings.ENGINE_HASH_MB},
+    max_queue=settings.ENGINE_QUEUE_SIZE,
+    default_depth=settings.ENGINE_DEFAULT_DEPTH,
+    max_depth=settings.ENGINE_MAX_DEPTH,
+    max_time_ms=settings.ENGINE_MAX_TIME_MS,
+)
+
+analysis_cache = AnalysisCache(
+    engine_pool.analyse,
+    max_size=settings.ANALYSIS_CACHE_SIZE,
+    disk=(
+        DiskTier(settings.ANALYSIS_CACHE_PATH, settings.ANALYSIS_DISK_CACHE_SIZE)
+        if settings.ANALYSIS_CACHE_PATH
+        else None
+    ),
+)
+
+
+async def run_until_disconnected(request: Request, coroutine):
+    # Starlette keeps running a handler whose client left, so a search nobody
+    # waits for anymore is cancelled here and its engine freed
+    task = asyncio.ensure_future(coroutine)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        task.cancel()
+
+
+def parse_board(fen: str) -> chess.Board:
+    try:
+        board = chess.Board(fen)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid FEN")
+    if not board.is_valid():
+        raise HTTPException(status_code=400, detail="Illegal position")
+    return board
+
 
 @router.get("/game")
-async def game(board: str):
+async def game(
+    request: Request,
+    board: str,
+    depth: Optional[int] = Query(None, ge=1),
+    movetime: Optional[int] = Query(None, ge=1, description="Milliseconds"),
+):
+    position = parse_board(board)
     try:
-        # best_move = await get_best_move(board)
-        return {"best_move": "best_move"}
-    except Exception as e:
-        print(e)
-        return {"error": str(e)}
+        analysis = await run_until_disconnected(
+            request,
+            analysis_cache.analyse(position, engine_pool.limit(depth, movetime)),
+        )
+    except EngineBusy:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    except EngineUnavailable:
+        raise HTTPException(status_code=503, detail="Engine unavailable")
+
+    return analysis
+
+
+def read_pgn(pgn: str) -> Tuple[chess.Board, List[chess.Move]]:
+    game = chess.pgn.read_game(io.StringIO(pgn))
+    if game is None or game.errors:
+        raise HTTPException(status_code=400, detail="Invalid PGN")
+    return game.board(), list(game.mainline_moves())
+
+
+async def read_stored_game(
+    db: AsyncSession, game_id: int
+) -> Tuple[chess.Board, List[chess.Move]]:
+    if await db.get(Game, game_id) is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    # Games are played from the standard position, moves land in the journal
+    codes = await db.scalars(
+        select(GameMove.move).where(GameMove.game_id == game_id).order_by(GameMove.ply)
+    )
+    replay = chess.Board()
+    moves = []
+    for code in codes:
+        move = chess.Move.from_uci(decode_move(code))
+        if not replay.is_legal(move):
+            raise HTTPException(status_code=422, detail="Stored moves do not replay")
+        replay.push(move)
+        moves.append(move)
+    return chess.Board(), moves
+
+
+@router.post("/analysis")
+async def analyse_game(
+    analysis_request: GameAnalysisRequest, db: AsyncSession = Depends(get_async_db)
+):
+    """Streams the review of a whole game as NDJSON, one line per ply as its
+    positions are analysed and a summary line last."""
+    if (analysis_request.pgn is None) == (analysis_request.game_id is None):
+        raise HTTPException(status_code=400, detail="Send either a PGN or a game_id")
+    if not engine_pool.engines:
+        raise HTTPException(status_code=503, detail="Engine unavailable")
+
+    if analysis_request.pgn is not None:
+        board, moves = read_pgn(analysis_request.pgn)
+    else:
+        board, moves = await read_stored_game(db, analysis_request.game_id)
+    if len(moves) > settings.ANALYSIS_MAX_PLIES:
+        raise HTTPException(status_code=400, detail="Game is too long to analyse")
+
+    reviews = review_game(
+        analysis_cache.analyse,
+        board,
+        moves,
+        engine_pool.limit(analysis_request.depth, analysis_request.movetime),
+        concurrency=engine_pool.size,
+    )
+
+    async def lines():
+        try:
+            async for review in reviews:
+                yield orjson.dumps(review) + b"\n"
+        except (EngineBusy, EngineUnavailable):
+            # The status is already sent, the error goes in the stream
+            yield orjson.dumps({"error": "Engine unavailable"}) + b"\n"
+        finally:
+            await reviews.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/engine/stats")
+async def engine_stats():
+    return engine_pool.stats()
+
+
+@router.get("/analysis-cache/stats")
+async def analysis_cache_stats():
+    return analysis_cache.stats()
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 from itertools import islice
 import logging
@@ -5,8 +6,9 @@ import random
 import chess
 from fastapi import Depends, FastAPI, WebSocket, WebSocketDisconnect, APIRouter
 from typing import Dict, List, Set, Optional, TypedDict
-from requests import Session
-from app.database import SessionLocal, get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import AsyncSessionLocal
 from app import crud
 import time
 from contextlib import asynccontextmanager
@@ -14,13 +16,41 @@ from app.utils.chess import (
     get_default_battle_rules,
     get_opposite_color,
     get_random_color,
+    play_move,
+    timeout_reason,
 )
 from app.models.game import Battle, ColorAttachMode, Game, create_battle, create_game
-
-logging.basicConfig(level=logging.DEBUG)
+from app.models.room import PlayerClock, Room
+from app.services.board_pool import BoardProcessPool, BoardWorkerExited, RoomState
+from app.services.bus import MessageBus, create_bus
+from app.services.clock import ClockScheduler
+from app.services.cluster import HashRing, RemoteWebSocket
+from app.services.connection import OutboundConnection
+from app.services.encoding import (
+    BINARY_SUBPROTOCOL,
+    JSON,
+    BinaryEncoder,
+    EncodedWebSocket,
+    Frame,
+    get_encoder,
+)
+from app.services.journal import MoveJournal
+from app.services.auth import verify_websocket_user
+from app.services.matchmaking import MatchmakingQueues, RatingMatchmaker
+from app.services.reaper import IdleReaper
+from app.services.recovery import RoomCheckpointer
+from app.services.spectators import SpectatorHub
 
 logger = logging.getLogger(__name__)
 
+# Fixed replies, encoded once per encoding for the life of the process
+GAME_NOT_FOUND = Frame({"message": "Game not found."})
+GAME_NOT_STARTED = Frame({"message": "Game not started. Waiting for player."})
+INVALID_MESSAGE = Frame(
+    {"message": "Invalid message format. 'move' and 'room_id' are required."}
+)
+PONG = Frame({"op": "pong"})
+
 
 class BroadcastData(TypedDict):
     fen: str
@@ -29,8 +59,56 @@ class BroadcastData(TypedDict):
 
 class ChessRoomManager:
     def __init__(self):
-        self.rooms = {}
+        self.rooms: Dict[str, Room] = {}
         self.user_connections = {}
+        # Open challenges created with op=create, joined first come first served
+        self.matchmaking = MatchmakingQueues()
+        # Players searching with op=search, paired by rating on each tick
+        self.rating_matchmaker = RatingMatchmaker(
+            base_window=settings.MATCHMAKING_BASE_WINDOW,
+            widen_per_second=settings.MATCHMAKING_WIDEN_PER_SECOND,
+            max_window=settings.MATCHMAKING_MAX_WINDOW,
+        )
+        self.journal = MoveJournal(
+            flush_interval=settings.JOURNAL_FLUSH_SECONDS,
+            max_buffer=settings.JOURNAL_MAX_BUFFER,
+            durability=settings.JOURNAL_DURABILITY,
+            max_backlog=settings.JOURNAL_MAX_BACKLOG,
+        )
+        self.checkpointer = RoomCheckpointer(
+            settings.CHECKPOINT_PATH, interval=settings.CHECKPOINT_SECONDS
+        )
+        self.spectators = SpectatorHub(
+            shard_size=settings.SPECTATOR_SHARD_SIZE,
+            backlog=settings.SPECTATOR_BACKLOG,
+            send_timeout=settings.SPECTATOR_SEND_TIMEOUT,
+        )
+        # With BOARD_PROCESSES set, boards of started games live in worker
+        # processes and the event loop only does I/O
+        self.board_pool = (
+            BoardProcessPool(settings.BOARD_PROCESSES, self.board_state)
+            if settings.BOARD_PROCESSES
+            else None
+        )
+        # Flag deadlines of the side to move in every local room
+        self.clocks = ClockScheduler(self.flag_room)
+        self.reaper = IdleReaper(room_idle_after=settings.ROOM_IDLE_SECONDS)
+
+        # With CLUSTER_NODES set, every room lives on ring.owner(room_id) and
+        # the other nodes forward to it over the message bus
+        cluster_nodes = [node for node in settings.CLUSTER_NODES.split(",") if node]
+        self.ring = HashRing(cluster_nodes) if cluster_nodes else None
+        self.bus: Optional[MessageBus] = None
+        self.node_id = settings.NODE_ID or "local"
+        # room_id -> node holding the rating pool a local room seeks in
+        self.seek_nodes: Dict[str, str] = {}
+        # room_id -> node holding the socket of a seeker in the local pool
+        self.seeker_nodes: Dict[str, str] = {}
+        # room_id -> other nodes with spectators of a local room
+        self.remote_spectators: Dict[str, Set[str]] = {}
+        # Fire and forget tasks, referenced until done so they are not
+        # garbage collected mid-flight
+        self.background: Set[asyncio.Task] = set()
 
     async def create_room(
         self,
@@ -51,32 +129,23 @@ class ChessRoomManager:
 
         self.remove_created_room(user_id)
 
-        board = chess.Board(fen)
-
-        room = {
-            "connect_status": "pending",
-            "battle_id": None,
-            "is_rating": is_rating,
-            "game_type": game_type,
-            "games_count": games_count,
-            "opponent_time": opponent_time,
-            "opponent_increment": opponent_increment,
-            "color_attach_mode": color_attach_mode,
-            "with_armaghedon": with_armaghedon,
-            "active_board": {
-                "game_id": None,
-                "board": board,
-                "fen": board.fen(),
-                "white": None,
-                "black": None,
-                "moves": [],
-                "start_time": datetime.now().timestamp(),
-            },
-            "players": {user_id: {"time": player_time, "increment": player_increment}},
-            "messages": [],
-        }
+        room = Room.create(
+            user_id,
+            game_type,
+            is_rating,
+            games_count,
+            player_time,
+            player_increment,
+            opponent_time,
+            opponent_increment,
+            color_attach_mode,
+            with_armaghedon,
+            fen,
+        )
 
         self.rooms[user_id] = room
+        self.reaper.touch_room(user_id, time.time())
+        self.matchmaking.push(game_type, user_id)
 
         game = self.get_game_preview(room, user_id, user_id)
 
@@ -90,7 +159,7 @@ class ChessRoomManager:
 
     async def connect_with_room_id(
         self,
-        db: Session,
+        db: AsyncSession,
         websocket: WebSocket,
         user_id: str,
         room_id: Optional[str],
@@ -108,7 +177,7 @@ class ChessRoomManager:
 
     async def connect_by_game_type(
         self,
-        db: Session,
+        db: AsyncSession,
         websocket: WebSocket,
         user_id: str,
         game_type: Optional[str],
@@ -116,7 +185,8 @@ class ChessRoomManager:
         await websocket.accept()
 
         if game_type:
-            # Check if room exists and is in 'pending player' status
+            # Open challenges of this type are joined directly, otherwise the
+            # player waits in the rating pool until the next matchmaking tick
             room_id = self.find_pending_room(game_type)
 
             if room_id in self.rooms:
@@ -124,39 +194,15 @@ class ChessRoomManager:
             else:
                 self.remove_created_room(user_id)
 
-                board = chess.Board()
-
                 default_room_values = get_default_battle_rules(game_type)
 
-                room = {
-                    "connect_status": "pending",
-                    "battle_id": None,
-                    "is_rating": False,
-                    "game_type": game_type,
-                    "games_count": 1,
-                    "opponent_time": default_room_values["opponent_time"],
-                    "opponent_increment": default_room_values["opponent_increment"],
-                    "color_attach_mode": "random",
-                    "with_armaghedon": False,
-                    "active_board": {
-                        "game_id": None,
-                        "board": board,
-                        "fen": board.fen(),
-                        "white": None,
-                        "black": None,
-                        "moves": [],
-                        "start_time": datetime.now().timestamp(),
-                    },
-                    "players": {
-                        user_id: {
-                            "time": default_room_values["player_time"],
-                            "increment": default_room_values["player_increment"],
-                        }
-                    },
-                    "messages": [],
-                }
+                room = Room.create(user_id, game_type, **default_room_values)
+
+                rating = await crud.get_user_rating(db, user_id, game_type)
 
                 self.rooms[user_id] = room
+                self.reaper.touch_room(user_id, time.time())
+                await self.add_seek(game_type, user_id, rating)
 
                 game = self.get_game_preview(room, user_id, user_id)
 
@@ -177,137 +223,323 @@ class ChessRoomManager:
     ):
 
         if not room_id or room_id not in self.rooms:
-            await websocket.send_json({"message": "Game not found."})
+            await websocket.send_json(GAME_NOT_FOUND)
             return
 
         # Retrieve the current room's game state
         room = self.rooms[room_id]
-        if room["connect_status"] == "pending":
+        if room.connect_status == "pending":
+            await websocket.send_json(GAME_NOT_STARTED)
+            return
+
+        active_board = room.active_board
+        board = active_board.board
+
+        if room.connect_status == "finished":
             await websocket.send_json(
-                {"message": "Game not started. Waiting for player."}
+                {"message": "Game is over.", "op": "move", "fen": active_board.fen}
             )
             return
 
-        board = room["active_board"]["board"]
-
         # Determine current player's turn
-        turn_color = "white" if board.turn == chess.WHITE else "black"
+        turn_color = active_board.turn_color()
 
-        player_id = room["active_board"][turn_color]
+        player_id = active_board.player_id(turn_color)
 
         if user_id and user_id != player_id:
             await websocket.send_json(
                 {
                     "message": "Not your turn!",
                     "op": "move",
-                    "fen": board.fen(),
+                    "fen": active_board.fen,
                 }
             )
             return
 
+        # The clock is read before anything else, a move that arrives after
+        # the deadline loses on time even if the timer task has not run yet
+        played_at = datetime.now().timestamp()
+        clock = room.players[player_id]
+        remaining = clock.remaining - (played_at - active_board.turn_started)
+        if remaining <= 0:
+            await self.flag_room(room_id)
+            return
+
         try:
             # Try to create a chess move from UCI notation
             chess_move = chess.Move.from_uci(move)
-
-            # Check if the move is legal
-            if chess_move in board.legal_moves:
-                board.push(chess_move)  # Make the move
-
-                # Broadcast the move to other players in the room
-                room["active_board"]["moves"].append(
-                    {
-                        "move": move,
-                        "color": turn_color,
-                        "time": datetime.now().timestamp(),
-                    }
-                )
-
-                room["active_board"]["fen"] = board.fen()
-
-                game_over_reason = None
-
-                if board.is_checkmate():
-                    game_over_reason = "Checkmate! Game Over."
-                elif board.is_stalemate():
-                    game_over_reason = "Stalemate! The game is a draw."
-                elif board.is_insufficient_material():
-                    game_over_reason = "Draw! Insufficient material."
-                elif board.can_claim_fifty_moves():
-                    game_over_reason = "Draw! 50-move rule."
-                elif board.can_claim_threefold_repetition():
-                    game_over_reason = "Draw! Threefold repetition."
-
-                if game_over_reason:
-                    room["connect_status"] = "finished"
-                    await self.broadcast_move(
-                        room,
-                        board.fen(),
-                        room["active_board"]["moves"],
-                        game_over_reason,
-                    )
-                else:
-                    # Transmite mutarea către ceilalți jucători
-                    await self.broadcast_move(
-                        room, board.fen(), room["active_board"]["moves"], ""
-                    )
-            else:
-                await websocket.send_json(
-                    {
-                        "message": "Illegal move!",
-                        "op": "move",
-                        "fen": board.fen(),
-                    }
-                )
-
         except ValueError:
             await websocket.send_json(
                 {
                     "message": "Invalid move format. Use UCI (e.g., e2e4).",
                     "op": "move",
-                    "fen": board.fen(),
+                    "fen": active_board.fen,
                 }
             )
+            return
 
-    async def broadcast_move(self, room, fen: str, moves, game_over_reason):
-        for user_id in room["players"]:
-            websocket = self.get_websocket_by_user_id(user_id)
-            if websocket:
+        # Check the move against the legal moves cached after the previous ply
+        # and play it. The tracker also tells if it ended the game.
+        ply = len(active_board.moves)
+        if self.board_pool is None:
+            result = play_move(board, active_board.termination, chess_move, ply)
+        else:
+            try:
+                result = await self.board_pool.move(room_id, move, ply)
+            except BoardWorkerExited:
+                # Nothing was recorded, the player can send the move again
                 await websocket.send_json(
                     {
-                        "message": f"Moved {fen}",
+                        "message": "Move could not be played, try again.",
                         "op": "move",
-                        "fen": fen,
-                        "moves": moves,
-                        "gameOverReason": game_over_reason,
+                        "fen": active_board.fen,
                     }
                 )
+                return
+            # The clock may have run out while the worker was busy
+            if room.connect_status != "connected":
+                return
+
+        if result is None:
+            await websocket.send_json(
+                {
+                    "message": "Illegal move!",
+                    "op": "move",
+                    "fen": active_board.fen,
+                }
+            )
+            return
+
+        # The only FEN generated for this ply. Castling sent as king takes
+        # rook comes back as the king's move, which is what gets recorded.
+        game_over_reason, active_board.fen, move = result
+
+        clock.remaining = remaining + clock.increment
+
+        # Broadcast the move to other players in the room
+        active_board.moves.append(move, played_at)
+        self.reaper.touch_room(room_id, played_at)
+        move_record = active_board.moves[-1].to_dict()
+
+        if active_board.game_id:
+            await self.journal.append(
+                active_board.game_id,
+                len(active_board.moves),
+                move,
+                played_at,
+            )
+
+        if game_over_reason:
+            room.connect_status = "finished"
+            self.clocks.cancel(room_id)
+        else:
+            self.start_clock(room_id, room, played_at)
+
+        # Transmite mutarea către ceilalți jucători
+        await self.broadcast_move(
+            room, room_id, active_board.fen, move_record, game_over_reason or ""
+        )
+
+    def start_board(self, room_id: str, room: Room):
+        # Pending rooms only hold their start FEN, the board is built when
+        # the game starts, here or in a board worker
+        active_board = room.active_board
+        if self.board_pool is None:
+            if active_board.board is None:
+                active_board.load_board()
+            return
+
+        self.board_pool.open(
+            room_id, active_board.start_fen, active_board.moves.codes.tolist()
+        )
+        active_board.unload_board()
+
+    def board_state(self, room_id: str) -> Optional[RoomState]:
+        # What a restarted board worker needs to open a room again
+        room = self.rooms.get(room_id)
+        if room is None or room.active_board is None:
+            return None
+        active_board = room.active_board
+        return active_board.start_fen, active_board.moves.codes.tolist()
+
+    def start_clock(self, room_id: str, room: Room, now: float):
+        active_board = room.active_board
+        active_board.turn_started = now
+
+        player_id = active_board.player_id(active_board.turn_color())
+        self.clocks.schedule(room_id, now + room.players[player_id].remaining)
+
+    async def flag_room(self, room_id: str):
+        room = self.rooms.get(room_id)
+        if room is None or room.connect_status != "connected":
+            return
+
+        active_board = room.active_board
+        clock = room.players[active_board.player_id(active_board.turn_color())]
+
+        # The deadline may be stale if a move got in just before it
+        now = datetime.now().timestamp()
+        if clock.remaining - (now - active_board.turn_started) > 0:
+            self.start_clock(room_id, room, active_board.turn_started)
+            return
+
+        clock.remaining = 0
+        room.connect_status = "finished"
+        self.clocks.cancel(room_id)
+        self.reaper.touch_room(room_id, now)
+
+        if self.board_pool is None:
+            game_over_reason = timeout_reason(active_board.board)
+        else:
+            try:
+                game_over_reason = await self.board_pool.timeout_reason(room_id)
+            except BoardWorkerExited:
+                # Only the material on the board matters, the FEN is enough
+                game_over_reason = timeout_reason(chess.Board(active_board.fen))
+
+        await self.broadcast_move(
+            room, room_id, active_board.fen, None, game_over_reason
+        )
+
+    async def broadcast_move(
+        self, room, room_id: str, fen: str, move, game_over_reason
+    ):
+        # Only the new move is sent, "seq" is the ply number after it. Clients
+        # that notice a gap in "seq" ask for a snapshot with op=resync.
+        message = {
+            "message": f"Moved {fen}",
+            "op": "move",
+            "roomId": room_id,
+            "fen": fen,
+            "move": move,
+            "seq": len(room.active_board.moves),
+            "clocks": self.get_clocks(room),
+            "gameOverReason": game_over_reason,
+        }
+
+        # Encoded at most once per encoding, players speaking the same one and
+        # all spectators share the payload
+        frame = Frame(message)
+
+        # Frames are queued per connection and written by each connection's
+        # own writer task, so a slow player never holds up the opponent
+        for user_id in room.players:
+            connection = self.get_connection(user_id)
+            if connection:
+                connection.send(frame, room_id)
+
+        if self.spectators.has_spectators(room_id) or room_id in self.remote_spectators:
+            text = frame.encode(JSON)
+            self.spectators.publish(room_id, text)
+            await self.publish_to_remote_spectators(room_id, text)
+
+    async def send_snapshot(
+        self, websocket: WebSocket, room_id: Optional[str], user_id: str
+    ):
+        snapshot = self.get_snapshot(room_id, user_id)
+        if snapshot is None:
+            await websocket.send_json(GAME_NOT_FOUND)
+            return
+
+        await websocket.send_json(snapshot)
+
+    def get_snapshot(self, room_id: Optional[str], user_id: str) -> Optional[dict]:
+        room = self.rooms.get(room_id)
+        if room is None or user_id not in room.players:
+            return None
+
+        if room.connect_status == "pending":
+            game = self.get_game_preview(room, room_id, user_id)
+        else:
+            opponent_id = self.get_opponent_id(room, user_id)
+            game = self.get_game(room, room_id, user_id, opponent_id)
+
+        return {
+            "message": f"Snapshot of room {room_id}",
+            "op": "snapshot",
+            "game": game,
+        }
+
+    def get_spectator_snapshot(self, room_id: Optional[str]) -> Optional[dict]:
+        room = self.rooms.get(room_id)
+        if room is None:
+            return None
+
+        return {
+            "message": f"Watching room {room_id}",
+            "op": "snapshot",
+            "game": {
+                "roomId": room_id,
+                "connectStatus": room.connect_status,
+                "type": room.game_type,
+                "white": room.active_board.white,
+                "black": room.active_board.black,
+                "clocks": self.get_clocks(room),
+                "activeBoard": {
+                    "fen": room.active_board.fen,
+                    "moves": room.active_board.moves.to_list(),
+                    "seq": len(room.active_board.moves),
+                },
+            },
+        }
+
+    def get_clocks(self, room: Room) -> Dict[str, int]:
+        # Milliseconds left, the side to move is charged up to now
+        active_board = room.active_board
+        turn_color = active_board.turn_color()
+        now = datetime.now().timestamp()
+
+        clocks = {}
+        for color in ("white", "black"):
+            player_id = active_board.player_id(color)
+            if player_id not in room.players:
+                continue
+
+            remaining = room.players[player_id].remaining
+            if (
+                color == turn_color
+                and room.connect_status == "connected"
+                and active_board.turn_started is not None
+            ):
+                remaining -= now - active_board.turn_started
+            clocks[color] = max(0, round(remaining * 1000))
+        return clocks
 
     async def broadcast_remove(self, room_id):
-        for user_id in self.rooms[room_id]["players"]:
-            websocket = self.get_websocket_by_user_id(user_id)
-            if websocket:
-                await websocket.send_json(
-                    {
-                        "message": f"Game Canceled",
-                        "op": "removed",
-                        "connectedStatus": "removed",
-                    }
-                )
+        message = {
+            "message": f"Game Canceled",
+            "op": "removed",
+            "connectedStatus": "removed",
+        }
 
-    def get_websocket_by_user_id(self, user_id: str) -> Optional[WebSocket]:
+        for user_id in self.rooms[room_id].players:
+            connection = self.get_connection(user_id)
+            if connection:
+                connection.send(message)
+
+        if self.spectators.has_spectators(room_id) or room_id in self.remote_spectators:
+            text = JSON.encode(message)
+            self.spectators.publish(room_id, text)
+            await self.publish_to_remote_spectators(room_id, text)
+
+    def get_connection(self, user_id: str) -> Optional[OutboundConnection]:
         return self.user_connections.get(user_id)
 
+    def get_websocket_by_user_id(self, user_id: str) -> Optional[WebSocket]:
+        connection = self.user_connections.get(user_id)
+        return connection.websocket if connection else None
+
     async def join_room(
         self,
         room_id: Optional[str],
         user_id: str,
         ws: WebSocket,
-        db: Session,
+        db: AsyncSession,
     ):
         # Check if the user is already in the room by user_id
         room = self.rooms[room_id]
 
-        if user_id in room["players"]:
+        if user_id in room.players:
             opponent_id = self.get_opponent_id(room, user_id)
 
             await ws.send_json(
@@ -321,155 +553,485 @@ class ChessRoomManager:
             opponent_id = self.get_opponent_id(room, user_id)
 
             # current user is connecting opponents room, opponent set it's time
-            room["players"][user_id] = {
-                "time": room["opponent_time"],
-                "increment": room["opponent_increment"],
-            }
+            room.players[user_id] = PlayerClock(
+                room.opponent_time, room.opponent_increment
+            )
 
-            color_attach_mode = room["color_attach_mode"]
+            color_attach_mode = room.color_attach_mode
 
             if color_attach_mode == ColorAttachMode.random:
                 color1, color2 = get_random_color()
-                room["active_board"][color1] = user_id
-                room["active_board"][color2] = opponent_id
+                room.active_board.set_player(color1, user_id)
+                room.active_board.set_player(color2, opponent_id)
             else:
-                room["active_board"][color_attach_mode] = user_id
-                room["active_board"][
-                    get_opposite_color(color_attach_mode)
-                ] = opponent_id
+                room.active_board.set_player(color_attach_mode, user_id)
+                room.active_board.set_player(
+                    get_opposite_color(color_attach_mode), opponent_id
+                )
 
-            room["connect_status"] = "connected"
+            room.connect_status = "connected"
+            self.start_board(room_id, room)
+            now = datetime.now().timestamp()
+            self.start_clock(room_id, room, now)
+            self.reaper.touch_room(room_id, now)
+            self.matchmaking.discard(room_id)
+            self.discard_seek(room_id)
 
             if "." not in user_id and "." not in room_id:
                 battle_data = {
-                    "type": room["game_type"],
-                    "games_count": room["games_count"],
-                    "player_time": room["players"][user_id]["time"],
-                    "player_increment": room["players"][user_id]["increment"],
-                    "opponent_time": room["players"][user_id]["time"],
-                    "opponent_increment": room["players"][user_id]["increment"],
-                    "color_attach_mode": room["color_attach_mode"],
-                    "with_armaghedon": room["with_armaghedon"],
+                    "type": room.game_type,
+                    "games_count": room.games_count,
+                    "player_time": room.players[user_id].time,
+                    "player_increment": room.players[user_id].increment,
+                    "opponent_time": room.players[user_id].time,
+                    "opponent_increment": room.players[user_id].increment,
+                    "color_attach_mode": room.color_attach_mode,
+                    "with_armaghedon": room.with_armaghedon,
                 }
 
-                battle = create_battle(db, Battle(**battle_data))
-                color = "white" if room["active_board"]["white"] == user_id else "black"
+                battle = await create_battle(db, Battle(**battle_data))
+                room.battle_id = battle.id
+                color = "white" if room.active_board.white == user_id else "black"
 
                 game_data = {
                     "type": battle.type,
                     "is_rating": battle.is_rating,
                     "battle_id": battle.id,
-                    "player_id": user_id,
-                    "opponent_id": opponent_id,
+                    "player_id": int(user_id),
+                    "opponent_id": int(opponent_id),
                     "player_color": color == "white",
                     "moves": [],
                 }
 
-                create_game(db, Game(**game_data))
+                game = await create_game(db, Game(**game_data))
+                room.active_board.game_id = game.id
 
             await self.initiate_players(room, room_id)
 
     async def initiate_players(self, room, room_id):
-        for user_id in room["players"]:
+        for user_id in room.players:
             logger.debug("initiate_players ${user_id}")
-            websocket = self.get_websocket_by_user_id(user_id)
+            connection = self.get_connection(user_id)
             opponent_id = self.get_opponent_id(room, user_id)
-            if websocket:
-                await websocket.send_json(
+            if connection:
+                connection.send(
                     {
                         "message": f"Initialized room {room_id}",
                         "op": "connected",
                         "game": self.get_game(room, room_id, user_id, opponent_id),
-                    }
+                    },
+                    room_id,
                 )
 
     def get_opponent_id(self, room, user_id):
-        players = list(room["players"].keys())
+        players = list(room.players.keys())
         for player in players:
             if player != user_id:
                 return player
         return None
 
     def get_game_preview(self, room, room_id, user_id):
-        color = "white" if room["active_board"]["white"] == user_id else "black"
+        color = "white" if room.active_board.white == user_id else "black"
 
         return {
             "roomId": user_id,
-            "connectStatus": room["connect_status"],
-            "battleId": room["battle_id"],
-            "gameId": room["active_board"]["game_id"],
-            "type": room["game_type"],
-            "isRating": room["is_rating"],
-            "gamesCount": room["games_count"],
-            "playerTime": room["players"][user_id]["time"],
-            "playerIncrement": room["players"][user_id]["increment"],
+            "connectStatus": room.connect_status,
+            "battleId": room.battle_id,
+            "gameId": room.active_board.game_id,
+            "type": room.game_type,
+            "isRating": room.is_rating,
+            "gamesCount": room.games_count,
+            "playerTime": room.players[user_id].time,
+            "playerIncrement": room.players[user_id].increment,
             "opponentId": "",
-            "opponentTime": room["opponent_time"],
-            "opponentIncrement": room["opponent_increment"],
-            "withArmaghedon": room["with_armaghedon"],
-            "messages": room["messages"],
+            "opponentTime": room.opponent_time,
+            "opponentIncrement": room.opponent_increment,
+            "withArmaghedon": room.with_armaghedon,
+            "messages": room.messages,
             "activeBoard": {
-                "fen": room["active_board"]["fen"],
+                "fen": room.active_board.fen,
                 "playerColor": color,
-                "moves": room["active_board"]["moves"],
+                "moves": room.active_board.moves.to_list(),
+                "seq": len(room.active_board.moves),
             },
         }
 
     def get_game(self, room, room_id, user_id, opponent_id):
-        color = "white" if room["active_board"]["white"] == user_id else "black"
+        color = "white" if room.active_board.white == user_id else "black"
 
         return {
             "roomId": room_id,
-            "connectStatus": room["connect_status"],
-            "battleId": room["battle_id"],
-            "gameId": room["active_board"]["game_id"],
-            "type": room["game_type"],
-            "isRating": room["is_rating"],
-            "gamesCount": room["games_count"],
-            "playerTime": room["players"][user_id]["time"],
-            "playerIncrement": room["players"][user_id]["increment"],
+            "connectStatus": room.connect_status,
+            "battleId": room.battle_id,
+            "gameId": room.active_board.game_id,
+            "type": room.game_type,
+            "isRating": room.is_rating,
+            "gamesCount": room.games_count,
+            "playerTime": room.players[user_id].time,
+            "playerIncrement": room.players[user_id].increment,
             "opponentId": opponent_id,
-            "opponentTime": room["players"][opponent_id]["time"],
-            "opponentIncrement": room["players"][opponent_id]["increment"],
-            "withArmaghedon": room["with_armaghedon"],
-            "messages": room["messages"],
+            "opponentTime": room.players[opponent_id].time,
+            "opponentIncrement": room.players[opponent_id].increment,
+            "withArmaghedon": room.with_armaghedon,
+            "messages": room.messages,
             "activeBoard": {
-                "fen": room["active_board"]["fen"],
+                "fen": room.active_board.fen,
                 "playerColor": color,
-                "moves": room["active_board"]["moves"],
+                "moves": room.active_board.moves.to_list(),
+                "seq": len(room.active_board.moves),
             },
         }
 
     def find_pending_room(self, game_type):
-        for room_id, room in self.rooms.items():
-            if room["connect_status"] == "pending" and room["game_type"] == game_type:
-                return room_id  # Returnează primul room_id găsit
-        return None
+        # Oldest pending room of this game type, O(1)
+        return self.matchmaking.peek(game_type)
 
     def remove_created_room(self, user_id):
         if user_id in self.rooms:
-            del self.rooms[user_id]
+            self.discard_room(user_id)
         return
 
     def remove_unconnected_room(self, user_id):
         if user_id in self.rooms:
-            if self.rooms[user_id]["connect_status"] == "pending":
-                del self.rooms[user_id]
+            if self.rooms[user_id].connect_status == "pending":
+                self.discard_room(user_id)
         return
 
-    def remove_room(
+    def discard_room(self, room_id: str):
+        self.matchmaking.discard(room_id)
+        self.discard_seek(room_id)
+        self.spectators.close(room_id)
+        self.remote_spectators.pop(room_id, None)
+        self.clocks.cancel(room_id)
+        self.reaper.forget_room(room_id)
+        if self.board_pool is not None:
+            self.board_pool.close_room(room_id)
+        del self.rooms[room_id]
+
+    async def run_reaper(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reap_idle()
+            except Exception:
+                logger.exception("Idle reaper sweep failed")
+
+    async def reap_idle(self):
+        now = time.time()
+        for room_id in self.reaper.idle_rooms(now):
+            room = self.rooms.get(room_id)
+            if room is None:
+                continue
+
+            # Started games always end, at the latest when a clock runs out
+            if room.connect_status == "connected" or (
+                room.connect_status == "pending" and self.get_connection(room_id)
+            ):
+                self.reaper.touch_room(room_id, now)
+                continue
+
+            self.discard_room(room_id)
+            self.reaper.evicted_rooms += 1
+
+    async def run_matchmaking(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.match_seekers()
+            except Exception:
+                logger.exception("Matchmaking tick failed")
+
+    async def match_seekers(self):
+        for host_id, guest_id in self.rating_matchmaker.collect_pairs():
+            guest_node = self.seeker_nodes.pop(guest_id, self.node_id)
+            self.seeker_nodes.pop(host_id, None)
+
+            # The guest gives up its own pending room and joins the host
+            await self.send_to(
+                self.owner_of(guest_id), {"type": "drop", "room_id": guest_id}
+            )
+            await self.send_to(
+                self.owner_of(host_id),
+                {
+                    "type": "pair",
+                    "room_id": host_id,
+                    "user_id": guest_id,
+                    "user_node": guest_node,
+                },
+            )
+
+    async def add_seek(self, game_type: str, room_id: str, rating: int):
+        # Each game type has a single rating pool in the whole cluster
+        pool_node = self.owner_of(f"matchmaking:{game_type}")
+        self.seek_nodes[room_id] = pool_node
+        await self.send_to(
+            pool_node,
+            {
+                "type": "seek",
+                "game_type": game_type,
+                "room_id": room_id,
+                "rating": rating,
+                "user_node": self.user_node(room_id),
+            },
+        )
+
+    def discard_seek(self, room_id: str):
+        pool_node = self.seek_nodes.pop(room_id, None)
+        if pool_node is None:
+            return
+
+        if pool_node == self.node_id:
+            self.rating_matchmaker.discard(room_id)
+            self.seeker_nodes.pop(room_id, None)
+        else:
+            # Called from sync code, the message goes out in its own task
+            self.run_in_background(
+                self.send_to(pool_node, {"type": "unseek", "room_id": room_id}),
+                "unseek",
+            )
+
+    def run_in_background(self, coroutine, what: str):
+        task = asyncio.create_task(coroutine)
+        self.background.add(task)
+        task.add_done_callback(lambda task: self.background_done(task, what))
+
+    def background_done(self, task: asyncio.Task, what: str):
+        self.background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background %s failed", what, exc_info=task.exception())
+
+    def owner_of(self, key: str) -> str:
+        if self.ring is None:
+            return self.node_id
+        return self.ring.owner(key)
+
+    def user_node(self, user_id: str) -> str:
+        websocket = self.get_websocket_by_user_id(user_id)
+        if isinstance(websocket, RemoteWebSocket):
+            return websocket.node_id
+        return self.node_id
+
+    async def start_cluster(self):
+        if self.ring is None:
+            return
+
+        self.bus = create_bus(
+            settings.BUS_BACKEND,
+            settings.NODE_ID or None,
+            self.ring.nodes,
+            settings.BUS_SOCKET_DIR,
+        )
+        await self.bus.start(self.handle_bus_message)
+        self.node_id = self.bus.node_id
+        # Every node checkpoints only the rooms it owns
+        self.checkpointer.path = f"{settings.CHECKPOINT_PATH}.{self.node_id}"
+
+    async def stop_cluster(self):
+        if self.bus is not None:
+            await self.bus.close()
+
+    async def send_to(self, node_id: str, message: dict):
+        message = {**message, "origin": self.node_id}
+        if node_id == self.node_id:
+            await self.handle_bus_message(message)
+        else:
+            await self.bus.publish(node_id, message)
+
+    async def remote_websocket(self, node_id: str, user_id: str) -> RemoteWebSocket:
+        websocket = self.get_websocket_by_user_id(user_id)
+        if isinstance(websocket, RemoteWebSocket) and websocket.node_id == node_id:
+            return websocket
+
+        websocket = RemoteWebSocket(self.bus, node_id, user_id)
+        await self.connect(websocket, user_id)
+        return websocket
+
+    async def publish_to_remote_spectators(self, room_id: str, frame: str):
+        for node_id in self.remote_spectators.get(room_id, ()):
+            await self.send_to(
+                node_id, {"type": "spectate", "room_id": room_id, "frame": frame}
+            )
+
+    async def handle_bus_message(self, message: dict):
+        kind = message["type"]
+        origin = message["origin"]
+        user_id = message.get("user_id")
+        room_id = message.get("room_id")
+
+        if kind == "deliver":
+            # A frame for a socket connected to this node
+            connection = self.get_connection(user_id)
+            if connection:
+                connection.send(message.get("text") or message.get("message"))
+        elif kind == "close":
+            connection = self.get_connection(user_id)
+            if connection:
+                connection.close(code=message["code"])
+        elif kind == "handshake":
+            websocket = await self.remote_websocket(origin, user_id)
+            await self.handshake(websocket, user_id, message["params"])
+        elif kind == "message":
+            websocket = await self.remote_websocket(origin, user_id)
+            await self.handle_message(websocket, user_id, message["data"])
+        elif kind == "disconnect":
+            # Only drop the proxy, the user may have reconnected here directly
+            if isinstance(self.get_websocket_by_user_id(user_id), RemoteWebSocket):
+                await self.disconnect(user_id)
+        elif kind == "seek":
+            self.rating_matchmaker.add(message["game_type"], room_id, message["rating"])
+            self.seeker_nodes[room_id] = message["user_node"]
+        elif kind == "unseek":
+            self.rating_matchmaker.discard(room_id)
+            self.seeker_nodes.pop(room_id, None)
+        elif kind == "drop":
+            self.remove_unconnected_room(room_id)
+        elif kind == "pair":
+            room = self.rooms.get(room_id)
+            if room is None or room.connect_status != "pending":
+                return
+
+            if message["user_node"] == self.node_id:
+                websocket = self.get_websocket_by_user_id(user_id)
+            else:
+                websocket = await self.remote_websocket(message["user_node"], user_id)
+            if websocket is None:
+                return
+
+            async with AsyncSessionLocal() as db:
+                await self.join_room(room_id, user_id, websocket, db)
+        elif kind == "watch":
+            self.remote_spectators.setdefault(room_id, set()).add(origin)
+            snapshot = self.get_spectator_snapshot(room_id)
+            if snapshot:
+                await self.send_to(
+                    origin,
+                    {"type": "spectate", "room_id": room_id, "frame": JSON.encode(snapshot)},
+                )
+        elif kind == "unwatch":
+            nodes = self.remote_spectators.get(room_id, set())
+            nodes.discard(origin)
+            if not nodes:
+                self.remote_spectators.pop(room_id, None)
+        elif kind == "spectate":
+            self.spectators.publish(room_id, message["frame"])
+
+    async def handshake(self, websocket: WebSocket, user_id: str, params: dict):
+        op = params.get("op")
+        room_id = params.get("room_id")
+        game_type = params.get("game_type")
+
+        if op in ("connect", "search"):
+            # The session only lives for the handshake and is always closed, the
+            # move loop never touches the database
+            async with AsyncSessionLocal() as db:
+                if op == "connect" and room_id:
+                    await self.connect_with_room_id(
+                        db,
+                        websocket,
+                        user_id,
+                        room_id,
+                    )
+                elif op == "search" and game_type:
+                    await self.connect_by_game_type(
+                        db,
+                        websocket,
+                        user_id,
+                        game_type,
+                    )
+        elif op == "remove":
+            if room_id:
+                await self.remove_room(room_id)
+        elif op == "create":
+            await self.create_room(
+                websocket,
+                user_id,
+                game_type,
+                params.get("is_rating") == "true",
+                int(params.get("games_count", 1)),
+                int(params.get("player_time", 300)),
+                int(params.get("player_increment", 0)),
+                int(params.get("opponent_time", 300)),
+                int(params.get("opponent_increment", 0)),
+                params.get("color_attach_mode", "random"),
+                params.get("with_armaghedon") == "true",
+                params.get("fen"),
+            )
+
+    def handshake_owner(self, user_id: str, params: dict) -> str:
+        # Existing rooms are found by id, new rooms are keyed by their creator
+        if params.get("op") in ("connect", "remove") and params.get("room_id"):
+            return self.owner_of(params["room_id"])
+        return self.owner_of(user_id)
+
+    async def handle_message(self, websocket: WebSocket, user_id: str, data: dict):
+        if data.get("op") == "pong":
+            return
+        if data.get("op") == "ping":
+            await websocket.send_json(PONG)
+            return
+
+        if data.get("op") == "resync":
+            await self.send_snapshot(websocket, data.get("room_id"), user_id)
+            return
+
+        if not isinstance(data.get("move"), str) or not isinstance(
+            data.get("room_id"), str
+        ):
+            await websocket.send_json(INVALID_MESSAGE)
+            return
+
+        await self.make_move(data["move"], websocket, data["room_id"], user_id)
+
+    async def restore_rooms(self):
+        try:
+            rooms = await self.checkpointer.restore()
+        except Exception:
+            logger.exception("Could not restore rooms from the checkpoint")
+            return
+
+        # Players get their games back by reconnecting with op=connect. The
+        # downtime is not charged to the side to move, its clock restarts now.
+        now = datetime.now().timestamp()
+        for room_id, room in rooms.items():
+            if room_id in self.rooms:
+                continue
+            self.rooms[room_id] = room
+            self.reaper.touch_room(room_id, now)
+            if room.connect_status == "connected":
+                self.start_board(room_id, room)
+                self.start_clock(room_id, room, now)
+
+    async def remove_room(
         self,
         room_id: Optional[str],
     ):
-        self.broadcast_remove(room_id)
+        if room_id in self.rooms:
+            await self.broadcast_remove(room_id)
 
-    async def connect(self, websocket: WebSocket, user_id: str):
-        self.user_connections[user_id] = websocket
+    async def connect(self, websocket: WebSocket, user_id: str, encoder=JSON):
+        previous = self.user_connections.get(user_id)
+        if previous:
+            previous.close()
 
-    async def disconnect(self, user_id: str):
-        if user_id in self.user_connections:
-            self.remove_unconnected_room(user_id)
-            del self.user_connections[user_id]
+        connection = OutboundConnection(
+            websocket,
+            user_id,
+            self.get_snapshot,
+            max_size=settings.OUTBOUND_QUEUE_SIZE,
+            policy=settings.OUTBOUND_SLOW_CONSUMER_POLICY,
+            encoder=encoder,
+        )
+        connection.start()
+        self.user_connections[user_id] = connection
+
+    async def disconnect(self, user_id: str, websocket: Optional[WebSocket] = None):
+        connection = self.user_connections.get(user_id)
+        # A socket replaced by a newer one must not take the new one down
+        if connection is None or websocket not in (None, connection.websocket):
+            return
+
+        self.remove_unconnected_room(user_id)
+        self.user_connections.pop(user_id).close()
 
 
 manager = ChessRoomManager()
@@ -477,6 +1039,146 @@ manager = ChessRoomManager()
 router = APIRouter()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if manager.board_pool is not None:
+        manager.board_pool.start()
+    await manager.start_cluster()
+    await manager.restore_rooms()
+
+    tasks = [
+        asyncio.create_task(manager.run_matchmaking(settings.MATCHMAKING_TICK_SECONDS)),
+        asyncio.create_task(manager.journal.run()),
+        asyncio.create_task(manager.checkpointer.run(manager.rooms)),
+        asyncio.create_task(manager.clocks.run()),
+        asyncio.create_task(manager.run_reaper(settings.REAPER_SWEEP_SECONDS)),
+    ]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Whatever is still buffered is written before the worker exits
+        try:
+            await manager.journal.flush()
+            await manager.checkpointer.checkpoint(manager.rooms)
+        except Exception:
+            logger.exception("Final move journal flush failed")
+        await manager.stop_cluster()
+        if manager.board_pool is not None:
+            manager.board_pool.close()
+
+
+@router.get("/cluster/stats")
+def cluster_stats():
+    return {
+        "nodeId": manager.node_id,
+        "nodes": manager.ring.nodes if manager.ring else [manager.node_id],
+        "rooms": len(manager.rooms),
+        "connections": len(manager.user_connections),
+        "bus": manager.bus.stats() if manager.bus else None,
+    }
+
+
+@router.get("/connections/stats")
+def connection_stats():
+    return {
+        user_id: connection.stats()
+        for user_id, connection in manager.user_connections.items()
+    }
+
+
+@router.get("/spectators/stats")
+def spectator_stats():
+    return manager.spectators.stats()
+
+
+@router.get("/clocks/stats")
+def clock_stats():
+    return manager.clocks.stats()
+
+
+@router.get("/boards/stats")
+def board_stats():
+    if manager.board_pool is None:
+        return {"processes": 0}
+    return manager.board_pool.stats()
+
+
+@router.get("/reaper/stats")
+def reaper_stats():
+    return manager.reaper.stats()
+
+
+@router.get("/journal/stats")
+def journal_stats():
+    return {**manager.journal.stats(), "checkpoint": manager.checkpointer.stats()}
+
+
+@router.get("/matchmaking/queues")
+def matchmaking_queues():
+    depths = manager.matchmaking.depths()
+    seekers = manager.rating_matchmaker.depths()
+    return {
+        "queues": depths,
+        "total": sum(depths.values()),
+        "seekers": seekers,
+        "seekersTotal": sum(seekers.values()),
+        "matchedTotal": manager.rating_matchmaker.matched_total,
+        "timeToMatch": manager.rating_matchmaker.wait_percentiles(),
+    }
+
+
+@router.websocket("/{room_id}/watch")
+async def spectator_endpoint(websocket: WebSocket, room_id: str):
+    await websocket.accept()
+
+    node_id = manager.owner_of(room_id)
+    if node_id != manager.node_id:
+        await watch_remote_room(websocket, room_id, node_id)
+        return
+
+    snapshot = manager.get_spectator_snapshot(room_id)
+    if snapshot is None:
+        await websocket.send_json({"message": f"Room {room_id} is not available."})
+        await websocket.close()
+        return
+
+    # Moves published between the snapshot and the subscription show up as a
+    # gap in "seq" and the client resyncs
+    await websocket.send_json(snapshot)
+    manager.spectators.subscribe(room_id, websocket)
+
+    try:
+        while True:
+            data = await websocket.receive_json()
+            if data.get("op") == "resync":
+                snapshot = manager.get_spectator_snapshot(room_id)
+                await websocket.send_json(snapshot or {"message": "Game not found."})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.spectators.unsubscribe(room_id, websocket)
+
+
+async def watch_remote_room(websocket: WebSocket, room_id: str, node_id: str):
+    # The owner sends the snapshot and then every frame once to this node,
+    # which fans them out to its own spectators
+    manager.spectators.subscribe(room_id, websocket)
+    try:
+        await manager.send_to(node_id, {"type": "watch", "room_id": room_id})
+        while True:
+            data = await websocket.receive_json()
+            if data.get("op") == "resync":
+                await manager.send_to(node_id, {"type": "watch", "room_id": room_id})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.spectators.unsubscribe(room_id, websocket)
+        if not manager.spectators.has_spectators(room_id):
+            await manager.send_to(node_id, {"type": "unwatch", "room_id": room_id})
+
+
 @router.websocket("/{user_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -494,73 +1196,62 @@ async def websocket_endpoint(
     with_armaghedon: Optional[bool] = False,
     fen: Optional[str] = None,
 ):
-    await manager.connect(websocket, user_id)
+    # Rejected before accept, the client sees the handshake fail
+    if not verify_websocket_user(websocket, user_id):
+        await websocket.close(code=1008)
+        return
 
-    db: Session = SessionLocal()
+    # Clients offering the binary subprotocol get compact move frames,
+    # others pick their encoding with ?encoding=json|msgpack, JSON by default
+    if BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", ()):
+        websocket = EncodedWebSocket(websocket, BinaryEncoder(), BINARY_SUBPROTOCOL)
+    else:
+        websocket = EncodedWebSocket(
+            websocket, get_encoder(websocket.query_params.get("encoding"))
+        )
+    await manager.connect(websocket, user_id, websocket.encoder)
 
-    params = websocket.query_params
+    # The token stays on this node, it is not forwarded with the handshake
+    params = {**websocket.query_params, "op": op}
+    params.pop("token", None)
 
-    if op == "connect":
-        if room_id:
-            await manager.connect_with_room_id(
-                db,
-                websocket,
-                user_id,
-                room_id,
-            )
-    if op == "remove":
-        if room_id:
-            await manager.remove_room(room_id)
-    elif op == "search":
-        if game_type:
-            await manager.connect_by_game_type(
-                db,
-                websocket,
-                user_id,
-                game_type,
-            )
-    elif op == "create":
-        is_rating = params.get("is_rating", is_rating) == "true"
-        game_type = params.get("game_type", game_type)
-        games_count = int(params.get("games_count", games_count))
-        player_time = int(params.get("player_time", player_time))
-        player_increment = int(params.get("player_increment", player_increment))
-        opponent_time = int(params.get("opponent_time", opponent_time))
-        opponent_increment = int(params.get("opponent_increment", opponent_increment))
-        color_attach_mode = params.get("color_attach_mode", color_attach_mode)
-        with_armaghedon = params.get("with_armaghedon", with_armaghedon) == "true"
-        fen = params.get("fen", fen)
-
-        await manager.create_room(
-            websocket,
-            user_id,
-            game_type,
-            is_rating,
-            games_count,
-            player_time,
-            player_increment,
-            opponent_time,
-            opponent_increment,
-            color_attach_mode,
-            with_armaghedon,
-            fen,
+    # Nodes other than this one that handle rooms for this socket
+    remote_nodes = set()
+
+    node_id = manager.handshake_owner(user_id, params)
+    if node_id == manager.node_id:
+        await manager.handshake(websocket, user_id, params)
+    else:
+        await websocket.accept()
+        remote_nodes.add(node_id)
+        await manager.send_to(
+            node_id, {"type": "handshake", "user_id": user_id, "params": params}
         )
 
     try:
         while True:
             data = await websocket.receive_json()
-            if "move" not in data or "room_id" not in data:
-                await websocket.send_json(
-                    {
-                        "message": "Invalid message format. 'move' and 'room_id' are required."
-                    }
-                )
-                continue
 
-            # manager.last_interaction[user_id] = time.time()
-            await manager.make_move(data["move"], websocket, data["room_id"], user_id)
+            # Malformed room ids stay here and get INVALID_MESSAGE
+            node_id = manager.node_id
+            target = data.get("room_id")
+            if isinstance(target, str) and target and target not in manager.rooms:
+                node_id = manager.owner_of(target)
+
+            if node_id == manager.node_id:
+                await manager.handle_message(websocket, user_id, data)
+            else:
+                remote_nodes.add(node_id)
+                await manager.send_to(
+                    node_id, {"type": "message", "user_id": user_id, "data": data}
+                )
     except WebSocketDisconnect:
-        await manager.disconnect(user_id)
+        pass
+    finally:
+        # Also on errors, or the connection's writer task and rooms leak
+        await manager.disconnect(user_id, websocket)
+        for node_id in remote_nodes:
+            await manager.send_to(node_id, {"type": "disconnect", "user_id": user_id})
 
     # async def message_reponse(ws, message, room_id, fen, color):
     #     await ws.send_json(
@@ -572,38 +1263,3 @@ async def websocket_endpoint(
     #         }
     #     )
     #     return
-
-
-# async def inactivity_task():
-#     while True:
-#         await manager.handle_inactivity(timeout=30)  # Check inactivity every 30 seconds
-#         await asyncio.sleep(30)
-
-
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     task = asyncio.create_task(inactivity_task())
-#     try:
-#         yield
-#     finally:
-#         task.cancel()
-#         await task
-
-
-# async def handle_inactivity(self, timeout: int = 30):
-#     """Check for inactive players and disconnect them after the timeout"""
-#     current_time = time.time()
-#     for user_id, last_interaction in list(self.last_interaction.items()):
-#         if current_time - last_interaction > timeout:
-#             # Find the room the user is in and remove them
-#             for room_id, info in self.rooms.items():
-#                 if any(ws == user_id for ws in info["players"]):
-#                     info["players"] = {
-#                         ws for ws in info["players"] if ws != user_id
-#                     }
-#                     # Remove the room if it's empty
-#                     if not info["players"]:
-#                         del self.rooms[room_id]
-#                     break
-#             # Remove user from last_interaction
-#             del self.last_interaction[user_id]
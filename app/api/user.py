@@ -1,12 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+import base64
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+import orjson
 from sqlalchemy.orm import Session
 from app import crud
+from app.config import settings
 from app.database import get_db
 from app.services import auth
+from app.services.hashing import HasherBusy
 from app.schemas.auth import TokenData
-from app.schemas.user import UserAuthResponse, UserResponse, UserCreate
-from typing import List
-import chess
+from app.schemas.user import (
+    UserAuthResponse,
+    UserResponse,
+    UserCreate,
+    UserSearchPage,
+)
+from typing import Optional
 
 router = APIRouter()
 
@@ -17,7 +25,14 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = auth.get_password_hash(user.password)
+    try:
+        hashed_password = auth.get_password_hash(user.password)
+    except HasherBusy:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, try again shortly",
+            headers={"Retry-After": "1"},
+        )
 
     user_data = crud.create_user(db=db, user=user, hashed_password=hashed_password)
 
@@ -65,18 +80,47 @@ def get_user(
     return user_data
 
 
-# Search useers by username
-@router.get("/search/{username}", response_model=List[UserResponse])
+def encode_search_cursor(cursor: crud.SearchCursor) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(cursor)).decode()
+
+
+def decode_search_cursor(cursor: str) -> crud.SearchCursor:
+    try:
+        phase, name, user_id = orjson.loads(base64.urlsafe_b64decode(cursor))
+        cursor = (phase, name, int(user_id))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # JSON true would pass for phase 1, and any scalar for a name
+    if type(phase) is not int or not isinstance(name, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if phase not in (crud.SEARCH_PREFIX, crud.SEARCH_SUBSTRING):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return cursor
+
+
+# Search users by username, prefix matches first
+@router.get("/search/{username}", response_model=UserSearchPage)
 def search(
     username: str,
+    limit: int = Query(
+        settings.USER_SEARCH_PAGE_SIZE, ge=1, le=settings.USER_SEARCH_MAX_PAGE_SIZE
+    ),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user=Depends(auth.get_current_user),
 ):
-    users = crud.get_users_by_username(
-        db, username_substr=username, current_user_id=current_user.id
+    users, next_cursor = crud.search_users(
+        db,
+        username_query=username,
+        current_user_id=current_user.id,
+        limit=limit,
+        after=decode_search_cursor(cursor) if cursor else None,
     )
 
-    return users
+    return {
+        "users": users,
+        "next_cursor": encode_search_cursor(next_cursor) if next_cursor else None,
+    }
 
 
 # Update user endpoint
@@ -91,7 +135,15 @@ def update_user(
     if not user_data:
         raise HTTPException(status_code=404, detail="User not found")
 
-    hashed_password = auth.hash_password(user.password)
+    try:
+        hashed_password = auth.get_password_hash(user.password)
+    except HasherBusy:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
     updated_user = crud.update_user(
         db, user_id=user_id, user=user, hashed_password=hashed_password
     )
@@ -6,6 +6,97 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Pool of each engine, the sync one serving requests and the async one the
+    # game loop. Statement timeouts only apply on Postgres.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 5000
+    # Fraction of statements logged at INFO, slower ones are always logged
+    DB_LOG_SAMPLE_RATE: float = 0.0
+    DB_SLOW_STATEMENT_MS: float = 250.0
+    LOG_LEVEL: str = "INFO"
+    # Checked against the Alembic heads at startup. "strict" refuses to start
+    # on a mismatch, "warn" logs it, "create" runs create_all instead (SQLite
+    # and tests only) and "off" skips the check.
+    DB_SCHEMA_CHECK: str = "warn"
+
+    # Verified access tokens kept in memory, evicted at their expiry
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # bcrypt runs on PASSWORD_HASH_WORKERS threads, with at most
+    # PASSWORD_HASH_QUEUE jobs waiting before requests get a 429
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE: int = 32
+
+    USER_SEARCH_PAGE_SIZE: int = 20
+    USER_SEARCH_MAX_PAGE_SIZE: int = 50
+
+    MATCHMAKING_TICK_SECONDS: float = 0.5
+    MATCHMAKING_BASE_WINDOW: int = 50
+    MATCHMAKING_WIDEN_PER_SECOND: int = 25
+    MATCHMAKING_MAX_WINDOW: int = 600
+
+    # "coalesce" replaces a full backlog with one snapshot, "disconnect" drops
+    # the slow client
+    OUTBOUND_QUEUE_SIZE: int = 64
+    OUTBOUND_SLOW_CONSUMER_POLICY: str = "coalesce"
+
+    SPECTATOR_SHARD_SIZE: int = 500
+    SPECTATOR_BACKLOG: int = 32
+    # Spectators slower than this to accept a frame are dropped
+    SPECTATOR_SEND_TIMEOUT: float = 1.0
+
+    # "buffered" batches moves in memory, "sync" writes each move before it is
+    # broadcast
+    JOURNAL_DURABILITY: str = "buffered"
+    JOURNAL_FLUSH_SECONDS: float = 1.0
+    JOURNAL_MAX_BUFFER: int = 5000
+    # Moves kept while the database is unreachable, the oldest go first
+    JOURNAL_MAX_BACKLOG: int = 100000
+
+    # Worker processes owning the boards of started games, 0 plays every move
+    # on the event loop
+    BOARD_PROCESSES: int = 0
+
+    # UCI engine command for /chess analysis, empty disables it. The pool runs
+    # ENGINE_PROCESSES single threaded engines, 0 runs one per CPU core.
+    ENGINE_PATH: str = ""
+    ENGINE_PROCESSES: int = 0
+    ENGINE_HASH_MB: int = 16
+    ENGINE_QUEUE_SIZE: int = 64
+    ENGINE_DEFAULT_DEPTH: int = 18
+    ENGINE_MAX_DEPTH: int = 30
+    ENGINE_MAX_TIME_MS: int = 5000
+    # Longest game /chess/analysis reviews, in plies
+    ANALYSIS_MAX_PLIES: int = 600
+
+    # Analyses kept in memory by position. ANALYSIS_CACHE_PATH adds an SQLite
+    # tier shared by workers and kept across restarts, empty disables it.
+    ANALYSIS_CACHE_SIZE: int = 100000
+    ANALYSIS_CACHE_PATH: str = ""
+    ANALYSIS_DISK_CACHE_SIZE: int = 1000000
+
+    CHECKPOINT_PATH: str = "rooms.checkpoint.sqlite3"
+    CHECKPOINT_SECONDS: float = 5.0
+
+    # Pending and finished rooms idle for ROOM_IDLE_SECONDS without their
+    # players are evicted. Half-open sockets are left to uvicorn's WebSocket
+    # pings, tuned with --ws-ping-interval and --ws-ping-timeout.
+    ROOM_IDLE_SECONDS: float = 600.0
+    REAPER_SWEEP_SECONDS: float = 5.0
+
+    # Comma separated node ids. Empty runs a single node without a bus. An
+    # empty NODE_ID lets the unix bus claim the first free node, so every
+    # uvicorn worker becomes one node.
+    CLUSTER_NODES: str = ""
+    NODE_ID: str = ""
+    BUS_BACKEND: str = "unix"
+    BUS_SOCKET_DIR: str = "/tmp/chess-api-bus"
+
     class Config:
         env_file = ".env"
 
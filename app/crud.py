@@ -1,6 +1,19 @@
+from typing import List, Optional, Tuple
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.schemas.user import UserCreate
 from app.models.user import User
+from app.services.username_index import username_index
+
+# Username search returns every prefix match before any other substring match
+SEARCH_PREFIX = 0
+SEARCH_SUBSTRING = 1
+# Shorter queries have no trigram to look up, they only match prefixes
+SEARCH_TRIGRAM_MIN_LENGTH = 3
+
+# (phase, lowercased username, id) of the last user of a page
+SearchCursor = Tuple[int, str, int]
 
 
 def create_user(db: Session, user: UserCreate, hashed_password: str):
@@ -10,6 +23,7 @@ def create_user(db: Session, user: UserCreate, hashed_password: str):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    username_index.add(db_user.id, db_user.username)
     return db_user
 
 
@@ -17,25 +31,140 @@ def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
 
+def update_password_hash(db: Session, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
+
 def get_user_by_id(db: Session, user_id: int):
     return db.query(User).filter(User.id == user_id).first()
 
 
-def get_users_by_username(db: Session, username_substr: str, current_user_id: int):
-    return (
-        db.query(User)
-        .filter(User.username.ilike(f"%{username_substr}%"))
+async def get_user_rating(db: AsyncSession, user_id: str, game_type: str) -> int:
+    # Guests and other non numeric ids have no stored rating
+    column = getattr(User, f"stats_{game_type}", None)
+    if column is None or not user_id.isdigit():
+        return 0
+
+    rating = await db.scalar(select(column).where(User.id == int(user_id)))
+    return rating or 0
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def username_key(db: Session):
+    # Postgres compares bytewise so ORDER BY matches ix_users_username_prefix
+    lowered = func.lower(User.username)
+    if db.get_bind().dialect.name == "postgresql":
+        return lowered.collate("C")
+    return lowered
+
+
+def get_users_by_prefix(
+    db: Session,
+    prefix: str,
+    current_user_id: int,
+    limit: int,
+    after: Optional[Tuple[str, int]] = None,
+) -> List[Tuple[str, User]]:
+    if db.get_bind().dialect.name != "postgresql":
+        if not username_index.loaded:
+            username_index.load(db.execute(select(User.id, User.username)).all())
+
+        entries = username_index.prefix(prefix, limit, after, current_user_id)
+        users = {
+            user.id: user
+            for user in db.query(User).filter(
+                User.id.in_([user_id for _, user_id in entries])
+            )
+        }
+        return [
+            (name, users[user_id]) for name, user_id in entries if user_id in users
+        ]
+
+    key = username_key(db)
+    query = (
+        db.query(key, User)
+        .filter(key.like(f"{escape_like(prefix)}%", escape="\\"))
+        .filter(User.id != current_user_id)
+    )
+    if after is not None:
+        query = query.filter(tuple_(key, User.id) > tuple_(*after))
+    return query.order_by(key, User.id).limit(limit).all()
+
+
+def get_users_by_substring(
+    db: Session,
+    substring: str,
+    current_user_id: int,
+    limit: int,
+    after: Optional[Tuple[str, int]] = None,
+) -> List[Tuple[str, User]]:
+    # Served by ix_users_username_trgm on Postgres, leaves out prefix matches
+    key = username_key(db)
+    lowered = func.lower(User.username)
+    pattern = escape_like(substring)
+    query = (
+        db.query(key, User)
+        .filter(lowered.like(f"%{pattern}%", escape="\\"))
+        .filter(~lowered.like(f"{pattern}%", escape="\\"))
         .filter(User.id != current_user_id)
-        .all()
     )
+    if after is not None:
+        query = query.filter(tuple_(key, User.id) > tuple_(*after))
+    return query.order_by(key, User.id).limit(limit).all()
+
+
+def search_users(
+    db: Session,
+    username_query: str,
+    current_user_id: int,
+    limit: int,
+    after: Optional[SearchCursor] = None,
+) -> Tuple[List[User], Optional[SearchCursor]]:
+    """Returns a page of users matching the query, prefix matches first, and
+    the cursor of the next page if there is one."""
+    username_query = username_query.lower()
+    phase, name, last_id = after or (SEARCH_PREFIX, None, None)
+    last = (name, last_id) if after else None
+
+    # One row past the page tells whether there is a next one
+    matches = []
+    if phase == SEARCH_PREFIX:
+        matches = [
+            (SEARCH_PREFIX, key, user)
+            for key, user in get_users_by_prefix(
+                db, username_query, current_user_id, limit + 1, last
+            )
+        ]
+        last = None
+
+    if len(matches) <= limit and len(username_query) >= SEARCH_TRIGRAM_MIN_LENGTH:
+        matches += [
+            (SEARCH_SUBSTRING, key, user)
+            for key, user in get_users_by_substring(
+                db, username_query, current_user_id, limit + 1 - len(matches), last
+            )
+        ]
+
+    page = matches[:limit]
+    if len(matches) <= limit:
+        return [user for _, _, user in page], None
+
+    phase, key, user = page[-1]
+    return [user for _, _, user in page], (phase, key, user.id)
 
 
 def update_user(db: Session, user_id: int, user: UserCreate, hashed_password: str):
     db_user = db.query(User).filter(User.id == user_id).first()
     if db_user:
+        username_index.remove(db_user.id, db_user.username)
         db_user.username = user.username
         db_user.email = user.email
         db_user.hashed_password = hashed_password
         db.commit()
         db.refresh(db_user)
+        username_index.add(db_user.id, db_user.username)
     return db_user
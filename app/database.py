@@ -1,29 +1,176 @@
+import logging
+import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import QueuePool
+from typing import Any, Dict, Set
 from app.config import settings
+from app.services.db_metrics import (
+    StatementLogger,
+    TimedAsyncQueuePool,
+    TimedQueuePool,
+    checkout_wait,
+    query_latency,
+)
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = settings.DATABASE_URL
+MIGRATIONS_PATH = os.path.join(os.path.dirname(__file__), "migrations")
+
+
+def get_engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    database_url = make_url(url)
+    backend = database_url.get_backend_name()
+    # SQLite keeps SQLAlchemy's default pool, it has no server to protect
+    if backend == "sqlite":
+        return {}
+
+    options = {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if backend == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if is_async:
+            # asyncpg takes server settings, libpq takes command line options
+            options["connect_args"] = {
+                "server_settings": {"statement_timeout": timeout}
+            }
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
 
-engine = create_engine(DATABASE_URL, echo=True)
+
+statement_logger = StatementLogger(
+    sample_rate=settings.DB_LOG_SAMPLE_RATE, slow_ms=settings.DB_SLOW_STATEMENT_MS
+)
+
+engine = create_engine(DATABASE_URL, **get_engine_options(DATABASE_URL))
+statement_logger.attach(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_database_url(url: str) -> str:
+    # Same database, but through an asyncio driver for code running on the
+    # event loop. The sync engine keeps psycopg2 or pysqlite.
+    database_url = make_url(url)
+    backend = database_url.get_backend_name()
+    if backend == "postgresql":
+        database_url = database_url.set(drivername="postgresql+asyncpg")
+    elif backend == "sqlite":
+        database_url = database_url.set(drivername="sqlite+aiosqlite")
+    return database_url.render_as_string(hide_password=False)
+
+
+async_engine = create_async_engine(
+    get_async_database_url(DATABASE_URL),
+    **get_engine_options(DATABASE_URL, is_async=True),
+)
+statement_logger.attach(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
 def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    # One session per request, a failed request never hands its connection
+    # back to the pool with the transaction still open
+    with SessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            db.rollback()
+            raise
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+
+def get_pool_stats(pool) -> Dict[str, Any]:
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checkedOut": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "idle": pool.checkedin(),
+    }
+
+
+def get_database_stats() -> Dict[str, Any]:
+    return {
+        "pools": {
+            "sync": get_pool_stats(engine.pool),
+            "async": get_pool_stats(async_engine.pool),
+        },
+        "checkoutWait": checkout_wait.stats(),
+        "queryLatency": query_latency.stats(),
+        "statementLog": statement_logger.stats(),
+    }
 
 
 def init_db():
-    from app import models
+    # Only for throwaway databases, the schema is otherwise owned by Alembic
+    from app.models import game, user
 
     Base.metadata.create_all(bind=engine)
 
 
-init_db()
+def get_expected_revisions() -> Set[str]:
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_PATH)
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+def get_current_revisions() -> Set[str]:
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as connection:
+        return set(MigrationContext.configure(connection).get_current_heads())
+
+
+def check_schema():
+    """Compares the database's Alembic revision with the migration heads
+    shipped with the code, once at startup. DB_SCHEMA_CHECK decides whether a
+    mismatch stops the startup, is logged, or is skipped."""
+    mode = settings.DB_SCHEMA_CHECK
+    if mode == "off":
+        return
+    if mode == "create":
+        init_db()
+        return
+
+    current, expected = get_current_revisions(), get_expected_revisions()
+    if current == expected:
+        return
+
+    message = (
+        f"Database schema is at {', '.join(sorted(current)) or 'no revision'}, "
+        f"the code expects {', '.join(sorted(expected))}. "
+        "Run `alembic upgrade head`."
+    )
+    if mode == "strict":
+        raise RuntimeError(message)
+    logger.warning(message)
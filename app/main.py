@@ -1,14 +1,52 @@
+import asyncio
+from contextlib import asynccontextmanager
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.database import engine, Base
+from app.config import settings
+from app.database import check_schema, get_database_stats
 from app.api import user, profile, room, auth, chess
 
-# Initialize the database
-Base.metadata.create_all(bind=engine)
+logging.basicConfig(level=settings.LOG_LEVEL)
+
+logger = logging.getLogger(__name__)
+
+
+async def check_schema_in_background():
+    try:
+        await asyncio.to_thread(check_schema)
+    except Exception:
+        logger.exception("Failed to check the database schema")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema belongs to Alembic, importing the app never touches it.
+    # Importing Alembic costs more than the rest of the startup, a check that
+    # only warns runs next to it instead of in front of it.
+    schema_check = None
+    if settings.DB_SCHEMA_CHECK == "warn":
+        schema_check = asyncio.create_task(check_schema_in_background())
+    else:
+        await asyncio.to_thread(check_schema)
+
+    await chess.engine_pool.start()
+    await chess.analysis_cache.open()
+    try:
+        async with room.lifespan(app):
+            yield
+    finally:
+        await chess.engine_pool.close()
+        chess.analysis_cache.close()
+
+    if schema_check is not None:
+        await schema_check
+
 
 # Create FastAPI instance
-app = FastAPI(title="Chess API", version="1.0")
+app = FastAPI(title="Chess API", version="1.0", lifespan=lifespan)
 
 
 # CORS Middleware (Adjust origins as needed)
@@ -33,3 +71,8 @@ app.include_router(room.router, prefix="/rooms", tags=["Chess Rooms"])
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Chess Platform API!"}
+
+
+@app.get("/database/stats")
+def database_stats():
+    return get_database_stats()
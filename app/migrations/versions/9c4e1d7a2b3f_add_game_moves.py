@@ -0,0 +1,33 @@
+"""Add game moves
+
+Revision ID: 9c4e1d7a2b3f
+Revises: 6f0375085c92
+Create Date: 2026-10-18 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e1d7a2b3f'
+down_revision: Union[str, None] = '6f0375085c92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('game_moves',
+    sa.Column('game_id', sa.Integer(), nullable=False),
+    sa.Column('ply', sa.SmallInteger(), nullable=False),
+    sa.Column('move', sa.SmallInteger(), nullable=False),
+    sa.Column('played_at', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+    sa.PrimaryKeyConstraint('game_id', 'ply')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('game_moves')
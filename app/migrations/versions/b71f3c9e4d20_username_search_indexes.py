@@ -0,0 +1,44 @@
+"""Username search indexes
+
+Revision ID: b71f3c9e4d20
+Revises: 9c4e1d7a2b3f
+Create Date: 2026-10-18 14:03:27.518940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71f3c9e4d20'
+down_revision: Union[str, None] = '9c4e1d7a2b3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Other databases search through app.services.username_index instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Substring matches, lower(username) LIKE '%abc%'
+    op.execute(
+        'CREATE INDEX ix_users_username_trgm ON users '
+        'USING gin (lower(username) gin_trgm_ops)'
+    )
+    # Prefix matches in index order, lower(username) COLLATE "C" LIKE 'abc%'
+    op.execute(
+        'CREATE INDEX ix_users_username_prefix ON users '
+        '((lower(username) COLLATE "C"), id)'
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_users_username_prefix', table_name='users')
+    op.drop_index('ix_users_username_trgm', table_name='users')
@@ -1,5 +1,15 @@
-from requests import Session
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON, Enum
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    Column,
+    Integer,
+    SmallInteger,
+    String,
+    Boolean,
+    ForeignKey,
+    JSON,
+    Enum,
+    Float,
+)
 from sqlalchemy.orm import relationship
 from app.database import Base
 import enum
@@ -56,7 +66,17 @@ class Game(Base):
     battle = relationship("Battle", back_populates="games")
 
 
-def create_battle(db: Session, battle_data):
+class GameMove(Base):
+    __tablename__ = "game_moves"
+
+    # One narrow row per ply, the color follows from the ply number
+    game_id = Column(Integer, ForeignKey("games.id"), primary_key=True)
+    ply = Column(SmallInteger, primary_key=True)
+    move = Column(SmallInteger, nullable=False)  # See utils.chess.encode_move
+    played_at = Column(Float, nullable=False)  # Unix timestamp
+
+
+async def create_battle(db: AsyncSession, battle_data):
     db_battle = Battle(
         type=battle_data.type,
         is_rating=battle_data.is_rating,
@@ -69,12 +89,12 @@ def create_battle(db: Session, battle_data):
         with_armaghedon=battle_data.with_armaghedon,
     )
     db.add(db_battle)
-    db.commit()
-    db.refresh(db_battle)
+    await db.commit()
+    await db.refresh(db_battle)
     return db_battle
 
 
-def create_game(db: Session, game_data):
+async def create_game(db: AsyncSession, game_data):
     db_game = Game(
         type=game_data.type,
         is_rating=game_data.is_rating,
@@ -85,6 +105,6 @@ def create_game(db: Session, game_data):
         moves=game_data.moves,
     )
     db.add(db_game)
-    db.commit()
-    db.refresh(db_game)
+    await db.commit()
+    await db.refresh(db_game)
     return db_game
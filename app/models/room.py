@@ -0,0 +1,240 @@
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import chess
+
+from app.utils.chess import TerminationTracker, decode_move, encode_move
+
+
+@dataclass(slots=True)
+class PlayerClock:
+    time: float  # Seconds
+    increment: float  # Seconds added after every move
+    remaining: Optional[float] = None  # Seconds left, as of the last move
+
+    def __post_init__(self):
+        if self.remaining is None:
+            self.remaining = self.time
+
+
+@dataclass(slots=True)
+class MoveRecord:
+    move: str
+    color: str
+    time: float  # Unix timestamp
+
+    def to_dict(self) -> dict:
+        return {"move": self.move, "color": self.color, "time": self.time}
+
+
+class MoveList:
+    """Moves of a board packed into two arrays.
+
+    Every move takes 2 bytes for the encoded move (see utils.chess.encode_move)
+    and 4 bytes for the float32 offset in seconds from the board start time.
+    ``MoveRecord`` objects are only built when a move is read.
+    """
+
+    __slots__ = ("codes", "offsets", "start_time", "white_first")
+
+    def __init__(self, start_time: float, white_first: bool = True):
+        self.codes = array("H")
+        self.offsets = array("f")
+        self.start_time = start_time
+        self.white_first = white_first
+
+    def append(self, move: str, played_at: float):
+        self.codes.append(encode_move(move))
+        self.offsets.append(played_at - self.start_time)
+
+    def color(self, index: int) -> str:
+        return "white" if (index % 2 == 0) == self.white_first else "black"
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> MoveRecord:
+        if index < 0:
+            index += len(self.codes)
+        return MoveRecord(
+            decode_move(self.codes[index]),
+            self.color(index),
+            self.start_time + self.offsets[index],
+        )
+
+    def __iter__(self) -> Iterator[MoveRecord]:
+        for index in range(len(self.codes)):
+            yield self[index]
+
+    def to_list(self) -> List[dict]:
+        return [record.to_dict() for record in self]
+
+
+@dataclass(slots=True)
+class ActiveBoard:
+    # board and termination are only built once the game starts, and stay
+    # None while the room's board lives in a board worker process, see
+    # services.board_pool
+    board: Optional[chess.Board]
+    start_fen: str
+    start_time: float
+    moves: MoveList
+    fen: str
+    termination: Optional[TerminationTracker]
+    game_id: Optional[int] = None
+    white: Optional[str] = None
+    black: Optional[str] = None
+    # When the side to move started thinking, None until the game starts
+    turn_started: Optional[float] = None
+
+    @classmethod
+    def create(cls, fen: Optional[str] = None) -> "ActiveBoard":
+        # Parsed once to validate and normalize the FEN, then dropped
+        board = chess.Board(fen or chess.STARTING_FEN)
+        start_fen = board.fen()
+        start_time = datetime.now().timestamp()
+        return cls(
+            board=None,
+            start_fen=start_fen,
+            start_time=start_time,
+            moves=MoveList(start_time, board.turn == chess.WHITE),
+            fen=start_fen,
+            termination=None,
+        )
+
+    def load_board(self):
+        """Builds the board and its tracker from the start position and the
+        moves played so far."""
+        board = chess.Board(self.start_fen)
+        # The moves were validated when they were played, skip legality checks
+        for code in self.moves.codes:
+            board.push(chess.Move.from_uci(decode_move(code)))
+
+        self.board = board
+        self.fen = board.fen()
+        self.termination = TerminationTracker(board)
+
+    def unload_board(self):
+        self.board = None
+        self.termination = None
+
+    def turn_color(self) -> str:
+        return self.moves.color(len(self.moves))
+
+    def player_id(self, color: str) -> Optional[str]:
+        return self.white if color == "white" else self.black
+
+    def set_player(self, color: str, user_id: Optional[str]):
+        if color == "white":
+            self.white = user_id
+        else:
+            self.black = user_id
+
+
+@dataclass(slots=True)
+class Room:
+    game_type: Optional[str]
+    is_rating: bool
+    games_count: int
+    opponent_time: float
+    opponent_increment: float
+    color_attach_mode: str
+    with_armaghedon: bool
+    active_board: ActiveBoard
+    players: Dict[str, PlayerClock]
+    connect_status: str = "pending"
+    battle_id: Optional[int] = None
+    messages: list = field(default_factory=list)
+
+    @classmethod
+    def create(
+        cls,
+        user_id: str,
+        game_type: Optional[str] = None,
+        is_rating: bool = False,
+        games_count: int = 1,
+        player_time: float = 300,
+        player_increment: float = 0,
+        opponent_time: float = 300,
+        opponent_increment: float = 0,
+        color_attach_mode: str = "random",
+        with_armaghedon: bool = False,
+        fen: Optional[str] = None,
+    ) -> "Room":
+        return cls(
+            game_type=game_type,
+            is_rating=is_rating,
+            games_count=games_count,
+            opponent_time=opponent_time,
+            opponent_increment=opponent_increment,
+            color_attach_mode=color_attach_mode,
+            with_armaghedon=with_armaghedon,
+            active_board=ActiveBoard.create(fen),
+            players={user_id: PlayerClock(player_time, player_increment)},
+        )
+
+    def to_state(self) -> dict:
+        """Plain JSON-able state, used for checkpoints."""
+        active_board = self.active_board
+        return {
+            "game_type": self.game_type,
+            "is_rating": self.is_rating,
+            "games_count": self.games_count,
+            "opponent_time": self.opponent_time,
+            "opponent_increment": self.opponent_increment,
+            "color_attach_mode": self.color_attach_mode,
+            "with_armaghedon": self.with_armaghedon,
+            "connect_status": self.connect_status,
+            "battle_id": self.battle_id,
+            "messages": self.messages,
+            "players": {
+                user_id: [clock.time, clock.increment, clock.remaining]
+                for user_id, clock in self.players.items()
+            },
+            "active_board": {
+                "game_id": active_board.game_id,
+                "white": active_board.white,
+                "black": active_board.black,
+                "start_fen": active_board.start_fen,
+                "start_time": active_board.start_time,
+                "turn_started": active_board.turn_started,
+                "codes": active_board.moves.codes.tobytes().hex(),
+                "offsets": active_board.moves.offsets.tobytes().hex(),
+            },
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Room":
+        """Inverse of ``to_state``, the board is left at the start position."""
+        board_state = state["active_board"]
+        active_board = ActiveBoard.create(board_state["start_fen"])
+        active_board.start_time = board_state["start_time"]
+        active_board.game_id = board_state["game_id"]
+        active_board.white = board_state["white"]
+        active_board.black = board_state["black"]
+        active_board.turn_started = board_state.get("turn_started")
+
+        moves = active_board.moves
+        moves.start_time = board_state["start_time"]
+        moves.codes.frombytes(bytes.fromhex(board_state["codes"]))
+        moves.offsets.frombytes(bytes.fromhex(board_state["offsets"]))
+
+        return cls(
+            game_type=state["game_type"],
+            is_rating=state["is_rating"],
+            games_count=state["games_count"],
+            opponent_time=state["opponent_time"],
+            opponent_increment=state["opponent_increment"],
+            color_attach_mode=state["color_attach_mode"],
+            with_armaghedon=state["with_armaghedon"],
+            active_board=active_board,
+            players={
+                user_id: PlayerClock(*clock)
+                for user_id, clock in state["players"].items()
+            },
+            connect_status=state["connect_status"],
+            battle_id=state["battle_id"],
+            messages=state["messages"],
+        )
@@ -0,0 +1,10 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class GameAnalysisRequest(BaseModel):
+    # Either a PGN or the id of a stored game
+    pgn: Optional[str] = None
+    game_id: Optional[int] = None
+    depth: Optional[int] = None
+    movetime: Optional[int] = None  # Milliseconds per position
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr
 
 
@@ -29,3 +29,9 @@ class UserAuthResponse(UserResponse):
 
     class Config:
         from_attributes = True
+
+
+class UserSearchPage(BaseModel):
+    users: List[UserResponse]
+    # Passed back as ?cursor= for the next page, None on the last one
+    next_cursor: Optional[str] = None
@@ -0,0 +1,220 @@
+import asyncio
+from collections import OrderedDict
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import chess
+import chess.engine
+import chess.polyglot
+import orjson
+
+from app.services.engine import describe_analysis
+
+# (depth reached, analysis, engine milliseconds it took)
+Entry = Tuple[int, Dict[str, Any], float]
+
+# The disk tier is trimmed back to its size once every this many writes
+TRIM_EVERY_WRITES = 256
+
+
+def position_key(board: chess.Board) -> int:
+    # Signed, so the key fits an SQLite INTEGER
+    key = chess.polyglot.zobrist_hash(board)
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class DiskTier:
+    """Analyses in a local SQLite file, shared by workers and kept across
+    restarts. Calls block, the cache runs them off the event loop."""
+
+    def __init__(self, path: str, max_size: int = 1_000_000):
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.db: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS analyses (position INTEGER PRIMARY KEY, "
+            "depth INTEGER, analysis BLOB, engine_ms REAL, stored_at REAL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS ix_analyses_stored_at "
+            "ON analyses (stored_at)"
+        )
+
+    def get(self, key: int) -> Optional[Entry]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT depth, analysis, engine_ms FROM analyses WHERE position = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], orjson.loads(row[1]), row[2]
+
+    def put(self, key: int, entry: Entry):
+        depth, analysis, engine_ms = entry
+        with self.lock, self.db:
+            # Never replaces a deeper analysis of the same position
+            self.db.execute(
+                "INSERT INTO analyses VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (position) DO UPDATE SET depth = excluded.depth, "
+                "analysis = excluded.analysis, engine_ms = excluded.engine_ms, "
+                "stored_at = excluded.stored_at WHERE excluded.depth >= depth",
+                (key, depth, orjson.dumps(analysis), engine_ms, time.time()),
+            )
+            self.writes += 1
+            if self.writes % TRIM_EVERY_WRITES == 0:
+                self.db.execute(
+                    "DELETE FROM analyses WHERE position IN (SELECT position FROM "
+                    "analyses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_size,),
+                )
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+class AnalysisCache:
+    """Engine analyses keyed by the position's Zobrist hash.
+
+    Only the deepest analysis of a position is kept, and it answers any
+    request for that depth or less. A memory LRU sits in front of an optional
+    SQLite tier. Concurrent requests for one position share a single search,
+    which is cancelled once every request waiting on it is gone.
+
+    The hash leaves out the move counters, so positions that only differ in
+    them share an analysis.
+    """
+
+    def __init__(
+        self,
+        analyse: Callable[[chess.Board, chess.engine.Limit], Awaitable[Any]],
+        max_size: int = 100_000,
+        disk: Optional[DiskTier] = None,
+    ):
+        self.engine_analyse = analyse
+        self.max_size = max_size
+        self.disk = disk
+        self.entries: "OrderedDict[int, Entry]" = OrderedDict()
+        # Searches in progress, with their depth and how many requests wait
+        self.flights: Dict[int, Tuple[int, asyncio.Task]] = {}
+        self.waiters: Dict[asyncio.Task, int] = {}
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.saved_engine_ms = 0.0
+
+    def remember(self, key: int, entry: Entry):
+        cached = self.entries.get(key)
+        if cached is None or cached[0] <= entry[0]:
+            self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    async def lookup(self, key: int, depth: int) -> Optional[Entry]:
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] >= depth:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        if self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None and entry[0] >= depth:
+                self.remember(key, entry)
+                self.disk_hits += 1
+                return entry
+        return None
+
+    async def search(self, key: int, board: chess.Board, limit: chess.engine.Limit):
+        started = time.perf_counter()
+        info = await self.engine_analyse(board, limit)
+        analysis = describe_analysis(info)
+        engine_ms = (time.perf_counter() - started) * 1000
+
+        # A search cut short by its time budget is stored at the depth reached
+        entry = (analysis["depth"] or 0, analysis, engine_ms)
+        self.remember(key, entry)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, entry)
+        return entry
+
+    async def analyse(
+        self, board: chess.Board, limit: chess.engine.Limit
+    ) -> Dict[str, Any]:
+        key = position_key(board)
+        depth = limit.depth or 0
+
+        entry = await self.lookup(key, depth)
+        if entry is not None:
+            self.saved_engine_ms += entry[2]
+            return entry[1]
+
+        flight = self.flights.get(key)
+        if flight is not None and flight[0] >= depth:
+            self.coalesced += 1
+            task = flight[1]
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self.search(key, board.copy(), limit))
+            self.flights[key] = (depth, task)
+            task.add_done_callback(lambda _: self.land(key, task))
+
+        self.waiters[task] = self.waiters.get(task, 0) + 1
+        try:
+            entry = await asyncio.shield(task)
+        finally:
+            self.waiters[task] -= 1
+            if not self.waiters[task]:
+                del self.waiters[task]
+                # Nobody is left to read the result, stop the search
+                task.cancel()
+                if self.flights.get(key, (0, None))[1] is task:
+                    del self.flights[key]
+
+        if flight is not None and flight[1] is task:
+            self.saved_engine_ms += entry[2]
+        return entry[1]
+
+    def land(self, key: int, task: asyncio.Task):
+        if self.flights.get(key, (0, None))[1] is task:
+            del self.flights[key]
+        if not task.cancelled():
+            # Retrieved by the waiters, marked as seen for tasks left without any
+            task.exception()
+
+    async def open(self):
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.open)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.coalesced + self.misses
+        return {
+            "size": len(self.entries),
+            "inFlight": len(self.flights),
+            "hits": self.hits,
+            "diskHits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hitRate": (
+                round((lookups - self.misses) / lookups, 4) if lookups else None
+            ),
+            "savedEngineMs": round(self.saved_engine_ms, 3),
+        }
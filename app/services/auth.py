@@ -1,18 +1,38 @@
-from fastapi import Request, HTTPException
+from fastapi import Request, HTTPException, WebSocket
 import jwt
 import datetime
+import time
 from typing import Optional
 
-from passlib.context import CryptContext
+from app.config import settings
 from app.schemas.auth import TokenData
 from app.services import auth
+from app.services.hashing import PasswordHasher
+from app.services.token_cache import TokenCache
 
 SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def create_pwd_context():
+    from passlib.context import CryptContext
+
+    # Hashes made with another number of rounds are replaced on the next login
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+    )
+
+
+password_hasher = PasswordHasher(
+    create_pwd_context,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE,
+)
+
+# Verified access tokens, so hot endpoints and reconnects skip jwt.decode
+token_cache = TokenCache(max_size=settings.TOKEN_CACHE_SIZE)
 
 
 def get_current_user(request: Request):
@@ -63,11 +83,40 @@ def create_refresh_token(
 
 
 def verify_access_token(token: str):
+    token_data = token_cache.get(token)
+    if token_data is not None:
+        return token_data
+
+    started = time.perf_counter()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return TokenData(**payload)
+        token_data = TokenData(**payload)
     except jwt.PyJWTError:
         return None
+    finally:
+        token_cache.record_verify(time.perf_counter() - started)
+
+    # Tokens without an expiry are valid, but only cached tokens that expire
+    if payload.get("exp") is not None:
+        token_cache.put(token, token_data, payload["exp"])
+    return token_data
+
+
+def verify_websocket_user(websocket: WebSocket, user_id: str) -> bool:
+    # Guest ids contain a dot and play without an account
+    if "." in user_id:
+        return True
+
+    # Browsers can not set headers on a websocket, so ?token= is accepted too
+    token = websocket.query_params.get("token")
+    authorization = websocket.headers.get("Authorization")
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        return False
+
+    token_data = verify_access_token(token)
+    return token_data is not None and str(token_data.id) == user_id
 
 
 def verify_refresh_token(token: str):
@@ -79,8 +128,9 @@ def verify_refresh_token(token: str):
 
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    # Blocks the calling thread, only for sync endpoints
+    return password_hasher.hash_blocking(password)
 
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.context.verify(plain_password, hashed_password)
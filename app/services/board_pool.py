@@ -0,0 +1,219 @@
+import asyncio
+from itertools import count
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+import signal
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import zlib
+
+import chess
+
+from app.utils.chess import TerminationTracker, decode_move, play_move, timeout_reason
+
+logger = logging.getLogger(__name__)
+
+# The start position and move codes of a room, what a worker needs to open it
+RoomState = Tuple[str, List[int]]
+
+
+class BoardWorkerExited(Exception):
+    """Raised when a room's worker died, and its replacement too, on one call."""
+
+
+def serve(connection: Connection):
+    """Main loop of a board worker, owns the boards of its rooms."""
+    # Shutdown is driven by the parent, not by the terminal's ctrl-c
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    boards: Dict[str, Tuple[chess.Board, TerminationTracker]] = {}
+
+    while True:
+        request = connection.recv()
+        if request is None:
+            return
+
+        request_id, op, room_id, argument = request
+        try:
+            if op == "open":
+                start_fen, codes = argument
+                board = chess.Board(start_fen)
+                for code in codes:
+                    board.push(chess.Move.from_uci(decode_move(code)))
+                boards[room_id] = (board, TerminationTracker(board))
+                result = None
+            elif op == "move":
+                board, termination = boards[room_id]
+                uci, ply = argument
+                result = play_move(board, termination, chess.Move.from_uci(uci), ply)
+            elif op == "flag":
+                result = timeout_reason(boards[room_id][0])
+            elif op == "close":
+                boards.pop(room_id, None)
+                result = None
+            else:
+                raise ValueError(f"Unknown board op {op!r}")
+        except Exception as error:
+            if request_id is not None:
+                connection.send((request_id, error, None))
+            continue
+
+        if request_id is not None:
+            connection.send((request_id, None, result))
+
+
+class BoardProcessPool:
+    """Boards of every room sharded over worker processes by room id.
+
+    Each worker owns the ``chess.Board`` of its rooms and does the
+    validation, push and game over detection, the event loop only pickles
+    requests and waits for replies. Requests for one room always go to the
+    same worker over one pipe, so they are handled in the order they were
+    sent.
+
+    A worker that dies is replaced at once and its rooms are opened again
+    from ``room_state``, the moves the manager recorded. A call that was
+    pending on it is retried once on the replacement.
+    """
+
+    def __init__(
+        self, processes: int, room_state: Callable[[str], Optional[RoomState]]
+    ):
+        self.size = processes
+        self.room_state = room_state
+        self.processes: List[multiprocessing.Process] = []
+        self.connections: List[Connection] = []
+        self.rooms: List[Set[str]] = [set() for _ in range(processes)]
+        self.pending: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self.request_ids = count(1)
+        self.requests = [0] * processes
+        self.restarts = 0
+        # Workers are also replaced long after startup, when the loop already
+        # runs threads and engine subprocesses, so they are never forked from
+        # this process. The fork server imports the worker code once.
+        self.context = multiprocessing.get_context("forkserver")
+        self.context.set_forkserver_preload([__name__])
+
+    def start(self):
+        for index in range(self.size):
+            process, connection = self.spawn(index)
+            self.processes.append(process)
+            self.connections.append(connection)
+
+    def spawn(self, index: int) -> Tuple[multiprocessing.Process, Connection]:
+        parent, child = self.context.Pipe()
+        process = self.context.Process(
+            target=serve, args=(child,), name=f"board-worker-{index}", daemon=True
+        )
+        process.start()
+        child.close()
+        asyncio.get_running_loop().add_reader(parent.fileno(), self.on_reply, index)
+        return process, parent
+
+    def restart(self, index: int):
+        logger.error("Board worker %s exited, restarting it", index)
+        self.restarts += 1
+
+        connection = self.connections[index]
+        asyncio.get_running_loop().remove_reader(connection.fileno())
+        connection.close()
+        if self.processes[index].is_alive():
+            self.processes[index].kill()
+
+        for request_id, (worker, future) in list(self.pending.items()):
+            if worker == index:
+                del self.pending[request_id]
+                if not future.done():
+                    future.set_exception(BoardWorkerExited())
+
+        self.processes[index], self.connections[index] = self.spawn(index)
+        # Requests sent from now on queue up behind the rooms being reopened
+        for room_id in list(self.rooms[index]):
+            state = self.room_state(room_id)
+            if state is None:
+                self.rooms[index].discard(room_id)
+            else:
+                self.connections[index].send((None, "open", room_id, state))
+
+    def shard(self, room_id: str) -> int:
+        return zlib.crc32(room_id.encode()) % self.size
+
+    def send(self, room_id: str, op: str, argument: Any = None, request_id=None):
+        index = self.shard(room_id)
+        self.requests[index] += 1
+        try:
+            self.connections[index].send((request_id, op, room_id, argument))
+        except OSError:
+            # Died before its end of the pipe was seen closing. Rooms opened
+            # or closed by this request are taken care of by the restart.
+            self.restart(index)
+            if request_id is not None:
+                raise BoardWorkerExited()
+        return index
+
+    async def call(self, room_id: str, op: str, argument: Any = None):
+        for attempt in range(2):
+            request_id = next(self.request_ids)
+            future = asyncio.get_running_loop().create_future()
+            try:
+                index = self.send(room_id, op, argument, request_id)
+                self.pending[request_id] = (index, future)
+                return await future
+            except BoardWorkerExited:
+                if attempt:
+                    raise
+
+    def on_reply(self, index: int):
+        connection = self.connections[index]
+        try:
+            while connection.poll():
+                request_id, error, result = connection.recv()
+                _, future = self.pending.pop(request_id)
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        except (EOFError, OSError):
+            self.restart(index)
+
+    def open(self, room_id: str, start_fen: str, codes: List[int]):
+        self.rooms[self.shard(room_id)].add(room_id)
+        self.send(room_id, "open", (start_fen, codes))
+
+    async def move(
+        self, room_id: str, uci: str, ply: int
+    ) -> Optional[Tuple[Optional[str], str]]:
+        return await self.call(room_id, "move", (uci, ply))
+
+    async def timeout_reason(self, room_id: str) -> str:
+        return await self.call(room_id, "flag")
+
+    def close_room(self, room_id: str):
+        self.rooms[self.shard(room_id)].discard(room_id)
+        self.send(room_id, "close")
+
+    def close(self):
+        loop = asyncio.get_running_loop()
+        for connection in self.connections:
+            loop.remove_reader(connection.fileno())
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "processes": self.size,
+            "alive": sum(process.is_alive() for process in self.processes),
+            "pending": len(self.pending),
+            "requests": self.requests,
+            "restarts": self.restarts,
+        }
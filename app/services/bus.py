@@ -0,0 +1,172 @@
+from abc import ABC, abstractmethod
+import asyncio
+import fcntl
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+# Snapshots carry whole move lists, well above asyncio's 64 KiB line default
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+
+class MessageBus(ABC):
+    """Delivers JSON messages between the nodes of a cluster.
+
+    Messages published to the same node arrive in the order they were sent.
+    Backends implement ``start`` and ``publish``, and ``close`` if they hold
+    anything to release.
+    """
+
+    def __init__(self, node_id: Optional[str], nodes: List[str]):
+        self.node_id = node_id
+        self.nodes = nodes
+        self.published = 0
+        self.received = 0
+
+    @abstractmethod
+    async def start(self, handler: Handler):
+        """Starts receiving messages for this node, passed to ``handler``."""
+
+    @abstractmethod
+    async def publish(self, node_id: str, message: dict):
+        """Sends ``message`` to ``node_id``."""
+
+    async def close(self):
+        pass
+
+    async def dispatch(self, handler: Handler, message: dict):
+        self.received += 1
+        try:
+            await handler(message)
+        except Exception:
+            logger.exception("Failed to handle %s bus message", message.get("type"))
+
+    def stats(self):
+        return {
+            "nodeId": self.node_id,
+            "published": self.published,
+            "received": self.received,
+        }
+
+
+class InMemoryBus(MessageBus):
+    """Bus between nodes living in the same process, used by tests.
+
+    Messages still go through JSON so nothing unserializable slips through.
+    """
+
+    registry: Dict[str, "InMemoryBus"] = {}
+
+    async def start(self, handler: Handler):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.registry[self.node_id] = self
+        self.task = asyncio.create_task(self.run(handler))
+
+    async def run(self, handler: Handler):
+        while True:
+            message = json.loads(await self.queue.get())
+            await self.dispatch(handler, message)
+
+    async def publish(self, node_id: str, message: dict):
+        self.published += 1
+        self.registry[node_id].queue.put_nowait(json.dumps(message))
+
+    async def close(self):
+        self.registry.pop(self.node_id, None)
+        self.task.cancel()
+
+
+class UnixSocketBus(MessageBus):
+    """Bus over UNIX sockets in ``socket_dir``, one socket per node.
+
+    Every node listens on ``<socket_dir>/<node_id>.sock`` and messages are
+    newline delimited JSON. Without a ``node_id`` the bus claims the first
+    node of the cluster whose socket is free, which lets
+    ``uvicorn --workers N`` run one node per worker from the same settings.
+    """
+
+    def __init__(self, node_id: Optional[str], nodes: List[str], socket_dir: str):
+        super().__init__(node_id, nodes)
+        self.socket_dir = socket_dir
+        self.writers: Dict[str, asyncio.StreamWriter] = {}
+        self.connect_lock = asyncio.Lock()
+        self.lock_file = None
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    def socket_path(self, node_id: str) -> str:
+        return os.path.join(self.socket_dir, f"{node_id}.sock")
+
+    async def start(self, handler: Handler):
+        os.makedirs(self.socket_dir, exist_ok=True)
+
+        async def on_connection(reader, writer):
+            try:
+                while line := await reader.readline():
+                    await self.dispatch(handler, json.loads(line))
+            finally:
+                writer.close()
+
+        candidates = [self.node_id] if self.node_id else self.nodes
+        for node_id in candidates:
+            # The lock is held for the life of the process and released by the
+            # kernel if it dies, so a crashed node's slot can be taken again
+            lock_file = open(os.path.join(self.socket_dir, f"{node_id}.lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+
+            self.lock_file = lock_file
+            self.node_id = node_id
+            self.server = await asyncio.start_unix_server(
+                on_connection, self.socket_path(node_id), limit=MAX_MESSAGE_SIZE
+            )
+            return
+
+        raise RuntimeError(f"No free bus socket for nodes {candidates}")
+
+    async def publish(self, node_id: str, message: dict):
+        writer = self.writers.get(node_id)
+        if writer is None or writer.is_closing():
+            # One stream per peer, otherwise messages could be reordered
+            async with self.connect_lock:
+                writer = self.writers.get(node_id)
+                if writer is None or writer.is_closing():
+                    _, writer = await asyncio.open_unix_connection(
+                        self.socket_path(node_id)
+                    )
+                    self.writers[node_id] = writer
+
+        writer.write(json.dumps(message).encode() + b"\n")
+        self.published += 1
+        try:
+            await writer.drain()
+        except ConnectionError:
+            del self.writers[node_id]
+            raise
+
+    async def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        if self.server is not None:
+            self.server.close()
+            if os.path.exists(self.socket_path(self.node_id)):
+                os.unlink(self.socket_path(self.node_id))
+        if self.lock_file is not None:
+            self.lock_file.close()
+
+
+def create_bus(
+    backend: str, node_id: Optional[str], nodes: List[str], socket_dir: str
+) -> MessageBus:
+    if backend == "memory":
+        return InMemoryBus(node_id, nodes)
+    if backend == "unix":
+        return UnixSocketBus(node_id, nodes, socket_dir)
+    raise ValueError(f"Unknown message bus backend {backend!r}")
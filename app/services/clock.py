@@ -0,0 +1,90 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stale heap entries are dropped in one pass once they outnumber live ones
+COMPACT_MIN_SIZE = 1024
+
+
+class ClockScheduler:
+    """Flag deadlines of every room, served by a single task.
+
+    Deadlines are Unix timestamps kept on one heap. Rescheduling a room only
+    pushes a new entry, the old one is recognised as stale and skipped when
+    it reaches the top, so a move costs O(log n) and a tick only touches the
+    deadlines that actually expired.
+    """
+
+    def __init__(self, on_flag: Callable[[str], Awaitable[None]]):
+        self.on_flag = on_flag
+        self.heap: List[Tuple[float, str]] = []
+        self.deadlines: Dict[str, float] = {}
+        self.wakeup = asyncio.Event()
+
+        self.flagged_total = 0
+        self.max_lag_seconds = 0.0
+
+    def schedule(self, room_id: str, deadline: float):
+        self.deadlines[room_id] = deadline
+        heapq.heappush(self.heap, (deadline, room_id))
+
+        # Only an earlier deadline than the one being waited for needs a wakeup
+        if self.heap[0][0] == deadline:
+            self.wakeup.set()
+
+        if len(self.heap) > max(COMPACT_MIN_SIZE, 2 * len(self.deadlines)):
+            self.compact()
+
+    def cancel(self, room_id: str):
+        self.deadlines.pop(room_id, None)
+
+    def compact(self):
+        self.heap = [
+            (deadline, room_id)
+            for deadline, room_id in self.heap
+            if self.deadlines.get(room_id) == deadline
+        ]
+        heapq.heapify(self.heap)
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            timeout = None
+
+            while self.heap:
+                deadline, room_id = self.heap[0]
+                if self.deadlines.get(room_id) != deadline:
+                    heapq.heappop(self.heap)
+                    continue
+
+                now = time.time()
+                if deadline > now:
+                    timeout = deadline - now
+                    break
+
+                heapq.heappop(self.heap)
+                del self.deadlines[room_id]
+                self.flagged_total += 1
+                self.max_lag_seconds = max(self.max_lag_seconds, now - deadline)
+
+                try:
+                    await self.on_flag(room_id)
+                except Exception:
+                    logger.exception("Failed to flag room %s", room_id)
+
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scheduled": len(self.deadlines),
+            "heapSize": len(self.heap),
+            "flaggedTotal": self.flagged_total,
+            "maxLagMs": round(self.max_lag_seconds * 1000, 3),
+        }
@@ -0,0 +1,66 @@
+from bisect import bisect
+import hashlib
+from typing import List, Tuple
+
+from app.services.bus import MessageBus
+from app.services.encoding import JSON, Frame
+
+
+class HashRing:
+    """Consistent hashing of room ids onto cluster nodes.
+
+    Each node is placed ``replicas`` times on the ring, so adding or removing a
+    node only moves about ``1 / len(nodes)`` of the rooms.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = 64):
+        self.nodes = nodes
+        self.ring: List[Tuple[int, str]] = sorted(
+            (self.hash(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self.points = [point for point, _ in self.ring]
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest())
+
+    def owner(self, key: str) -> str:
+        index = bisect(self.points, self.hash(key)) % len(self.ring)
+        return self.ring[index][1]
+
+
+class RemoteWebSocket:
+    """Stands in for a websocket that is connected to another node.
+
+    Frames are wrapped in ``deliver`` messages and published to the node that
+    holds the real socket, so room code can treat local and remote players
+    the same way.
+    """
+
+    def __init__(self, bus: MessageBus, node_id: str, user_id: str):
+        self.bus = bus
+        self.node_id = node_id
+        self.user_id = user_id
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        if isinstance(message, Frame):
+            await self.send_text(message.encode(JSON))
+            return
+        await self.publish({"type": "deliver", "message": message})
+
+    async def send_text(self, text: str):
+        await self.publish({"type": "deliver", "text": text})
+
+    async def close(self, code: int = 1000):
+        await self.publish({"type": "close", "code": code})
+
+    async def publish(self, message: dict):
+        await self.bus.publish(
+            self.node_id,
+            {**message, "user_id": self.user_id, "origin": self.bus.node_id},
+        )
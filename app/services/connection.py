@@ -0,0 +1,143 @@
+import asyncio
+from collections import deque
+import logging
+import time
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import WebSocket
+
+from app.services.encoding import JSON, encode
+
+logger = logging.getLogger(__name__)
+
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+
+
+class OutboundConnection:
+    """Bounded outbound queue with its own writer task for one websocket.
+
+    Broadcasts only enqueue frames, so a slow client never delays the other
+    players. When the buffer is full the ``policy`` decides what happens:
+    ``coalesce`` drops the queued frames and sends a single snapshot of the
+    room instead, ``disconnect`` closes the socket. Messages are encoded by
+    the writer with the connection's ``encoder``, pre-encoded ``Frame``
+    objects are shared between connections.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: str,
+        snapshot: Callable[[str, str], Optional[dict]],
+        max_size: int = 64,
+        policy: str = COALESCE,
+        latency_samples: int = 256,
+        encoder=JSON,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.snapshot = snapshot
+        self.max_size = max_size
+        self.policy = policy
+        self.encoder = encoder
+
+        self.queue: Deque[Tuple[Any, Optional[str], float]] = deque()
+        self.resync_room_id: Optional[str] = None
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.latencies: Deque[float] = deque(maxlen=latency_samples)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def send(self, message: Any, room_id: Optional[str] = None) -> bool:
+        if self.closed:
+            return False
+
+        if len(self.queue) >= self.max_size:
+            self.dropped += len(self.queue) + 1
+
+            if self.policy == DISCONNECT or room_id is None:
+                logger.warning("Closing slow websocket of user %s", self.user_id)
+                self.close(code=1013)
+                return False
+
+            # Drop the backlog, the client gets the full room state instead
+            self.queue.clear()
+            self.resync_room_id = room_id
+            self.coalesced += 1
+        else:
+            self.queue.append((message, room_id, time.perf_counter()))
+
+        self.ready.set()
+        return True
+
+    async def run(self):
+        while not self.closed:
+            while not self.queue and self.resync_room_id is None:
+                self.ready.clear()
+                await self.ready.wait()
+
+            if self.resync_room_id is not None:
+                message = self.snapshot(self.resync_room_id, self.user_id)
+                queued_at = time.perf_counter()
+                self.resync_room_id = None
+                if message is None:
+                    continue
+            else:
+                message, _, queued_at = self.queue.popleft()
+
+            try:
+                payload = encode(self.encoder, message)
+                if isinstance(payload, bytes):
+                    await self.websocket.send_bytes(payload)
+                else:
+                    await self.websocket.send_text(payload)
+            except Exception:
+                self.closed = True
+                break
+
+            self.sent += 1
+            self.latencies.append(time.perf_counter() - queued_at)
+
+    def close(self, code: Optional[int] = None):
+        if self.closed:
+            return
+
+        self.closed = True
+        self.queue.clear()
+        if self.task is not None:
+            self.task.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        if latencies:
+            latency = {
+                "avgMs": round(sum(latencies) / len(latencies) * 1000, 3),
+                "p99Ms": round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 3),
+                "maxMs": round(latencies[-1] * 1000, 3),
+            }
+        else:
+            latency = {"avgMs": None, "p99Ms": None, "maxMs": None}
+
+        return {
+            "queued": len(self.queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "sendLatency": latency,
+        }
@@ -0,0 +1,137 @@
+from bisect import bisect_left
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    """Counts of observations per latency bucket, cheap enough for every query.
+
+    Quantiles are reported as the upper bound of the bucket they fall in.
+    Observations past the last bound go to an overflow bucket and report
+    that last bound.
+    """
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, ms: float):
+        index = bisect_left(self.bounds, ms)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum_ms += ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[min(index, len(self.bounds) - 1)]
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        buckets = {
+            f"le{bound}": count for bound, count in zip(self.bounds, self.counts)
+        }
+        buckets["overflow"] = self.counts[-1]
+        return {
+            "count": self.total,
+            "meanMs": round(self.sum_ms / self.total, 3) if self.total else None,
+            "p50Ms": self.quantile(0.5),
+            "p99Ms": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+# Both histograms are shared by the sync and async engines
+checkout_wait = Histogram()
+query_latency = Histogram()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool recording how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            checkout_wait.observe((time.perf_counter() - started) * 1000)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """The asyncio flavour of ``TimedQueuePool``."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            checkout_wait.observe((time.perf_counter() - started) * 1000)
+
+
+class StatementLogger:
+    """Times every statement and logs a sample of them.
+
+    Replaces ``echo=True``: a ``sample_rate`` fraction of statements is
+    logged at INFO, and any statement slower than ``slow_ms`` at WARNING.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, slow_ms: float = 250.0):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.logged = 0
+        self.slow = 0
+
+    def attach(self, engine: Engine):
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+        event.listen(engine, "handle_error", self.handle_error)
+
+    def before_cursor_execute(self, conn, cursor, statement, *args):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, *args):
+        ms = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+        query_latency.observe(ms)
+
+        if ms >= self.slow_ms:
+            self.slow += 1
+            logger.warning("Slow statement (%.1f ms): %s", ms, statement)
+        elif self.sample_rate and random.random() < self.sample_rate:
+            self.logged += 1
+            logger.info("Statement (%.1f ms): %s", ms, statement)
+
+    def handle_error(self, context):
+        # A failed statement never reaches after_cursor_execute
+        connection = context.connection
+        started = connection.info.get("query_started") if connection else None
+        if started:
+            started.pop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sampleRate": self.sample_rate,
+            "sampled": self.logged,
+            "slowMs": self.slow_ms,
+            "slow": self.slow,
+        }
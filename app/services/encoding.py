@@ -0,0 +1,229 @@
+import struct
+from typing import Any, Dict, Optional, Union
+
+import chess
+from fastapi import WebSocket, WebSocketDisconnect
+import orjson
+
+from app.utils.chess import decode_move, encode_move
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, clients asking for it get JSON
+    msgpack = None
+
+Payload = Union[str, bytes]
+
+
+class JsonEncoder:
+    """JSON in text frames, the default."""
+
+    name = "json"
+    shared = True
+
+    def encode(self, message: Any) -> str:
+        return orjson.dumps(message).decode()
+
+    def decode(self, payload: Payload) -> Any:
+        return orjson.loads(payload)
+
+
+class MsgpackEncoder:
+    """MessagePack in binary frames, asked for with ``?encoding=msgpack``."""
+
+    name = "msgpack"
+    shared = True
+
+    def encode(self, message: Any) -> bytes:
+        return msgpack.packb(message)
+
+    def decode(self, payload: Payload) -> Any:
+        return msgpack.unpackb(payload)
+
+
+JSON = JsonEncoder()
+
+ENCODERS: Dict[str, Any] = {JSON.name: JSON}
+if msgpack is not None:
+    ENCODERS[MsgpackEncoder.name] = MsgpackEncoder()
+
+
+def get_encoder(name: Optional[str]):
+    return ENCODERS.get(name or JSON.name, JSON)
+
+
+class Frame:
+    """A message encoded at most once per encoding.
+
+    Broadcasts and fixed replies are wrapped in a frame so every receiver
+    that speaks the same encoding is sent the same cached payload.
+    """
+
+    __slots__ = ("message", "payloads")
+
+    def __init__(self, message: dict):
+        self.message = message
+        self.payloads: Dict[str, Payload] = {}
+
+    def encode(self, encoder) -> Payload:
+        payload = self.payloads.get(encoder.name)
+        if payload is None:
+            payload = self.payloads[encoder.name] = encoder.encode(self.message)
+        return payload
+
+
+# Opt-in binary protocol for moves, negotiated with this websocket subprotocol
+BINARY_SUBPROTOCOL = "chess.binary.v1"
+
+OP_MOVE = 1
+# opcode, room handle, move (see utils.chess.encode_move)
+CLIENT_MOVE = struct.Struct("!BHH")
+# opcode, room handle, move, seq, white clock ms, black clock ms, game over
+SERVER_MOVE = struct.Struct("!BHHHIIB")
+
+# Index of the reason in a SERVER_MOVE frame, 0 while the game goes on and
+# 255 for reasons missing from this list
+GAME_OVER_REASONS = [
+    "",
+    "Checkmate! Game Over.",
+    "Stalemate! The game is a draw.",
+    "Draw! Insufficient material.",
+    "Draw! 50-move rule.",
+    "Draw! Threefold repetition.",
+    "Time out! Game Over.",
+    "Draw! Time out with insufficient material.",
+]
+GAME_OVER_CODES = {reason: code for code, reason in enumerate(GAME_OVER_REASONS)}
+
+
+class BinaryEncoder:
+    """Fixed-size binary frames for moves, JSON text for everything else.
+
+    Rooms are referred to by a 16-bit handle instead of their id. Handles
+    belong to one connection and are announced as ``"handle"`` in every
+    JSON message that carries a game, so an encoder is never shared.
+    """
+
+    name = "binary"
+    shared = False
+
+    def __init__(self):
+        self.handles: Dict[str, int] = {}
+        self.rooms: Dict[int, str] = {}
+
+    def handle(self, room_id: str) -> Optional[int]:
+        handle = self.handles.get(room_id)
+        if handle is None and len(self.handles) < 0xFFFF:
+            handle = len(self.handles) + 1
+            self.handles[room_id] = handle
+            self.rooms[handle] = room_id
+        return handle
+
+    def encode(self, message: Any) -> Payload:
+        frame = message if isinstance(message, Frame) else None
+        if frame is not None:
+            message = frame.message
+        elif isinstance(message, str):
+            message = JSON.decode(message)
+
+        if message.get("op") == "move" and message.get("roomId") in self.handles:
+            record = message["move"]
+            clocks = message["clocks"]
+            return SERVER_MOVE.pack(
+                OP_MOVE,
+                self.handles[message["roomId"]],
+                encode_move(record["move"]) if record else 0,
+                message["seq"],
+                clocks.get("white", 0),
+                clocks.get("black", 0),
+                GAME_OVER_CODES.get(message["gameOverReason"], 255),
+            )
+
+        if "game" in message:
+            message = {**message, "handle": self.handle(message["game"]["roomId"])}
+        elif frame is not None:
+            return frame.encode(JSON)
+        return JSON.encode(message)
+
+    def decode(self, payload: Payload) -> Any:
+        if len(payload) != CLIENT_MOVE.size:
+            return {}
+
+        opcode, handle, code = CLIENT_MOVE.unpack(payload)
+        promotion = code >> 12
+        if (
+            opcode != OP_MOVE
+            or handle not in self.rooms
+            or promotion and not chess.KNIGHT <= promotion <= chess.QUEEN
+        ):
+            return {}
+        return {"move": decode_move(code), "room_id": self.rooms[handle]}
+
+
+def encode(encoder, message: Any) -> Payload:
+    if not encoder.shared:
+        return encoder.encode(message)
+    if isinstance(message, Frame):
+        return message.encode(encoder)
+    if isinstance(message, str):
+        # Already JSON, only re-encoded for clients that do not speak it
+        return message if encoder is JSON else encoder.encode(JSON.decode(message))
+    return encoder.encode(message)
+
+
+class EncodedWebSocket:
+    """A player's websocket speaking the encoding the client negotiated.
+
+    ``send_json`` and ``receive_json`` keep their names so room code does not
+    care which encoding is on the wire.
+    """
+
+    def __init__(
+        self, websocket: WebSocket, encoder=JSON, subprotocol: Optional[str] = None
+    ):
+        self.websocket = websocket
+        self.encoder = encoder
+        self.subprotocol = subprotocol
+
+    @property
+    def query_params(self):
+        return self.websocket.query_params
+
+    async def accept(self, subprotocol: Optional[str] = None):
+        await self.websocket.accept(subprotocol=subprotocol or self.subprotocol)
+
+    async def close(self, code: int = 1000):
+        await self.websocket.close(code=code)
+
+    async def send_text(self, text: str):
+        await self.websocket.send_text(text)
+
+    async def send_bytes(self, data: bytes):
+        await self.websocket.send_bytes(data)
+
+    async def send_payload(self, payload: Payload):
+        if isinstance(payload, bytes):
+            await self.websocket.send_bytes(payload)
+        else:
+            await self.websocket.send_text(payload)
+
+    async def send_json(self, message: Any):
+        await self.send_payload(encode(self.encoder, message))
+
+    async def receive_json(self) -> Dict[str, Any]:
+        """The next message as a dict, ``{}`` for anything that does not
+        decode to one, which rooms answer as an invalid message."""
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+
+        try:
+            # Text frames are always JSON, whatever was negotiated
+            if message.get("text") is not None:
+                data = JSON.decode(message["text"])
+            else:
+                data = self.encoder.decode(message["bytes"])
+        except ValueError:
+            # orjson and msgpack both raise ValueError subclasses
+            return {}
+        return data if isinstance(data, dict) else {}
@@ -0,0 +1,216 @@
+import asyncio
+from collections import deque
+import logging
+import os
+import shlex
+import time
+from typing import Any, Deque, Dict, Optional, Set
+
+import chess
+import chess.engine
+
+logger = logging.getLogger(__name__)
+
+# Extra time an engine gets past its budget before it is considered hung
+HANG_GRACE_SECONDS = 5.0
+MAX_RESTART_DELAY = 30.0
+
+
+class EngineBusy(Exception):
+    """Raised instead of queueing when every engine is busy and the queue is full."""
+
+
+class EngineUnavailable(Exception):
+    """Raised when no engine is running, or it died twice on one request."""
+
+
+class EnginePool:
+    """Long-lived UCI engine processes shared by every analysis request.
+
+    Idle engines wait on a queue, a request takes one, analyses and hands it
+    back, so requests beyond the pool size are served in arrival order. At
+    most ``max_queue`` requests wait, the rest fail fast with ``EngineBusy``.
+    A cancelled request stops the engine's search and frees it at once. An
+    engine that dies or hangs is replaced in the background and the request
+    is retried once on another one.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        size: int = 0,
+        options: Optional[Dict[str, Any]] = None,
+        max_queue: int = 64,
+        default_depth: int = 18,
+        max_depth: int = 30,
+        max_time_ms: int = 5000,
+    ):
+        self.command = command
+        # One engine per core, each engine searching on a single thread
+        self.size = size or os.cpu_count() or 1
+        self.options = {"Threads": 1, **(options or {})}
+        self.max_queue = max_queue
+        self.default_depth = default_depth
+        self.max_depth = max_depth
+        self.max_time_ms = max_time_ms
+
+        self.engines: Set[chess.engine.Protocol] = set()
+        self.idle: "asyncio.Queue[chess.engine.Protocol]" = asyncio.Queue()
+        self.restarts: Set[asyncio.Task] = set()
+        self.waiting = 0
+        self.closed = False
+
+        self.completed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.crashes = 0
+        self.latencies: Deque[float] = deque(maxlen=1024)
+        self.queue_waits: Deque[float] = deque(maxlen=1024)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.command)
+
+    async def start(self):
+        if self.enabled:
+            await asyncio.gather(*(self.spawn() for _ in range(self.size)))
+
+    async def spawn(self) -> bool:
+        try:
+            _, engine = await chess.engine.popen_uci(shlex.split(self.command))
+            await engine.configure(
+                {
+                    name: value
+                    for name, value in self.options.items()
+                    if name in engine.options
+                }
+            )
+        except Exception:
+            logger.exception("Failed to start engine %s", self.command)
+            return False
+
+        self.engines.add(engine)
+        self.idle.put_nowait(engine)
+        return True
+
+    async def restart(self, engine: chess.engine.Protocol):
+        self.engines.discard(engine)
+        await self.quit(engine)
+
+        delay = 1.0
+        while not self.closed and not await self.spawn():
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+
+    def restart_in_background(self, engine: chess.engine.Protocol):
+        task = asyncio.create_task(self.restart(engine))
+        self.restarts.add(task)
+        task.add_done_callback(self.restarts.discard)
+
+    async def quit(self, engine: chess.engine.Protocol):
+        try:
+            await asyncio.wait_for(engine.quit(), timeout=1)
+        except Exception:
+            # Already dead or hung, closing the transport kills the process
+            engine.transport.close()
+
+    def limit(
+        self, depth: Optional[int] = None, time_ms: Optional[int] = None
+    ) -> chess.engine.Limit:
+        """Clamps a request's budget, every search is bounded in time."""
+        depth = min(depth or self.default_depth, self.max_depth)
+        time_ms = min(time_ms or self.max_time_ms, self.max_time_ms)
+        return chess.engine.Limit(depth=depth, time=time_ms / 1000)
+
+    async def acquire(self) -> chess.engine.Protocol:
+        if self.idle.empty() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise EngineBusy()
+
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            return await self.idle.get()
+        finally:
+            self.waiting -= 1
+            self.queue_waits.append(time.perf_counter() - started)
+
+    async def analyse(
+        self, board: chess.Board, limit: chess.engine.Limit
+    ) -> chess.engine.InfoDict:
+        if not self.engines:
+            raise EngineUnavailable()
+
+        for _ in range(2):
+            engine = await self.acquire()
+            started = time.perf_counter()
+            try:
+                info = await asyncio.wait_for(
+                    engine.analyse(board, limit),
+                    timeout=(limit.time or 0) + HANG_GRACE_SECONDS,
+                )
+            except asyncio.CancelledError:
+                # The search is stopped and the engine ready for the next one
+                self.cancelled += 1
+                self.idle.put_nowait(engine)
+                raise
+            except (asyncio.TimeoutError, chess.engine.EngineError):
+                self.crashes += 1
+                logger.warning("Engine died or hung, restarting it", exc_info=True)
+                self.restart_in_background(engine)
+                continue
+
+            self.idle.put_nowait(engine)
+            self.completed += 1
+            self.latencies.append(time.perf_counter() - started)
+            return info
+
+        raise EngineUnavailable()
+
+    async def close(self):
+        self.closed = True
+        for task in list(self.restarts):
+            task.cancel()
+        await asyncio.gather(*(self.quit(engine) for engine in self.engines))
+        self.engines.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        queue_waits = sorted(self.queue_waits)
+        return {
+            "size": self.size,
+            "alive": len(self.engines),
+            "idle": self.idle.qsize(),
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "crashes": self.crashes,
+            "p99Ms": (
+                round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 3)
+                if latencies
+                else None
+            ),
+            "queueWaitP99Ms": (
+                round(queue_waits[int(0.99 * (len(queue_waits) - 1))] * 1000, 3)
+                if queue_waits
+                else None
+            ),
+        }
+
+
+def describe_analysis(info: chess.engine.InfoDict) -> Dict[str, Any]:
+    """The engine's answer as JSON, scores from white's point of view."""
+    score = info.get("score")
+    pv = info.get("pv") or []
+    return {
+        "best_move": pv[0].uci() if pv else None,
+        "score": (
+            {"cp": score.white().score(), "mate": score.white().mate()}
+            if score is not None
+            else None
+        ),
+        "depth": info.get("depth"),
+        "pv": [move.uci() for move in pv],
+        "nodes": info.get("nodes"),
+    }
@@ -0,0 +1,131 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import chess
+import chess.engine
+
+# Stands in for a forced mate when scores are compared in centipawns
+MATE_CP = 10000
+# Past this a position is won either way, losing more of it is no mistake
+EVAL_CLAMP_CP = 1000
+# Centipawns the mover gave away, from the worst label down
+CLASSIFICATIONS = ((300, "blunder"), (100, "mistake"), (50, "inaccuracy"))
+
+
+def white_cp(board: chess.Board, analysis: Optional[Dict[str, Any]]) -> int:
+    """The evaluation of a position in centipawns for white."""
+    if analysis is None or analysis["score"] is None:
+        # Game over, or nothing the engine could score
+        if board.is_checkmate():
+            return -MATE_CP if board.turn == chess.WHITE else MATE_CP
+        return 0
+
+    score = analysis["score"]
+    if score["cp"] is not None:
+        return score["cp"]
+    if score["mate"]:
+        return MATE_CP if score["mate"] > 0 else -MATE_CP
+    # Mate in 0, the side to move is mated
+    return -MATE_CP if board.turn == chess.WHITE else MATE_CP
+
+
+def clamp(cp: int) -> int:
+    return max(-EVAL_CLAMP_CP, min(EVAL_CLAMP_CP, cp))
+
+
+def classify(loss: int) -> Optional[str]:
+    for threshold, label in CLASSIFICATIONS:
+        if loss >= threshold:
+            return label
+    return None
+
+
+async def review_game(
+    analyse: Callable[[chess.Board, chess.engine.Limit], Awaitable[Dict[str, Any]]],
+    board: chess.Board,
+    moves: List[chess.Move],
+    limit: chess.engine.Limit,
+    concurrency: int,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Analyses every position of a game in parallel and yields each ply as
+    soon as the positions before and after it are both analysed, so plies
+    arrive in completion order, not in game order. A summary comes last.
+
+    At most ``concurrency`` positions are in the engine pool at once, so one
+    review cannot fill the pool's queue on its own.
+    """
+    positions = [board.copy(stack=False)]
+    sans = []
+    for move in moves:
+        sans.append(positions[-1].san(move))
+        position = positions[-1].copy(stack=False)
+        position.push(move)
+        positions.append(position)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def evaluate(index: int):
+        position = positions[index]
+        if position.is_game_over():
+            return index, None
+        async with semaphore:
+            return index, await analyse(position, limit)
+
+    analyses: Dict[int, Optional[Dict[str, Any]]] = {}
+    evaluations: Dict[int, int] = {}
+    totals = {
+        color: {"moves": 0, "loss": 0, **{label: 0 for _, label in CLASSIFICATIONS}}
+        for color in ("white", "black")
+    }
+
+    def review_ply(ply: int) -> Dict[str, Any]:
+        # Ply n is the move from position n - 1 to position n
+        before, after = positions[ply - 1], positions[ply]
+        sign = 1 if before.turn == chess.WHITE else -1
+        loss = max(0, sign * (clamp(evaluations[ply - 1]) - clamp(evaluations[ply])))
+        classification = classify(loss)
+
+        color = totals["white" if before.turn == chess.WHITE else "black"]
+        color["moves"] += 1
+        color["loss"] += loss
+        if classification is not None:
+            color[classification] += 1
+
+        best = analyses[ply - 1]
+        return {
+            "ply": ply,
+            "move": moves[ply - 1].uci(),
+            "san": sans[ply - 1],
+            "fen": after.fen(),
+            "eval": evaluations[ply],
+            "score": analyses[ply]["score"] if analyses[ply] else None,
+            "best_move": best["best_move"] if best else None,
+            "loss": loss,
+            "classification": classification,
+        }
+
+    tasks = [asyncio.create_task(evaluate(index)) for index in range(len(positions))]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            index, analysis = await finished
+            analyses[index] = analysis
+            evaluations[index] = white_cp(positions[index], analysis)
+
+            for ply in (index, index + 1):
+                if (
+                    1 <= ply <= len(moves)
+                    and ply - 1 in evaluations
+                    and ply in evaluations
+                ):
+                    yield review_ply(ply)
+    finally:
+        # The client left or a position failed, the rest is not wanted anymore
+        for task in tasks:
+            task.cancel()
+
+    summary: Dict[str, Any] = {"done": True, "plies": len(moves)}
+    for color, counts in totals.items():
+        moves_played, loss = counts.pop("moves"), counts.pop("loss")
+        counts["average_loss"] = round(loss / moves_played) if moves_played else 0
+        summary[color] = counts
+    yield summary
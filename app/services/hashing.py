@@ -0,0 +1,107 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+class HasherBusy(Exception):
+    """Raised instead of queueing when the hashing pool is saturated."""
+
+
+class PasswordHasher:
+    """Bounded pool for bcrypt work, off the event loop.
+
+    bcrypt releases the GIL, so a few threads keep the loop responsive while
+    passwords are hashed. At most ``workers + max_queue`` jobs are admitted,
+    the rest fail fast with ``HasherBusy`` so a login storm turns into 429s
+    instead of an ever growing queue.
+
+    The passlib context comes from ``context_factory`` on first use, so
+    passlib is not imported until the first password is hashed.
+    """
+
+    def __init__(
+        self,
+        context_factory: Callable[[], "CryptContext"],
+        workers: int = 2,
+        max_queue: int = 32,
+    ):
+        self.context_factory = context_factory
+        self.crypt_context: Optional["CryptContext"] = None
+        self.limit = workers + max_queue
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hasher"
+        )
+        self.lock = threading.Lock()
+        self.in_flight = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.latencies: Deque[float] = deque(maxlen=1024)
+
+    @property
+    def context(self) -> "CryptContext":
+        if self.crypt_context is None:
+            self.crypt_context = self.context_factory()
+        return self.crypt_context
+
+    def admit(self):
+        with self.lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                raise HasherBusy()
+            self.in_flight += 1
+
+    def run(self, function: Callable, *args) -> Any:
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.latencies.append(time.perf_counter() - started)
+
+    async def submit(self, function: Callable, *args) -> Any:
+        self.admit()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.run, function, *args)
+
+    def submit_blocking(self, function: Callable, *args) -> Any:
+        # For sync endpoints, which already run on a worker thread
+        self.admit()
+        return self.executor.submit(self.run, function, *args).result()
+
+    async def hash(self, password: str) -> str:
+        return await self.submit(self.context.hash, password)
+
+    def hash_blocking(self, password: str) -> str:
+        return self.submit_blocking(self.context.hash, password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Returns whether the password matches and, if the stored hash uses
+        an outdated work factor, a new hash to store in its place."""
+        return await self.submit(
+            self.context.verify_and_update, password, hashed_password
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "inFlight": self.in_flight,
+            "limit": self.limit,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "p99Ms": (
+                round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 3)
+                if latencies
+                else None
+            ),
+        }
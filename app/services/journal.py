@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.database import AsyncSessionLocal
+from app.models.game import GameMove
+from app.utils.chess import encode_move
+
+logger = logging.getLogger(__name__)
+
+BUFFERED = "buffered"
+SYNC = "sync"
+
+
+class MoveJournal:
+    """Write-behind buffer of played moves.
+
+    Moves of every room are appended to one in-process list and written with
+    a single multi-row insert per flush. ``durability`` controls how much can
+    be lost on a crash: ``buffered`` flushes every ``flush_interval`` seconds
+    or once ``max_buffer`` moves are waiting, ``sync`` flushes before the move
+    is broadcast.
+
+    A batch the database rejects is split in halves until the rows it
+    rejects on their own are found, those are dropped and the rest written.
+    While the database is unreachable moves stay buffered, up to
+    ``max_backlog`` of them, past that the oldest are dropped.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 1.0,
+        max_buffer: int = 5000,
+        durability: str = BUFFERED,
+        max_backlog: int = 100000,
+    ):
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.durability = durability
+        self.max_backlog = max_backlog
+
+        self.buffer: List[Dict[str, Any]] = []
+        self.lock = asyncio.Lock()
+        self.full = asyncio.Event()
+
+        self.inserted_total = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.rejected_rows = 0
+        self.dropped_rows = 0
+        self.last_flush_rows = 0
+        self.last_flush_seconds = 0.0
+
+    async def append(self, game_id: int, ply: int, move: str, played_at: float):
+        self.buffer.append(
+            {
+                "game_id": game_id,
+                "ply": ply,
+                "move": encode_move(move),
+                "played_at": played_at,
+            }
+        )
+
+        if self.durability == SYNC:
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Move journal flush failed")
+        elif len(self.buffer) >= self.max_buffer:
+            self.full.set()
+
+    async def flush(self):
+        async with self.lock:
+            if not self.buffer:
+                return
+
+            rows, self.buffer = self.buffer, []
+            started = time.perf_counter()
+
+            try:
+                rejected = await self.write(rows)
+            except Exception:
+                # Keep the moves for the next flush, in their original order.
+                # Halves already written come back as duplicates, rejected then.
+                self.buffer[:0] = rows
+                self.failed_flushes += 1
+                overflow = len(self.buffer) - self.max_backlog
+                if overflow > 0:
+                    del self.buffer[:overflow]
+                    self.dropped_rows += overflow
+                    logger.error(
+                        "Move journal backlog full, dropped %s moves", overflow
+                    )
+                raise
+
+            self.flushes += 1
+            self.rejected_rows += len(rejected)
+            self.inserted_total += len(rows) - len(rejected)
+            self.last_flush_rows = len(rows)
+            self.last_flush_seconds = time.perf_counter() - started
+
+    async def write(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Inserts the rows and returns the ones the database rejected."""
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(GameMove), rows)
+                await db.commit()
+        except (IntegrityError, DataError):
+            if len(rows) == 1:
+                logger.error("Move journal dropped a rejected move %s", rows[0])
+                return rows
+            middle = len(rows) // 2
+            return await self.write(rows[:middle]) + await self.write(rows[middle:])
+        return []
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.full.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Move journal flush failed")
+
+    def stats(self) -> Dict[str, Any]:
+        rate = None
+        if self.last_flush_seconds:
+            rate = round(self.last_flush_rows / self.last_flush_seconds)
+
+        return {
+            "durability": self.durability,
+            "buffered": len(self.buffer),
+            "insertedTotal": self.inserted_total,
+            "flushes": self.flushes,
+            "failedFlushes": self.failed_flushes,
+            "rejectedRows": self.rejected_rows,
+            "droppedRows": self.dropped_rows,
+            "lastFlushRows": self.last_flush_rows,
+            "lastFlushMs": round(self.last_flush_seconds * 1000, 3),
+            "insertsPerSecond": rate,
+        }
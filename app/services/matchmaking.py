@@ -0,0 +1,189 @@
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+import time
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class MatchmakingQueues:
+    """Per game type FIFO queues of pending room ids.
+
+    Every room waiting for an opponent is kept in the queue of its game type,
+    so a search only looks at waiting rooms instead of every live game.
+    """
+
+    def __init__(self):
+        self.queues: Dict[str, "OrderedDict[str, None]"] = {}
+        self.room_types: Dict[str, str] = {}
+
+    def push(self, game_type: Optional[str], room_id: str):
+        if not game_type:
+            return
+
+        self.discard(room_id)
+        self.queues.setdefault(game_type, OrderedDict())[room_id] = None
+        self.room_types[room_id] = game_type
+
+    def peek(self, game_type: Optional[str]) -> Optional[str]:
+        queue = self.queues.get(game_type)
+        if not queue:
+            return None
+        return next(iter(queue))
+
+    def discard(self, room_id: str):
+        game_type = self.room_types.pop(room_id, None)
+        if game_type is None:
+            return
+
+        queue = self.queues[game_type]
+        queue.pop(room_id, None)
+        if not queue:
+            del self.queues[game_type]
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self.room_types
+
+    def depths(self) -> Dict[str, int]:
+        return {game_type: len(queue) for game_type, queue in self.queues.items()}
+
+
+class Seeker:
+    __slots__ = ("room_id", "game_type", "rating", "seq", "joined_at")
+
+    def __init__(
+        self, room_id: str, game_type: str, rating: int, seq: int, joined_at: float
+    ):
+        self.room_id = room_id
+        self.game_type = game_type
+        self.rating = rating
+        self.seq = seq
+        self.joined_at = joined_at
+
+    @property
+    def key(self) -> Tuple[int, int, str]:
+        return (self.rating, self.seq, self.room_id)
+
+
+class RatingMatchmaker:
+    """Pairs seekers of the same game type by nearest rating.
+
+    Seekers are kept in a rating-sorted list per game type. A seeker accepts
+    any opponent within ``base_window`` rating points, and the window widens by
+    ``widen_per_second`` for every second spent waiting, up to ``max_window``.
+    Pairing is done in batches by ``collect_pairs`` (one pass over each sorted
+    list), not on every connection.
+    """
+
+    def __init__(
+        self,
+        base_window: int = 50,
+        widen_per_second: int = 25,
+        max_window: int = 600,
+        history_size: int = 1000,
+    ):
+        self.base_window = base_window
+        self.widen_per_second = widen_per_second
+        self.max_window = max_window
+        self.pools: Dict[str, List[Tuple[int, int, str]]] = {}
+        self.seekers: Dict[str, Seeker] = {}
+        self.wait_times: Deque[float] = deque(maxlen=history_size)
+        self.matched_total = 0
+        self._seq = 0
+
+    def add(
+        self,
+        game_type: str,
+        room_id: str,
+        rating: int,
+        now: Optional[float] = None,
+    ):
+        self.discard(room_id)
+
+        self._seq += 1
+        seeker = Seeker(
+            room_id,
+            game_type,
+            rating,
+            self._seq,
+            time.monotonic() if now is None else now,
+        )
+        self.seekers[room_id] = seeker
+        insort(self.pools.setdefault(game_type, []), seeker.key)
+
+    def discard(self, room_id: str):
+        seeker = self.seekers.pop(room_id, None)
+        if seeker is None:
+            return
+
+        pool = self.pools[seeker.game_type]
+        index = bisect_left(pool, seeker.key)
+        if index < len(pool) and pool[index] == seeker.key:
+            del pool[index]
+        if not pool:
+            del self.pools[seeker.game_type]
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self.seekers
+
+    def window(self, seeker: Seeker, now: float) -> float:
+        waited = max(now - seeker.joined_at, 0)
+        return min(self.base_window + waited * self.widen_per_second, self.max_window)
+
+    def collect_pairs(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Remove and return ``(host_room_id, guest_room_id)`` pairs.
+
+        Neighbours in the sorted list are the nearest ratings, so a single
+        linear pass per game type finds every acceptable pair. The seeker who
+        waited longer becomes the host.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        pairs = []
+        for game_type in list(self.pools):
+            pool = self.pools[game_type]
+            remaining = []
+            index = 0
+
+            while index < len(pool):
+                if index + 1 < len(pool):
+                    first = self.seekers[pool[index][2]]
+                    second = self.seekers[pool[index + 1][2]]
+                    window = min(self.window(first, now), self.window(second, now))
+
+                    if second.rating - first.rating <= window:
+                        if first.joined_at > second.joined_at:
+                            first, second = second, first
+                        pairs.append((first.room_id, second.room_id))
+                        self._record_match(first, now)
+                        self._record_match(second, now)
+                        index += 2
+                        continue
+
+                remaining.append(pool[index])
+                index += 1
+
+            if remaining:
+                self.pools[game_type] = remaining
+            else:
+                del self.pools[game_type]
+
+        return pairs
+
+    def _record_match(self, seeker: Seeker, now: float):
+        del self.seekers[seeker.room_id]
+        self.wait_times.append(now - seeker.joined_at)
+        self.matched_total += 1
+
+    def depths(self) -> Dict[str, int]:
+        return {game_type: len(pool) for game_type, pool in self.pools.items()}
+
+    def wait_percentiles(self) -> Dict[str, Optional[float]]:
+        waits = sorted(self.wait_times)
+        result = {}
+        for name, percentile in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+            if waits:
+                index = min(int(percentile * len(waits)), len(waits) - 1)
+                result[name] = round(waits[index], 3)
+            else:
+                result[name] = None
+        return result
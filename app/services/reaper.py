@@ -0,0 +1,61 @@
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+
+class ActivityIndex:
+    """Keys ordered by last activity, the least recently seen first."""
+
+    def __init__(self):
+        self.last_seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def touch(self, key: str, now: float):
+        self.last_seen[key] = now
+        self.last_seen.move_to_end(key)
+
+    def discard(self, key: str):
+        self.last_seen.pop(key, None)
+
+    def expired(self, cutoff: float) -> List[str]:
+        # Stops at the first key seen after the cutoff, O(expired)
+        keys = []
+        while self.last_seen:
+            key, last_seen = next(iter(self.last_seen.items()))
+            if last_seen > cutoff:
+                break
+            self.last_seen.popitem(last=False)
+            keys.append(key)
+        return keys
+
+    def __len__(self):
+        return len(self.last_seen)
+
+
+class IdleReaper:
+    """Tracks idle rooms.
+
+    Rooms untouched for ``room_idle_after`` seconds are handed back to the
+    manager, which decides whether they are abandoned. Sockets are not
+    tracked here: a player may think for minutes in a long game, and
+    half-open sockets are caught by the server's protocol-level pings.
+    """
+
+    def __init__(self, room_idle_after: float = 600):
+        self.room_idle_after = room_idle_after
+        self.rooms = ActivityIndex()
+
+        self.evicted_rooms = 0
+
+    def touch_room(self, room_id: str, now: float):
+        self.rooms.touch(room_id, now)
+
+    def forget_room(self, room_id: str):
+        self.rooms.discard(room_id)
+
+    def idle_rooms(self, now: float) -> List[str]:
+        return self.rooms.expired(now - self.room_idle_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rooms": len(self.rooms),
+            "evictedRooms": self.evicted_rooms,
+        }
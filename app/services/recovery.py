@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Dict
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models.game import GameMove
+from app.models.room import Room
+
+logger = logging.getLogger(__name__)
+
+
+class RoomCheckpointer:
+    """Periodic checkpoints of live rooms in a local SQLite file.
+
+    Only started games are checkpointed, pending rooms have nobody to come
+    back to after a restart. On startup the checkpoint is loaded and the moves
+    journaled to the database after it are replayed on top.
+    """
+
+    def __init__(self, path: str, interval: float = 5.0):
+        self.path = path
+        self.interval = interval
+        self.last_checkpoint_rooms = 0
+        self.last_checkpoint_seconds = 0.0
+
+    def connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS rooms (room_id TEXT PRIMARY KEY, state TEXT)"
+        )
+        return db
+
+    def serialize(self, rooms: Dict[str, Room]):
+        return [
+            (room_id, json.dumps(room.to_state()))
+            for room_id, room in rooms.items()
+            if room.connect_status == "connected"
+        ]
+
+    def write(self, rows):
+        db = self.connect()
+        try:
+            with db:
+                db.execute("DELETE FROM rooms")
+                db.executemany("INSERT INTO rooms VALUES (?, ?)", rows)
+        finally:
+            db.close()
+
+    async def checkpoint(self, rooms: Dict[str, Room]):
+        started = time.perf_counter()
+        # Serialized on the loop so the snapshot is consistent, written off it
+        rows = self.serialize(rooms)
+        await asyncio.to_thread(self.write, rows)
+
+        self.last_checkpoint_rooms = len(rows)
+        self.last_checkpoint_seconds = time.perf_counter() - started
+
+    async def run(self, rooms: Dict[str, Room]):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.checkpoint(rooms)
+            except Exception:
+                logger.exception("Room checkpoint failed")
+
+    def load(self) -> Dict[str, Room]:
+        db = self.connect()
+        try:
+            rows = db.execute("SELECT room_id, state FROM rooms").fetchall()
+        finally:
+            db.close()
+
+        return {
+            room_id: Room.from_state(json.loads(state)) for room_id, state in rows
+        }
+
+    async def restore(self) -> Dict[str, Room]:
+        started = time.perf_counter()
+        rooms = await asyncio.to_thread(self.load)
+
+        try:
+            await self.replay_journal(rooms)
+        except Exception:
+            logger.exception("Could not replay the move journal, using checkpoint only")
+
+        for room in rooms.values():
+            rebuild_board(room)
+
+        logger.info(
+            "Restored %s rooms in %.3fs", len(rooms), time.perf_counter() - started
+        )
+        return rooms
+
+    async def replay_journal(self, rooms: Dict[str, Room]):
+        by_game_id = {
+            room.active_board.game_id: room
+            for room in rooms.values()
+            if room.active_board.game_id
+        }
+        if not by_game_id:
+            return
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(GameMove)
+                .where(GameMove.game_id.in_(list(by_game_id)))
+                .order_by(GameMove.game_id, GameMove.ply)
+            )
+
+            for game_move in result.scalars():
+                moves = by_game_id[game_move.game_id].active_board.moves
+                if game_move.ply <= len(moves):
+                    continue
+
+                moves.codes.append(game_move.move)
+                moves.offsets.append(game_move.played_at - moves.start_time)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rooms": self.last_checkpoint_rooms,
+            "lastCheckpointMs": round(self.last_checkpoint_seconds * 1000, 3),
+        }
+
+
+def rebuild_board(room: Room):
+    # Replayed for the FEN, only games in progress keep their board
+    room.active_board.load_board()
+    if room.connect_status != "connected":
+        room.active_board.unload_board()
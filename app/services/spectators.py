@@ -0,0 +1,161 @@
+import asyncio
+from collections import deque
+import logging
+from typing import Deque, Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+
+class SpectatorShard:
+    """A slice of a room's spectators served by one writer task.
+
+    Frames arrive already encoded, the writer sends the same text to every
+    subscriber of the shard at once. Only the latest ``backlog`` frames are
+    kept, a spectator that falls behind sees a gap in ``seq`` and asks for a
+    resync. A spectator that takes longer than ``send_timeout`` to accept a
+    frame is dropped and its socket closed with 1013 (try again later), so
+    one stalled socket never holds up the rest and its client reconnects.
+    """
+
+    def __init__(self, backlog: int, send_timeout: float = 1.0):
+        self.subscribers: Set[WebSocket] = set()
+        self.send_timeout = send_timeout
+        self.dropped = 0
+        self.closing: Set[asyncio.Task] = set()
+        self.frames: Deque[str] = deque(maxlen=backlog)
+        self.ready = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    def publish(self, frame: str):
+        self.frames.append(frame)
+        self.ready.set()
+
+    async def run(self):
+        while True:
+            while not self.frames:
+                self.ready.clear()
+                await self.ready.wait()
+
+            frame = self.frames.popleft()
+            await asyncio.gather(
+                *(self.send(websocket, frame) for websocket in list(self.subscribers))
+            )
+
+    async def send(self, websocket: WebSocket, frame: str):
+        try:
+            await asyncio.wait_for(websocket.send_text(frame), self.send_timeout)
+        except Exception:
+            # Closed, or too slow to keep up with the game
+            self.subscribers.discard(websocket)
+            self.dropped += 1
+            # Closed in its own task, the writer moves on to the next frame
+            task = asyncio.create_task(self.drop(websocket))
+            self.closing.add(task)
+            task.add_done_callback(self.closing.discard)
+
+    async def drop(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(1013), self.send_timeout)
+        except Exception:
+            # Already gone, the transport is torn down with the connection
+            pass
+
+    def close(self):
+        self.task.cancel()
+        self.subscribers.clear()
+
+
+class SpectatorChannel:
+    def __init__(self, shard_size: int, backlog: int, send_timeout: float = 1.0):
+        self.shard_size = shard_size
+        self.backlog = backlog
+        self.send_timeout = send_timeout
+        self.shards: List[SpectatorShard] = []
+
+    def subscribe(self, websocket: WebSocket):
+        shard = min(self.shards, key=lambda s: len(s.subscribers), default=None)
+        if shard is None or len(shard.subscribers) >= self.shard_size:
+            shard = SpectatorShard(self.backlog, self.send_timeout)
+            self.shards.append(shard)
+        shard.subscribers.add(websocket)
+
+    def unsubscribe(self, websocket: WebSocket):
+        for shard in self.shards:
+            shard.subscribers.discard(websocket)
+
+        # Keep at least one shard around, empty ones only cost a parked task
+        for shard in [s for s in self.shards[1:] if not s.subscribers]:
+            shard.close()
+            self.shards.remove(shard)
+
+    def publish(self, frame: str):
+        for shard in self.shards:
+            shard.publish(frame)
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self.shards = []
+
+    def __len__(self):
+        return sum(len(shard.subscribers) for shard in self.shards)
+
+    @property
+    def dropped(self) -> int:
+        return sum(shard.dropped for shard in self.shards)
+
+
+class SpectatorHub:
+    """Spectator channels of every room, keyed by room id."""
+
+    def __init__(
+        self, shard_size: int = 500, backlog: int = 32, send_timeout: float = 1.0
+    ):
+        self.shard_size = shard_size
+        self.backlog = backlog
+        self.send_timeout = send_timeout
+        self.channels: Dict[str, SpectatorChannel] = {}
+
+    def subscribe(self, room_id: str, websocket: WebSocket):
+        channel = self.channels.get(room_id)
+        if channel is None:
+            channel = SpectatorChannel(
+                self.shard_size, self.backlog, self.send_timeout
+            )
+            self.channels[room_id] = channel
+        channel.subscribe(websocket)
+
+    def unsubscribe(self, room_id: str, websocket: WebSocket):
+        channel = self.channels.get(room_id)
+        if channel is None:
+            return
+
+        channel.unsubscribe(websocket)
+        if not len(channel):
+            channel.close()
+            del self.channels[room_id]
+
+    def has_spectators(self, room_id: Optional[str]) -> bool:
+        return room_id in self.channels
+
+    def publish(self, room_id: str, frame: str):
+        channel = self.channels.get(room_id)
+        if channel is not None:
+            channel.publish(frame)
+
+    def close(self, room_id: str):
+        channel = self.channels.pop(room_id, None)
+        if channel is not None:
+            channel.close()
+
+    def stats(self):
+        return {
+            room_id: {
+                "spectators": len(channel),
+                "shards": len(channel.shards),
+                "dropped": channel.dropped,
+            }
+            for room_id, channel in self.channels.items()
+        }
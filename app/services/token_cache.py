@@ -0,0 +1,101 @@
+from collections import OrderedDict, deque
+import hashlib
+import heapq
+import threading
+import time
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.schemas.auth import TokenData
+
+
+class TokenCache:
+    """LRU cache of verified access tokens.
+
+    Keys are digests of the raw token, so a hit means the exact same token
+    was verified before. Entries are evicted once the cache is full and at
+    the token's ``exp`` at the latest, a hit is never served past it.
+
+    Sync dependencies verify tokens on threadpool threads, so every access
+    holds the lock.
+    """
+
+    def __init__(self, max_size: int = 10000, latency_samples: int = 1024):
+        self.max_size = max_size
+        self.entries: "OrderedDict[bytes, Tuple[TokenData, float]]" = OrderedDict()
+        self.expiries: List[Tuple[float, bytes]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.verify_latencies: Deque[float] = deque(maxlen=latency_samples)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str) -> Optional[TokenData]:
+        key = self.digest(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, token_data: TokenData, expires_at: float):
+        key = self.digest(token)
+        now = time.time()
+        with self.lock:
+            self.evict_expired(now)
+            if expires_at <= now:
+                return
+
+            self.entries[key] = (token_data, expires_at)
+            self.entries.move_to_end(key)
+            heapq.heappush(self.expiries, (expires_at, key))
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def evict_expired(self, now: float):
+        # Called with the lock held
+        while self.expiries and self.expiries[0][0] <= now:
+            expires_at, key = heapq.heappop(self.expiries)
+            entry = self.entries.get(key)
+            # The LRU may have dropped it already, or a new entry replaced it
+            if entry is not None and entry[1] == expires_at:
+                del self.entries[key]
+
+        # Entries the LRU dropped leave their expiry behind, keep those bounded
+        if len(self.expiries) > 2 * self.max_size:
+            self.expiries = [
+                (expires_at, key)
+                for expires_at, key in self.expiries
+                if key in self.entries
+            ]
+            heapq.heapify(self.expiries)
+
+    def record_verify(self, seconds: float):
+        self.verify_latencies.append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        latencies = sorted(self.verify_latencies)
+        if latencies:
+            verify = {
+                "p50Ms": round(latencies[len(latencies) // 2] * 1000, 3),
+                "p99Ms": round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 3),
+            }
+        else:
+            verify = {"p50Ms": None, "p99Ms": None}
+
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else None,
+            "verifyLatency": verify,
+        }
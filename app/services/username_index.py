@@ -0,0 +1,74 @@
+from bisect import bisect_left, bisect_right, insort
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+# Sorts after every character a username can hold, closes a prefix range
+PREFIX_END = "\U0010ffff"
+
+
+class UsernameIndex:
+    """Lowercased usernames in sorted order, for prefix search without Postgres.
+
+    Postgres answers prefix lookups from a btree on ``lower(username)``,
+    SQLite has nothing comparable for case-insensitive prefixes. A sorted
+    array plays the part of a prefix trie here: every name starting with a
+    prefix sits in one contiguous range found with two bisections, and keyset
+    pagination is a third one. It is filled from the database on first use
+    and kept in step by ``crud`` as users are created or renamed.
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[str, int]] = []
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def load(self, users: Iterable[Tuple[int, str]]):
+        with self.lock:
+            self.entries = sorted(
+                (username.lower(), user_id) for user_id, username in users
+            )
+            self.loaded = True
+
+    def add(self, user_id: int, username: str):
+        with self.lock:
+            if self.loaded:
+                insort(self.entries, (username.lower(), user_id))
+
+    def remove(self, user_id: int, username: str):
+        with self.lock:
+            entry = (username.lower(), user_id)
+            index = bisect_left(self.entries, entry)
+            if index < len(self.entries) and self.entries[index] == entry:
+                del self.entries[index]
+
+    def prefix(
+        self,
+        prefix: str,
+        limit: int,
+        after: Optional[Tuple[str, int]] = None,
+        exclude_id: Optional[int] = None,
+    ) -> List[Tuple[str, int]]:
+        """Up to ``limit`` entries starting with ``prefix``, ordered by name
+        and id and strictly after the ``after`` entry."""
+        prefix = prefix.lower()
+        with self.lock:
+            start = bisect_left(self.entries, (prefix, -1))
+            if after is not None:
+                start = max(start, bisect_right(self.entries, after))
+            end = bisect_left(self.entries, (prefix + PREFIX_END, -1), start)
+
+            matches = []
+            for index in range(start, end):
+                entry = self.entries[index]
+                if entry[1] == exclude_id:
+                    continue
+                matches.append(entry)
+                if len(matches) == limit:
+                    break
+            return matches
+
+    def __len__(self):
+        return len(self.entries)
+
+
+username_index = UsernameIndex()
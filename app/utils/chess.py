@@ -1,38 +1,43 @@
-from typing import Tuple
+from collections import Counter
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from app.models.game import BattleType, ColorAttachMode
+import chess
+import chess.polyglot
 import random
 
 
 def get_default_battle_rules(game_type):
+    # Times and increments in seconds, like the Battle columns
     default_rules = {
         BattleType.ultra: {
-            "player_time": 0.25,
+            "player_time": 15,
             "player_increment": 5,
-            "opponent_time": 0.25,
+            "opponent_time": 15,
             "opponent_increment": 5,
         },
         BattleType.bullet: {
-            "player_time": 1,
+            "player_time": 60,
             "player_increment": 5,
-            "opponent_time": 1,
+            "opponent_time": 60,
             "opponent_increment": 5,
         },
         BattleType.rapid: {
-            "player_time": 10,
+            "player_time": 600,
             "player_increment": 10,
-            "opponent_time": 10,
+            "opponent_time": 600,
             "opponent_increment": 10,
         },
         BattleType.blitz: {
-            "player_time": 3,
+            "player_time": 180,
             "player_increment": 2,
-            "opponent_time": 3,
+            "opponent_time": 180,
             "opponent_increment": 2,
         },
         BattleType.classic: {
-            "player_time": 30,
+            "player_time": 1800,
             "player_increment": 15,
-            "opponent_time": 30,
+            "opponent_time": 1800,
             "opponent_increment": 15,
         },
     }
@@ -49,3 +54,185 @@ def get_opposite_color(color: str) -> str:
     if color == "white":
         return "black"
     return "white"
+
+
+def move_code(move: chess.Move) -> int:
+    # from square in bits 0-5, to square in bits 6-11, promotion piece in 12-14
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+# There are only a few thousand distinct moves, both directions are memoized
+@lru_cache(maxsize=None)
+def encode_move(uci: str) -> int:
+    return move_code(chess.Move.from_uci(uci))
+
+
+@lru_cache(maxsize=None)
+def decode_move(code: int) -> str:
+    promotion = code >> 12
+    return chess.Move(code & 63, code >> 6 & 63, promotion or None).uci()
+
+
+ZOBRIST = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+def piece_bitboards(board: chess.Board) -> List[int]:
+    # Same order as the polyglot piece index, (piece_type - 1) * 2 + color
+    return [
+        pieces & board.occupied_co[color]
+        for pieces in (
+            board.pawns,
+            board.knights,
+            board.bishops,
+            board.rooks,
+            board.queens,
+            board.kings,
+        )
+        for color in (chess.BLACK, chess.WHITE)
+    ]
+
+
+class TerminationTracker:
+    """Detects the end of a game one ply at a time.
+
+    Keeps the polyglot zobrist hash of the position up to date from the
+    squares a move changed and counts how often each position occurred since
+    the last irreversible move. Legal moves are generated once per ply and
+    kept as a set of ``move_code`` ints, which also serves move validation.
+    The board's own ``can_claim_threefold_repetition`` replays the whole
+    move stack instead, which gets slow in long games.
+    """
+
+    __slots__ = (
+        "pieces_hash",
+        "zobrist_hash",
+        "repetitions",
+        "repeated",
+        "legal_moves",
+    )
+
+    def __init__(self, board: chess.Board):
+        # Rebuilt boards come with their move stack, replay it for the counts
+        root = board.root()
+        self.reset(root)
+        for move in board.move_stack:
+            self.update(root, move)
+        self.legal_moves = {move_code(move) for move in root.generate_legal_moves()}
+
+    def reset(self, board: chess.Board):
+        self.pieces_hash = ZOBRIST.hash_board(board)
+        self.zobrist_hash = ZOBRIST(board)
+        self.repetitions = Counter({self.zobrist_hash: 1})
+        # Positions seen at least twice, a third time is a draw
+        self.repeated = 0
+
+    def update(self, board: chess.Board, move: chess.Move):
+        """Pushes ``move`` on ``board`` and updates the hash and counts."""
+        before = piece_bitboards(board)
+        board.push(move)
+
+        keys = ZOBRIST.array
+        for index, (old, new) in enumerate(zip(before, piece_bitboards(board))):
+            changed = old ^ new
+            if changed:
+                for square in chess.scan_forward(changed):
+                    self.pieces_hash ^= keys[64 * index + square]
+
+        self.zobrist_hash = self.pieces_hash ^ self.state_hash(board)
+
+        # Positions before a capture or pawn move can never come back
+        if board.halfmove_clock == 0:
+            self.repetitions.clear()
+            self.repeated = 0
+
+        self.repetitions[self.zobrist_hash] += 1
+        if self.repetitions[self.zobrist_hash] == 2:
+            self.repeated += 1
+
+    @staticmethod
+    def state_hash(board: chess.Board) -> int:
+        return (
+            ZOBRIST.hash_castling(board)
+            ^ ZOBRIST.hash_ep_square(board)
+            ^ ZOBRIST.hash_turn(board)
+        )
+
+    def push(self, board: chess.Board, move: chess.Move) -> Optional[str]:
+        """Pushes ``move`` and returns why the game ended, if it did."""
+        self.update(board, move)
+
+        legal_moves = list(board.generate_legal_moves())
+        self.legal_moves = {move_code(move) for move in legal_moves}
+        if not legal_moves:
+            if board.is_check():
+                return "Checkmate! Game Over."
+            return "Stalemate! The game is a draw."
+        if board.is_insufficient_material():
+            return "Draw! Insufficient material."
+        if self.can_claim_fifty_moves(board, legal_moves):
+            return "Draw! 50-move rule."
+        if self.can_claim_threefold_repetition(board, legal_moves):
+            return "Draw! Threefold repetition."
+        return None
+
+    def can_claim_fifty_moves(
+        self, board: chess.Board, legal_moves: List[chess.Move]
+    ) -> bool:
+        if board.halfmove_clock >= 100:
+            return True
+        # Like python-chess, a claim can also be made with the next move
+        return board.halfmove_clock == 99 and any(
+            not board.is_zeroing(move) for move in legal_moves
+        )
+
+    def can_claim_threefold_repetition(
+        self, board: chess.Board, legal_moves: List[chess.Move]
+    ) -> bool:
+        if self.repetitions[self.zobrist_hash] >= 3:
+            return True
+        if not self.repeated:
+            return False
+
+        # Some position occurred twice, check if a move repeats it once more.
+        # Rare enough that the hashes are computed from scratch.
+        for move in legal_moves:
+            if board.is_zeroing(move):
+                continue
+            board.push(move)
+            try:
+                if self.repetitions.get(ZOBRIST(board), 0) >= 2:
+                    return True
+            finally:
+                board.pop()
+        return False
+
+
+def play_move(
+    board: chess.Board, termination: TerminationTracker, move: chess.Move, ply: int
+) -> Optional[Tuple[Optional[str], str, str]]:
+    """Plays ``move`` as ply number ``ply``.
+
+    Returns None if the move is illegal or the board is not at that ply,
+    otherwise the game over reason, if any, the new FEN and the move in
+    standard UCI. Castling sent as king takes rook (e1h1) is played and
+    returned as the king's two square move (e1g1), as ``Board.push_uci``
+    would.
+    """
+    if len(board.move_stack) != ply:
+        return None
+
+    move = board._from_chess960(
+        board.chess960, move.from_square, move.to_square, move.promotion
+    )
+    if move_code(move) not in termination.legal_moves:
+        return None
+
+    game_over_reason = termination.push(board, move)
+    return game_over_reason, board.fen(), move.uci()
+
+
+def timeout_reason(board: chess.Board) -> str:
+    # The side to move ran out of time, the other side needs mating material
+    if board.has_insufficient_material(not board.turn):
+        return "Draw! Time out with insufficient material."
+    return "Time out! Game Over."
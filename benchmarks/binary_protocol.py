@@ -0,0 +1,67 @@
+"""Bytes per move and parse cost of the binary subprotocol against JSON and
+msgpack, for the move a client sends and the broadcast it gets back.
+
+    python -m benchmarks.binary_protocol --moves 100000
+
+Server parse cost is what ``receive_json`` runs on a client move, client
+parse cost is decoding the broadcast. Reads the same environment (.env) as
+the app.
+"""
+import argparse
+import time
+
+from app.services.encoding import (
+    CLIENT_MOVE,
+    ENCODERS,
+    OP_MOVE,
+    SERVER_MOVE,
+    BinaryEncoder,
+)
+from app.utils.chess import encode_move
+from benchmarks.encoding import ROOM_ID, move_messages
+
+
+def per_move_us(decode, payloads) -> float:
+    started = time.perf_counter()
+    for payload in payloads:
+        decode(payload)
+    return (time.perf_counter() - started) / len(payloads) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--moves", type=int, default=100000)
+    args = parser.parse_args()
+
+    messages = move_messages(args.moves)
+    moves = [{"move": m["move"]["move"], "room_id": ROOM_ID} for m in messages]
+
+    print(
+        f"{'protocol':<12}{'sent B':>10}{'server us':>12}"
+        f"{'received B':>12}{'client us':>12}"
+    )
+    for name, encoder in ENCODERS.items():
+        sent = [encoder.encode(move) for move in moves]
+        received = [encoder.encode(message) for message in messages]
+        print(
+            f"{name:<12}{len(sent[0]):>10}{per_move_us(encoder.decode, sent):>12.2f}"
+            f"{len(received[0]):>12}"
+            f"{per_move_us(encoder.decode, received):>12.2f}"
+        )
+
+    server = BinaryEncoder()
+    server.handle(ROOM_ID)
+    sent = [
+        CLIENT_MOVE.pack(OP_MOVE, server.handles[ROOM_ID], encode_move(move["move"]))
+        for move in moves
+    ]
+    received = [server.encode(message) for message in messages]
+    print(
+        f"{'binary':<12}{len(sent[0]):>10}{per_move_us(server.decode, sent):>12.2f}"
+        f"{len(received[0]):>12}"
+        f"{per_move_us(SERVER_MOVE.unpack, received):>12.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
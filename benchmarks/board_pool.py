@@ -0,0 +1,88 @@
+"""Moves per second through ``BoardProcessPool.move`` as worker processes are
+added, from 1 up to ``--processes``, against boards kept on the event loop.
+
+    python -m benchmarks.board_pool --processes 4 --rooms 64 --games 5
+
+Every room replays the same 40 ply opening ``--games`` times, one move in
+flight per room as with a real player, and all rooms play at once. Rooms
+are spread over the workers by room id like the manager's rooms are.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import chess
+
+from app.services.board_pool import BoardProcessPool
+from app.utils.chess import TerminationTracker, play_move
+from benchmarks.room_memory import OPENING
+
+
+async def play_on_loop(rooms: int, games: int) -> float:
+    async def room():
+        for _ in range(games):
+            board = chess.Board()
+            termination = TerminationTracker(board)
+            for ply, move in enumerate(OPENING):
+                play_move(board, termination, chess.Move.from_uci(move), ply)
+                # Let the other rooms in, as awaiting a reply would
+                await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(room() for _ in range(rooms)))
+    return time.perf_counter() - started
+
+
+async def play_in_pool(processes: int, rooms: int, games: int) -> float:
+    pool = BoardProcessPool(processes, lambda room_id: None)
+    pool.start()
+
+    async def room(room_id: str):
+        for _ in range(games):
+            pool.open(room_id, chess.STARTING_FEN, [])
+            for ply, move in enumerate(OPENING):
+                if await pool.move(room_id, move, ply) is None:
+                    raise RuntimeError(f"{move} rejected in {room_id}")
+            pool.close_room(room_id)
+
+    try:
+        # The first round trip waits for the workers to come up, unknown
+        # rooms just answer with an error
+        await asyncio.gather(
+            *(pool.timeout_reason(f"warmup-{i}") for i in range(processes * 4)),
+            return_exceptions=True,
+        )
+        started = time.perf_counter()
+        await asyncio.gather(*(room(f"room-{i}") for i in range(rooms)))
+        return time.perf_counter() - started
+    finally:
+        pool.close()
+
+
+async def run(processes: int, rooms: int, games: int):
+    moves = rooms * games * len(OPENING)
+    print(f"{'boards':<16}{'moves/s':>10}{'vs 1 proc':>11}")
+
+    elapsed = await play_on_loop(rooms, games)
+    print(f"{'event loop':<16}{moves / elapsed:>10.0f}{'':>11}")
+
+    single = None
+    for size in range(1, processes + 1):
+        elapsed = await play_in_pool(size, rooms, games)
+        single = single or elapsed
+        name = f"{size} processes"
+        print(f"{name:<16}{moves / elapsed:>10.0f}{single / elapsed:>10.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rooms", type=int, default=64)
+    parser.add_argument("--games", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.processes, args.rooms, args.games))
+
+
+if __name__ == "__main__":
+    main()
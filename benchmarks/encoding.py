@@ -0,0 +1,109 @@
+"""Encode time per broadcast move: stdlib ``json.dumps`` for every receiver,
+as ``send_json`` did, against the frames of ``services.encoding``.
+
+    python -m benchmarks.encoding --moves 100000 --spectators 10
+
+Every move message goes to both players and ``--spectators`` spectators. A
+``Frame`` is encoded once per encoding and shared by its receivers, binary
+players get their own fixed-size frame. Reads the same environment (.env)
+as the app.
+"""
+import argparse
+import json
+import time
+from typing import Callable, List
+
+import chess
+
+from app.services.encoding import ENCODERS, JSON, BinaryEncoder, Frame
+
+ROOM_ID = "1042"
+
+
+def move_messages(count: int) -> List[dict]:
+    # A short game replayed over and over, with the fields broadcast_move sends
+    opening = ["g1f3", "g8f6", "f3g1", "f6g8"]
+    board = chess.Board()
+    messages = []
+    for index in range(count):
+        move = opening[index % len(opening)]
+        board.push_uci(move)
+        fen = board.fen()
+        messages.append(
+            {
+                "message": f"Moved {fen}",
+                "op": "move",
+                "roomId": ROOM_ID,
+                "fen": fen,
+                "move": {
+                    "move": move,
+                    "color": "white" if index % 2 == 0 else "black",
+                    "time": 1_700_000_000.0 + index,
+                },
+                "seq": index + 1,
+                "clocks": {"white": 179_000 - index, "black": 178_000 - index},
+                "gameOverReason": "",
+            }
+        )
+    return messages
+
+
+def stdlib_json(receivers: int) -> Callable[[dict], None]:
+    def encode(message: dict):
+        for _ in range(receivers):
+            json.dumps(message)
+
+    return encode
+
+
+def shared_frame(encoder) -> Callable[[dict], None]:
+    def encode(message: dict):
+        # Every receiver asks, only the first one pays
+        frame = Frame(message)
+        frame.encode(encoder)
+        frame.encode(encoder)
+
+    return encode
+
+
+def binary_players(spectators: int) -> Callable[[dict], None]:
+    players = [BinaryEncoder(), BinaryEncoder()]
+    for encoder in players:
+        encoder.handle(ROOM_ID)
+
+    def encode(message: dict):
+        frame = Frame(message)
+        for encoder in players:
+            encoder.encode(frame)
+        if spectators:
+            # Spectators are always sent JSON
+            frame.encode(JSON)
+
+    return encode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--moves", type=int, default=100000)
+    parser.add_argument("--spectators", type=int, default=0)
+    args = parser.parse_args()
+
+    messages = move_messages(args.moves)
+    receivers = 2 + args.spectators
+    encodings = [("stdlib json", stdlib_json(receivers))]
+    encodings += [
+        (f"{name} frame", shared_frame(encoder)) for name, encoder in ENCODERS.items()
+    ]
+    encodings.append(("binary players", binary_players(args.spectators)))
+
+    print(f"{'encoding':<20}{'us/move':>12}")
+    for name, encode in encodings:
+        started = time.perf_counter()
+        for message in messages:
+            encode(message)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<20}{elapsed / len(messages) * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Event loop lag while many players join rooms at once: the battle and game
+rows written through the async session, against a sync session used on the
+event loop as join_room did before.
+
+    python -m benchmarks.join_lag --joins 200
+
+A ticker task sleeps 1 ms at a time and records how late it wakes up, which
+is how long any other room on the worker would have waited. Every join
+inserts a battle and a game, and they are deleted again at the end. Reads
+the same environment (.env) as the app, point DATABASE_URL at a scratch
+database that is migrated to head.
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import List
+
+from sqlalchemy import delete
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine
+from app.models import user  # noqa: F401, games refer to users
+from app.models.game import Battle, Game, create_battle, create_game
+
+TICK_SECONDS = 0.001
+
+BATTLE = {
+    "type": "blitz",
+    "games_count": 1,
+    "player_time": 180,
+    "player_increment": 2,
+    "opponent_time": 180,
+    "opponent_increment": 2,
+    "color_attach_mode": "random",
+    "with_armaghedon": False,
+}
+
+
+def game_data(battle: Battle) -> dict:
+    return {
+        "type": battle.type,
+        "is_rating": battle.is_rating,
+        "battle_id": battle.id,
+        "player_color": True,
+        "moves": [],
+    }
+
+
+async def sync_join(battles: List[int]):
+    # Every round trip blocks the event loop
+    with SessionLocal() as db:
+        battle = Battle(**BATTLE)
+        db.add(battle)
+        db.commit()
+        db.refresh(battle)
+        battles.append(battle.id)
+        game = Game(**game_data(battle))
+        db.add(game)
+        db.commit()
+        db.refresh(game)
+
+
+async def async_join(battles: List[int]):
+    async with AsyncSessionLocal() as db:
+        battle = await create_battle(db, Battle(**BATTLE))
+        battles.append(battle.id)
+        await create_game(db, Game(**game_data(battle)))
+
+
+async def ticker(lags: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - started - TICK_SECONDS)
+
+
+async def measure(join, joins: int, battles: List[int]):
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticks = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK_SECONDS * 10)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(join(battles) for _ in range(joins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticks
+    lags.sort()
+    return (
+        elapsed,
+        statistics.median(lags),
+        lags[int(0.99 * (len(lags) - 1))],
+        lags[-1],
+    )
+
+
+def cleanup(battles: List[int]):
+    with SessionLocal() as db:
+        db.execute(delete(Game).where(Game.battle_id.in_(battles)))
+        db.execute(delete(Battle).where(Battle.id.in_(battles)))
+        db.commit()
+
+
+async def run(joins: int):
+    battles: List[int] = []
+    try:
+        print(
+            f"{'session':<16}{'total ms':>10}{'lag p50 ms':>12}"
+            f"{'lag p99 ms':>12}{'lag max ms':>12}"
+        )
+        for name, join in (("sync on loop", sync_join), ("async", async_join)):
+            elapsed, p50, p99, worst = await measure(join, joins, battles)
+            print(
+                f"{name:<16}{elapsed * 1000:>10.1f}{p50 * 1000:>12.2f}"
+                f"{p99 * 1000:>12.2f}{worst * 1000:>12.2f}"
+            )
+    finally:
+        await async_engine.dispose()
+        cleanup(battles)
+
+
+def main():
+    # Contended inserts are slow by design here, not worth a warning each
+    logging.getLogger("app.services.db_metrics").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--joins", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.joins))
+
+
+if __name__ == "__main__":
+    main()
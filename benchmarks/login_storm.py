@@ -0,0 +1,156 @@
+"""Move latency while many players log in at once: the login endpoint with
+its user queries run off the event loop, against the same queries run on
+the event loop as login did before.
+
+    python -m benchmarks.login_storm --logins 100
+
+A mover task plays a move every 5 ms, as a busy room would, and records how
+long after its due time each move is done, which is what a player waits on
+top of the network. All logins are for one user, created at the start and
+deleted at the end, each on its own connection so none waits on the pool.
+bcrypt runs on the password hasher threads in both cases, logins over its
+queue limit are answered with 429. Reads the same environment (.env) as the
+app, point DATABASE_URL at a scratch database that is migrated to head.
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import List, Tuple
+
+import chess
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app.api import auth as auth_api
+from app.database import DATABASE_URL, SessionLocal
+from app.models.user import User
+from app.schemas.auth import UserLogin
+from app.services import auth
+from app.services.hashing import HasherBusy
+from app.utils.chess import TerminationTracker, play_move
+from benchmarks.room_memory import OPENING
+
+MOVE_INTERVAL = 0.005
+
+EMAIL = "login-storm@example.com"
+PASSWORD = "login-storm-password"
+
+
+async def blocking_login(login_data: UserLogin, db):
+    # login before its queries moved off the loop
+    user = crud.get_user_by_email(db, email=login_data.email)
+    try:
+        is_valid, new_hash = await auth.password_hasher.verify_and_update(
+            login_data.password, user.hashed_password
+        )
+    except HasherBusy:
+        raise HTTPException(status_code=429)
+    if new_hash:
+        crud.update_password_hash(db, user, new_hash)
+    return is_valid
+
+
+async def storm(login, sessions: sessionmaker, logins: int) -> int:
+    async def one():
+        with sessions() as db:
+            try:
+                await login(UserLogin(email=EMAIL, password=PASSWORD), db)
+            except HTTPException as error:
+                if error.status_code != 429:
+                    raise
+                return 1
+        return 0
+
+    return sum(await asyncio.gather(*(one() for _ in range(logins))))
+
+
+async def mover(latencies: List[float], stop: asyncio.Event):
+    board = chess.Board()
+    termination = TerminationTracker(board)
+    while not stop.is_set():
+        due = time.perf_counter() + MOVE_INTERVAL
+        await asyncio.sleep(MOVE_INTERVAL)
+
+        ply = len(board.move_stack)
+        if ply == len(OPENING):
+            board = chess.Board()
+            termination = TerminationTracker(board)
+            ply = 0
+        play_move(board, termination, chess.Move.from_uci(OPENING[ply]), ply)
+        latencies.append(time.perf_counter() - due)
+
+
+async def measure(
+    login, sessions: sessionmaker, logins: int
+) -> Tuple[float, int, float, float, float]:
+    latencies: List[float] = []
+    stop = asyncio.Event()
+    moves = asyncio.create_task(mover(latencies, stop))
+    await asyncio.sleep(MOVE_INTERVAL * 10)
+
+    started = time.perf_counter()
+    rejected = await storm(login, sessions, logins)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await moves
+    latencies.sort()
+    return (
+        elapsed,
+        rejected,
+        statistics.median(latencies),
+        latencies[int(0.99 * (len(latencies) - 1))],
+        latencies[-1],
+    )
+
+
+def create_user():
+    hashed_password = auth.password_hasher.hash_blocking(PASSWORD)
+    with SessionLocal() as db:
+        db.add(
+            User(username="login-storm", email=EMAIL, hashed_password=hashed_password)
+        )
+        db.commit()
+
+
+def cleanup():
+    with SessionLocal() as db:
+        db.query(User).filter(User.email == EMAIL).delete()
+        db.commit()
+
+
+async def run(logins: int):
+    engine = create_engine(DATABASE_URL, pool_size=logins)
+    sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    print(
+        f"{'queries':<16}{'total ms':>10}{'429s':>6}{'move p50 ms':>13}"
+        f"{'move p99 ms':>13}{'move max ms':>13}"
+    )
+    for name, login in (("on loop", blocking_login), ("off loop", auth_api.login)):
+        elapsed, rejected, p50, p99, worst = await measure(login, sessions, logins)
+        print(
+            f"{name:<16}{elapsed * 1000:>10.1f}{rejected:>6}{p50 * 1000:>13.2f}"
+            f"{p99 * 1000:>13.2f}{worst * 1000:>13.2f}"
+        )
+    engine.dispose()
+
+
+def main():
+    # passlib trips over the bcrypt version lookup, the backend still works
+    logging.getLogger("passlib.handlers.bcrypt").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=100)
+    args = parser.parse_args()
+    create_user()
+    try:
+        asyncio.run(run(args.logins))
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
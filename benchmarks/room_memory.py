@@ -0,0 +1,129 @@
+"""Memory held per room: the slotted ``Room`` objects against the nested dicts
+rooms used to be, at 50k rooms by default.
+
+    python -m benchmarks.room_memory --rooms 50000 --moves 40
+
+Every room gets ``--moves`` plies of a fixed opening played into its move
+list, with 0 the rooms are pending and only hold their start FEN.
+``--pooled`` drops the board like ``start_board`` does when BOARD_PROCESSES
+is set. Reads the same environment (.env) as the app.
+"""
+import argparse
+from datetime import datetime
+import gc
+import sys
+import types
+
+import chess
+
+from app.models.room import Room
+
+# Replayed from the start, so every room holds the same number of plies
+OPENING = (
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6 e1g1 f8e7 f1e1 b7b5 a4b3 d7d6 "
+    "c2c3 e8g8 h2h3 c6a5 b3c2 c7c5 d2d4 d8c7 b1d2 c5d4 c3d4 a5c6 d2b3 a6a5 "
+    "c1e3 a5a4 b3d2 c8d7 a1c1 c7b7 d2f1 f8c8 f1g3 c6b4"
+).split()
+
+
+def legacy_room(user_id: str, moves: int, pooled: bool) -> dict:
+    # The shape create_room built before rooms became objects
+    board = chess.Board()
+    start_time = datetime.now().timestamp()
+    records = []
+    for index, move in enumerate(OPENING[:moves]):
+        board.push_uci(move)
+        records.append(
+            {
+                "move": move,
+                "color": "white" if index % 2 == 0 else "black",
+                "time": start_time + index,
+            }
+        )
+    return {
+        "connect_status": "pending",
+        "battle_id": None,
+        "is_rating": False,
+        "game_type": "blitz",
+        "games_count": 1,
+        "opponent_time": 180,
+        "opponent_increment": 2,
+        "color_attach_mode": "random",
+        "with_armaghedon": False,
+        "active_board": {
+            "game_id": None,
+            "board": None if pooled else board,
+            "fen": board.fen(),
+            "start_fen": chess.STARTING_FEN,
+            "white": None,
+            "black": None,
+            "moves": records,
+            "start_time": start_time,
+        },
+        "players": {user_id: {"time": 180, "increment": 2}},
+        "messages": [],
+    }
+
+
+def slotted_room(user_id: str, moves: int, pooled: bool) -> Room:
+    room = Room.create(
+        user_id, "blitz", False, 1, 180, 2, 180, 2, "random", False, None
+    )
+    if not moves:
+        return room
+
+    # A game in progress, its board is built when the game starts
+    active_board = room.active_board
+    active_board.load_board()
+    for index, move in enumerate(OPENING[:moves]):
+        move_played = chess.Move.from_uci(move)
+        active_board.termination.update(active_board.board, move_played)
+        active_board.moves.append(move, active_board.start_time + index)
+    active_board.fen = active_board.board.fen()
+    if pooled:
+        active_board.unload_board()
+    return room
+
+
+# Shared by the whole process, not owned by any room
+SHARED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+
+
+def deep_size(root) -> int:
+    """Bytes of every object reachable from ``root``, each counted once, so
+    objects shared by rooms such as interned strings count a single time."""
+    seen = set()
+    pending = [root]
+    size = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SHARED):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return size
+
+
+def measure(build, rooms: int, moves: int, pooled: bool) -> float:
+    held = {str(index): build(str(index), moves, pooled) for index in range(rooms)}
+    return deep_size(held) / rooms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=50000)
+    parser.add_argument("--moves", type=int, default=0)
+    parser.add_argument("--pooled", action="store_true")
+    args = parser.parse_args()
+    if not 0 <= args.moves <= len(OPENING):
+        parser.error(f"--moves must be between 0 and {len(OPENING)}")
+
+    print(f"{'layout':<20}{'bytes/room':>12}")
+    for name, build in (("nested dicts", legacy_room), ("slotted Room", slotted_room)):
+        per_room = measure(build, args.rooms, args.moves, args.pooled)
+        print(f"{name:<20}{per_room:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Cold start of the API: ``import app.main``, the lifespan startup and the
+first request, each run in a fresh interpreter.
+
+    python -m benchmarks.startup --runs 10
+
+Reads the same environment (.env) as the app, point DATABASE_URL at a
+database that is migrated to head.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+client = TestClient(app.main.app)
+entered = time.perf_counter()
+client.__enter__()
+ready = time.perf_counter()
+client.get("/")
+answered = time.perf_counter()
+client.__exit__(None, None, None)
+print(imported - started, ready - entered, answered - ready)
+"""
+
+PHASES = ("import app.main", "lifespan startup", "first request")
+
+
+def run_once():
+    process = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=ROOT, capture_output=True, text=True
+    )
+    if process.returncode:
+        sys.exit(process.stderr)
+    return [float(value) for value in process.stdout.split()[-len(PHASES):]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.runs)]
+    totals = [sum(sample) for sample in samples]
+
+    print(f"{'phase':<20}{'median ms':>12}{'min ms':>12}")
+    for index, phase in enumerate(PHASES + ("total",)):
+        values = totals if index == len(PHASES) else [s[index] for s in samples]
+        print(
+            f"{phase:<20}{statistics.median(values) * 1000:>12.1f}"
+            f"{min(values) * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
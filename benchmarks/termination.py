@@ -0,0 +1,110 @@
+"""Per-move cost of game over detection in make_move: the incremental
+``TerminationTracker`` against the board's own checks it replaced.
+
+    python -m benchmarks.termination --games 1000
+    python -m benchmarks.termination --pgn games.pgn
+
+Without ``--pgn`` the games are random legal moves from a fixed seed, played
+until the game ends or 300 plies. They run long and shuffle pieces back and
+forth, the case where replaying the move stack for threefold repetition
+hurts most. Reads the same environment (.env) as the app.
+"""
+import argparse
+import random
+import time
+from typing import List, Optional
+
+import chess
+import chess.pgn
+
+from app.utils.chess import TerminationTracker, play_move
+
+MAX_PLIES = 300
+
+
+def random_games(count: int, seed: int) -> List[List[chess.Move]]:
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        board = chess.Board()
+        while not board.is_game_over(claim_draw=True) and board.ply() < MAX_PLIES:
+            board.push(rng.choice(list(board.legal_moves)))
+        games.append(board.move_stack)
+    return games
+
+
+def stored_games(path: str, count: int) -> List[List[chess.Move]]:
+    games = []
+    with open(path) as pgn:
+        while len(games) < count:
+            game = chess.pgn.read_game(pgn)
+            if game is None:
+                break
+            games.append(list(game.mainline_moves()))
+    return games
+
+
+def legacy_move(board: chess.Board, move: chess.Move) -> Optional[str]:
+    # make_move before the tracker, a full check after every push
+    if move not in board.legal_moves:
+        raise ValueError(move)
+    board.push(move)
+    board.fen()
+    if board.is_checkmate():
+        return "Checkmate! Game Over."
+    if board.is_stalemate():
+        return "Stalemate! The game is a draw."
+    if board.is_insufficient_material():
+        return "Draw! Insufficient material."
+    if board.can_claim_fifty_moves():
+        return "Draw! 50-move rule."
+    if board.can_claim_threefold_repetition():
+        return "Draw! Threefold repetition."
+    return None
+
+
+def run_legacy(moves: List[chess.Move]) -> List[Optional[str]]:
+    board = chess.Board()
+    return [legacy_move(board, move) for move in moves]
+
+
+def run_tracker(moves: List[chess.Move]) -> List[Optional[str]]:
+    board = chess.Board()
+    termination = TerminationTracker(board)
+    reasons = []
+    for ply, move in enumerate(moves):
+        result = play_move(board, termination, move, ply)
+        if result is None:
+            raise ValueError(move)
+        reasons.append(result[0])
+    return reasons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--pgn", help="read the games from this PGN file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.pgn:
+        games = stored_games(args.pgn, args.games)
+    else:
+        games = random_games(args.games, args.seed)
+    moves = sum(len(game) for game in games)
+    print(f"{len(games)} games, {moves} moves")
+
+    print(f"{'detection':<20}{'us/move':>12}{'total s':>12}")
+    results = {}
+    for name, run in (("board checks", run_legacy), ("tracker", run_tracker)):
+        started = time.perf_counter()
+        results[name] = [run(game) for game in games]
+        elapsed = time.perf_counter() - started
+        print(f"{name:<20}{elapsed / moves * 1e6:>12.1f}{elapsed:>12.2f}")
+
+    if results["board checks"] != results["tracker"]:
+        raise SystemExit("The tracker disagrees with the board checks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Settings are read when app.config is imported, before any test module runs
+SCRATCH = tempfile.mkdtemp(prefix="chess-api-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{SCRATCH}/test.db"
+os.environ["SECRET_KEY"] = "test-secret"
+os.environ["ACCESS_TOKEN_EXPIRE_MINUTES"] = "30"
+os.environ["CHECKPOINT_PATH"] = f"{SCRATCH}/rooms.checkpoint.sqlite3"
+
+FAKE_UCI = os.path.join(os.path.dirname(__file__), "fake_uci.py")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def crash_file(tmp_path):
+    """Created by a test to make the next search of a fake engine crash."""
+    return tmp_path / "crash"
+
+
+@pytest.fixture
+def fake_engine(monkeypatch, crash_file):
+    """Command line of the fake engine, searches take 0.2 s by default."""
+    monkeypatch.setenv("FAKE_DELAY", "0.2")
+    monkeypatch.setenv("FAKE_CRASH_FILE", str(crash_file))
+    return f"{sys.executable} {FAKE_UCI}"
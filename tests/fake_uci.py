@@ -0,0 +1,82 @@
+"""A stand-in UCI engine for the tests, no Stockfish needed.
+
+Every search takes ``FAKE_DELAY`` seconds unless it is stopped, then plays
+the first legal move at depth 5 with a score of +0.31. When the file named
+by ``FAKE_CRASH_FILE`` exists, the next ``go`` removes it and exits, as an
+engine crashing mid-search would.
+"""
+import os
+import sys
+import threading
+import time
+
+import chess
+
+DELAY = float(os.environ.get("FAKE_DELAY", "0.2"))
+CRASH_FILE = os.environ.get("FAKE_CRASH_FILE")
+
+
+def send(line: str):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+def search(board: chess.Board, stop: threading.Event):
+    deadline = time.monotonic() + DELAY
+    while time.monotonic() < deadline and not stop.is_set():
+        time.sleep(0.01)
+
+    move = next(iter(board.legal_moves), None)
+    if move is None:
+        send("info depth 0 score mate 0")
+        send("bestmove (none)")
+    else:
+        send(f"info depth 5 score cp 31 nodes 1234 pv {move.uci()}")
+        send(f"bestmove {move.uci()}")
+
+
+def set_position(arguments):
+    if arguments[0] == "fen":
+        end = arguments.index("moves") if "moves" in arguments else len(arguments)
+        board = chess.Board(" ".join(arguments[1:end]))
+    else:
+        end = 1
+        board = chess.Board()
+    for move in arguments[end + 1 :]:
+        board.push_uci(move)
+    return board
+
+
+def main():
+    board = chess.Board()
+    stop = threading.Event()
+    searching = None
+
+    for line in sys.stdin:
+        command, *arguments = line.split() or [""]
+        if command == "uci":
+            send("id name Fake")
+            send("option name Hash type spin default 16 min 1 max 1024")
+            send("option name Threads type spin default 1 min 1 max 8")
+            send("uciok")
+        elif command == "isready":
+            send("readyok")
+        elif command == "position":
+            board = set_position(arguments)
+        elif command == "go":
+            if CRASH_FILE and os.path.exists(CRASH_FILE):
+                os.remove(CRASH_FILE)
+                os._exit(3)
+            stop.clear()
+            searching = threading.Thread(target=search, args=(board.copy(), stop))
+            searching.start()
+        elif command == "stop":
+            stop.set()
+            if searching is not None:
+                searching.join()
+        elif command == "quit":
+            return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import asyncio
+
+import chess
+import pytest
+
+from app.services.analysis_cache import AnalysisCache, DiskTier
+from app.services.engine import EnginePool
+
+pytestmark = pytest.mark.anyio
+
+AFTER_E4 = chess.Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+
+
+@pytest.fixture
+async def pool(fake_engine):
+    pool = EnginePool(fake_engine, size=2, max_time_ms=2000)
+    await pool.start()
+    yield pool
+    await pool.close()
+
+
+async def test_concurrent_requests_share_one_search(pool):
+    cache = AnalysisCache(pool.analyse)
+
+    results = await asyncio.gather(
+        *(cache.analyse(chess.Board(), pool.limit(5)) for _ in range(10))
+    )
+
+    assert pool.completed == 1
+    assert cache.misses == 1
+    assert cache.coalesced == 9
+    assert all(result == results[0] for result in results)
+
+
+async def test_deeper_analysis_answers_shallower_requests(pool):
+    cache = AnalysisCache(pool.analyse)
+    await cache.analyse(chess.Board(), pool.limit(5))
+
+    await cache.analyse(chess.Board(), pool.limit(3))
+    assert pool.completed == 1
+    assert cache.hits == 1
+
+    # The fake engine stops at depth 5, deeper requests search again
+    await cache.analyse(chess.Board(), pool.limit(6))
+    assert pool.completed == 2
+
+
+async def test_search_is_cancelled_when_its_only_waiter_leaves(pool):
+    cache = AnalysisCache(pool.analyse)
+
+    request = asyncio.create_task(cache.analyse(AFTER_E4, pool.limit(5)))
+    await asyncio.sleep(0.05)
+    request.cancel()
+    await asyncio.sleep(0.05)
+
+    assert not cache.flights
+    assert pool.cancelled == 1
+    assert pool.completed == 0
+
+
+async def test_search_survives_while_a_waiter_remains(pool):
+    cache = AnalysisCache(pool.analyse)
+
+    leaving = asyncio.create_task(cache.analyse(AFTER_E4, pool.limit(5)))
+    staying = asyncio.create_task(cache.analyse(AFTER_E4, pool.limit(5)))
+    await asyncio.sleep(0.05)
+    leaving.cancel()
+
+    assert (await staying)["best_move"] is not None
+    assert pool.cancelled == 0
+    assert pool.completed == 1
+
+
+async def test_disk_tier_answers_after_memory_eviction(pool, tmp_path):
+    disk = DiskTier(str(tmp_path / "analyses.sqlite3"))
+    cache = AnalysisCache(pool.analyse, max_size=1, disk=disk)
+    await cache.open()
+    try:
+        await cache.analyse(chess.Board(), pool.limit(5))
+        await cache.analyse(AFTER_E4, pool.limit(5))
+        assert len(cache.entries) == 1
+
+        await cache.analyse(chess.Board(), pool.limit(5))
+        assert cache.disk_hits == 1
+        assert pool.completed == 2
+    finally:
+        cache.close()
@@ -0,0 +1,130 @@
+import asyncio
+
+import orjson
+import pytest
+
+from app.api.room import ChessRoomManager
+from app.models.room import Room
+from app.services.bus import InMemoryBus, MessageBus
+from app.services.cluster import HashRing
+from app.services.encoding import EncodedWebSocket
+
+pytestmark = pytest.mark.anyio
+
+NODES = ["a", "b"]
+WHITE = "white.1"
+BLACK = "black.1"
+
+
+class FakeSocket:
+    """Collects the frames the server sends, decoded."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text: str):
+        self.sent.append(orjson.loads(text))
+
+    async def close(self, code: int = 1000):
+        pass
+
+    def ops(self, op: str):
+        return [message for message in self.sent if message.get("op") == op]
+
+
+@pytest.fixture
+async def nodes():
+    managers = {}
+    for node_id in NODES:
+        manager = ChessRoomManager()
+        manager.ring = HashRing(NODES)
+        manager.node_id = node_id
+        manager.bus = InMemoryBus(node_id, NODES)
+        await manager.bus.start(manager.handle_bus_message)
+        managers[node_id] = manager
+    yield managers
+    for manager in managers.values():
+        for user_id in list(manager.user_connections):
+            await manager.disconnect(user_id)
+        await manager.bus.close()
+
+
+async def settle():
+    # Let bus queues and connection writers drain
+    for _ in range(5):
+        await asyncio.sleep(0.02)
+
+
+def room_owned_by(manager: ChessRoomManager, node_id: str) -> str:
+    return next(
+        room_id
+        for room_id in (f"room.{index}" for index in range(1000))
+        if manager.ring.owner(room_id) == node_id
+    )
+
+
+def test_message_bus_is_abstract():
+    with pytest.raises(TypeError):
+        MessageBus("a", NODES)
+
+
+async def test_move_from_another_node_is_played_in_the_owning_node(nodes):
+    a, b = nodes["a"], nodes["b"]
+    room_id = room_owned_by(a, "b")
+
+    # Black created the room on node b, white is connected to node a
+    b.rooms[room_id] = Room.create(BLACK, color_attach_mode="white")
+    black, white = FakeSocket(), FakeSocket()
+    await b.connect(EncodedWebSocket(black), BLACK)
+    await a.connect(EncodedWebSocket(white), WHITE)
+
+    # What the websocket endpoint on node a does for white
+    params = {"op": "connect", "room_id": room_id}
+    await a.send_to("b", {"type": "handshake", "user_id": WHITE, "params": params})
+    await settle()
+    assert b.rooms[room_id].connect_status == "connected"
+    assert white.ops("connected") and black.ops("connected")
+
+    data = {"move": "e2e4", "room_id": room_id}
+    await a.send_to("b", {"type": "message", "user_id": WHITE, "data": data})
+    await settle()
+
+    assert [record.move for record in b.rooms[room_id].active_board.moves] == [
+        "e2e4"
+    ]
+    assert room_id not in a.rooms
+    for socket in (white, black):
+        (move,) = socket.ops("move")
+        assert move["move"]["move"] == "e2e4"
+        assert move["roomId"] == room_id
+        assert move["seq"] == 1
+
+
+async def test_discarded_seek_is_removed_from_the_remote_pool(nodes):
+    a, b = nodes["a"], nodes["b"]
+    room_id = room_owned_by(a, "b")
+    a.rating_matchmaker.add("blitz", room_id, 1500)
+    a.seeker_nodes[room_id] = "b"
+    b.seek_nodes[room_id] = "a"
+
+    b.discard_seek(room_id)
+    assert len(b.background) == 1
+    await settle()
+
+    assert room_id not in a.seeker_nodes
+    assert room_id not in a.rating_matchmaker.seekers
+    assert not b.background
+
+
+async def test_failed_background_send_is_logged(nodes, caplog):
+    b = nodes["b"]
+    b.seek_nodes["room.1"] = "gone"
+
+    b.discard_seek("room.1")
+    await settle()
+
+    assert not b.background
+    assert "Background unseek failed" in caplog.text
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import chess
+from fastapi import HTTPException
+import pytest
+
+from app.api import chess as chess_api
+from app.services.analysis_cache import AnalysisCache
+from app.services.engine import EngineBusy, EnginePool, describe_analysis
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeRequest:
+    """A request whose client hangs up after ``disconnect_after`` seconds."""
+
+    def __init__(self, disconnect_after: float = float("inf")):
+        self.disconnect_at = time.monotonic() + disconnect_after
+
+    async def is_disconnected(self) -> bool:
+        return time.monotonic() >= self.disconnect_at
+
+
+@pytest.fixture
+async def pool(fake_engine):
+    pool = EnginePool(fake_engine, size=1, max_queue=1, max_time_ms=2000)
+    await pool.start()
+    yield pool
+    await pool.close()
+
+
+async def test_analyse_returns_engine_answer(pool):
+    info = await pool.analyse(chess.Board(), pool.limit(5))
+
+    analysis = describe_analysis(info)
+    assert analysis["best_move"] is not None
+    assert analysis["score"] == {"cp": 31, "mate": None}
+    assert analysis["depth"] == 5
+
+
+async def test_requests_queue_then_fail_fast(pool):
+    board = chess.Board()
+    first = asyncio.create_task(pool.analyse(board, pool.limit(5)))
+    queued = asyncio.create_task(pool.analyse(board, pool.limit(5)))
+    await asyncio.sleep(0.05)
+
+    # One search runs, one waits, the queue is full
+    with pytest.raises(EngineBusy):
+        await pool.analyse(board, pool.limit(5))
+
+    await asyncio.gather(first, queued)
+    assert pool.completed == 2
+    assert pool.rejected == 1
+
+
+async def test_game_endpoint_answers_busy_with_429(pool, monkeypatch):
+    monkeypatch.setattr(chess_api, "engine_pool", pool)
+    monkeypatch.setattr(chess_api, "analysis_cache", AnalysisCache(pool.analyse))
+    board = chess.Board()
+    busy = [asyncio.create_task(pool.analyse(board, pool.limit(5))) for _ in range(2)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HTTPException) as raised:
+        await chess_api.game(FakeRequest(), board.fen(), depth=5, movetime=None)
+
+    assert raised.value.status_code == 429
+    assert raised.value.headers == {"Retry-After": "1"}
+    await asyncio.gather(*busy)
+
+
+async def test_disconnect_cancels_search_and_frees_engine(pool, monkeypatch):
+    monkeypatch.setenv("FAKE_DELAY", "5")
+    # Engines read the delay at startup, replace the one already running
+    engine = await pool.acquire()
+    await pool.restart(engine)
+
+    started = time.monotonic()
+    with pytest.raises(HTTPException) as raised:
+        await chess_api.run_until_disconnected(
+            FakeRequest(disconnect_after=0.3),
+            pool.analyse(chess.Board(), pool.limit(5)),
+        )
+    assert raised.value.status_code == 499
+    await asyncio.sleep(0.1)
+
+    assert time.monotonic() - started < 2
+    assert pool.cancelled == 1
+    assert pool.idle.qsize() == 1
+
+    # The stopped engine answers the next command right away
+    engine = await pool.acquire()
+    await asyncio.wait_for(engine.ping(), timeout=1)
+    pool.idle.put_nowait(engine)
+
+
+async def test_crashed_engine_is_restarted_and_request_retried(pool, crash_file):
+    crash_file.touch()
+
+    info = await pool.analyse(chess.Board(), pool.limit(5))
+
+    assert describe_analysis(info)["best_move"] is not None
+    assert pool.crashes == 1
+    assert not crash_file.exists()
+
+    # The replacement comes up in the background
+    for _ in range(50):
+        if len(pool.engines) == pool.size and not pool.restarts:
+            break
+        await asyncio.sleep(0.1)
+    assert len(pool.engines) == pool.size
+    await pool.analyse(chess.Board(), pool.limit(5))
@@ -0,0 +1,106 @@
+import asyncio
+import random
+
+import chess
+import chess.engine
+import orjson
+import pytest
+
+from app.api import chess as chess_api
+from app.schemas.chess import GameAnalysisRequest
+from app.services.analysis_cache import AnalysisCache
+from app.services.engine import EnginePool
+from app.services.game_review import review_game
+
+pytestmark = pytest.mark.anyio
+
+SCHOLARS_MATE = "1. e4 e5 2. Bc4 Nc6 3. Qh5 Nf6 4. Qxf7# 1-0"
+
+
+def game_moves(pgn_moves: str):
+    board = chess.Board()
+    moves = []
+    for san in pgn_moves.split():
+        if not san[0].isdigit():
+            moves.append(board.push_san(san))
+    return moves
+
+
+async def fake_analyse(board: chess.Board, limit: chess.engine.Limit):
+    # Finishes in random order, so plies complete out of game order
+    await asyncio.sleep(random.uniform(0, 0.05))
+    best = next(iter(board.legal_moves))
+    return {
+        "best_move": best.uci(),
+        "score": {"cp": 20 if board.turn == chess.WHITE else -20, "mate": None},
+        "depth": limit.depth,
+        "pv": [best.uci()],
+        "nodes": 1,
+    }
+
+
+async def test_every_ply_once_and_summary_last():
+    random.seed(7)
+    moves = game_moves(SCHOLARS_MATE)
+
+    reviews = [
+        review
+        async for review in review_game(
+            fake_analyse, chess.Board(), moves, chess.engine.Limit(depth=5), 3
+        )
+    ]
+
+    *plies, summary = reviews
+    assert sorted(review["ply"] for review in plies) == list(range(1, len(moves) + 1))
+    assert summary["done"] is True
+    assert summary["plies"] == len(moves)
+    assert summary["white"]["average_loss"] >= 0
+
+    last = next(review for review in plies if review["ply"] == len(moves))
+    assert last["san"] == "Qxf7#"
+    assert last["score"] is None  # Mate, nothing left to analyse
+
+
+async def test_ply_comes_after_both_its_positions():
+    random.seed(3)
+    moves = game_moves(SCHOLARS_MATE)
+    analysed = []
+
+    async def recording_analyse(board, limit):
+        result = await fake_analyse(board, limit)
+        analysed.append(board.fen())
+        return result
+
+    positions = [chess.Board()]
+    for move in moves:
+        positions.append(positions[-1].copy())
+        positions[-1].push(move)
+
+    async for review in review_game(
+        recording_analyse, chess.Board(), moves, chess.engine.Limit(depth=5), 4
+    ):
+        if "ply" in review:
+            before = positions[review["ply"] - 1]
+            assert before.fen() in analysed
+            after = positions[review["ply"]]
+            assert after.is_game_over() or after.fen() in analysed
+
+
+async def test_analysis_endpoint_streams_ndjson(fake_engine, monkeypatch):
+    monkeypatch.setenv("FAKE_DELAY", "0.05")
+    pool = EnginePool(fake_engine, size=2, max_time_ms=1000)
+    await pool.start()
+    monkeypatch.setattr(chess_api, "engine_pool", pool)
+    monkeypatch.setattr(chess_api, "analysis_cache", AnalysisCache(pool.analyse))
+    try:
+        response = await chess_api.analyse_game(
+            GameAnalysisRequest(pgn=SCHOLARS_MATE, depth=5), db=None
+        )
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    finally:
+        await pool.close()
+
+    assert response.media_type == "application/x-ndjson"
+    lines = [orjson.loads(line) for line in body.splitlines()]
+    assert sorted(line["ply"] for line in lines[:-1]) == list(range(1, 8))
+    assert lines[-1]["done"] is True
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.models import user  # noqa: F401, games refer to users
+from app.models.game import GameMove
+from app.services import journal as journal_module
+from app.services.journal import MoveJournal
+from app.utils.chess import decode_move
+
+pytestmark = pytest.mark.anyio
+
+GAME_MOVES = GameMove.__table__
+
+
+@pytest.fixture
+async def engine(monkeypatch):
+    # One shared connection, every session sees the same in-memory database
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(GAME_MOVES.create)
+    monkeypatch.setattr(
+        journal_module, "AsyncSessionLocal", async_sessionmaker(bind=engine)
+    )
+    yield engine
+    await engine.dispose()
+
+
+async def stored_moves(engine):
+    async with engine.connect() as connection:
+        rows = await connection.execute(
+            select(GAME_MOVES.c.ply, GAME_MOVES.c.move).order_by(GAME_MOVES.c.ply)
+        )
+        return [(ply, decode_move(code)) for ply, code in rows]
+
+
+async def test_duplicate_ply_is_dropped_and_the_rest_written(engine):
+    journal = MoveJournal()
+    await journal.append(1, 2, "e7e5", 2.0)
+    await journal.flush()
+
+    for ply, move in enumerate(["e2e4", "e7e6", "g1f3", "b8c6"], start=1):
+        await journal.append(1, ply, move, float(ply))
+    await journal.flush()
+
+    assert await stored_moves(engine) == [
+        (1, "e2e4"),
+        (2, "e7e5"),
+        (3, "g1f3"),
+        (4, "b8c6"),
+    ]
+    stats = journal.stats()
+    assert stats["rejectedRows"] == 1
+    assert stats["insertedTotal"] == 4
+    assert stats["buffered"] == 0
+
+
+async def test_backlog_is_trimmed_while_the_database_is_down(engine):
+    journal = MoveJournal(max_backlog=3)
+    async with engine.begin() as connection:
+        await connection.run_sync(GAME_MOVES.drop)
+
+    moves = ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5"]
+    for ply, move in enumerate(moves, start=1):
+        await journal.append(1, ply, move, float(ply))
+        with pytest.raises(OperationalError):
+            await journal.flush()
+
+    # Only the newest moves are kept, in order
+    assert [row["ply"] for row in journal.buffer] == [3, 4, 5]
+    assert journal.stats()["droppedRows"] == 2
+    assert journal.stats()["failedFlushes"] == 5
+
+    async with engine.begin() as connection:
+        await connection.run_sync(GAME_MOVES.create)
+    await journal.flush()
+
+    assert await stored_moves(engine) == [(3, "g1f3"), (4, "b8c6"), (5, "f1b5")]
+    assert journal.stats()["buffered"] == 0
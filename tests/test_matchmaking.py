@@ -0,0 +1,139 @@
+from app.services.matchmaking import MatchmakingQueues, RatingMatchmaker
+
+
+def test_queues_are_fifo_per_game_type():
+    queues = MatchmakingQueues()
+    for room_id, game_type in [("a", "blitz"), ("b", "rapid"), ("c", "blitz")]:
+        queues.push(game_type, room_id)
+
+    assert queues.peek("blitz") == "a"
+    assert queues.peek("rapid") == "b"
+    assert queues.peek("bullet") is None
+
+    queues.discard("a")
+    assert queues.peek("blitz") == "c"
+
+
+def test_pushing_again_moves_a_room_to_the_back():
+    queues = MatchmakingQueues()
+    queues.push("blitz", "a")
+    queues.push("blitz", "b")
+
+    queues.push("blitz", "a")
+
+    assert queues.peek("blitz") == "b"
+    assert list(queues.queues["blitz"]) == ["b", "a"]
+
+
+def test_changing_game_type_leaves_the_old_queue():
+    queues = MatchmakingQueues()
+    queues.push("blitz", "a")
+
+    queues.push("rapid", "a")
+
+    assert queues.peek("blitz") is None
+    assert queues.depths() == {"rapid": 1}
+
+
+def test_discard_keeps_index_and_queues_consistent():
+    queues = MatchmakingQueues()
+    for room_id in "abc":
+        queues.push("blitz", room_id)
+    queues.push(None, "untyped")
+
+    queues.discard("b")
+    queues.discard("b")
+    queues.discard("unknown")
+
+    assert "b" not in queues
+    assert "untyped" not in queues
+    assert queues.depths() == {"blitz": 2}
+
+    queues.discard("a")
+    queues.discard("c")
+    assert queues.queues == {}
+    assert queues.room_types == {}
+    assert queues.peek("blitz") is None
+
+
+def matchmaker() -> RatingMatchmaker:
+    return RatingMatchmaker(base_window=50, widen_per_second=25, max_window=600)
+
+
+def test_window_widens_until_ratings_are_close_enough():
+    pool = matchmaker()
+    pool.add("blitz", "a", 1500, now=0)
+    pool.add("blitz", "b", 1600, now=0)
+
+    assert pool.collect_pairs(now=0) == []
+    assert pool.collect_pairs(now=1.9) == []
+    assert pool.collect_pairs(now=2) == [("a", "b")]
+    assert "a" not in pool and "b" not in pool
+    assert pool.depths() == {}
+
+
+def test_newcomer_window_limits_the_pair():
+    pool = matchmaker()
+    pool.add("blitz", "a", 1500, now=0)
+    pool.add("blitz", "b", 1600, now=4)
+
+    # a accepts 200 points by now, b still only 50
+    assert pool.collect_pairs(now=4) == []
+    assert pool.collect_pairs(now=6) == [("a", "b")]
+
+
+def test_window_stops_at_max():
+    pool = matchmaker()
+    pool.add("blitz", "a", 1500, now=0)
+    pool.add("blitz", "b", 2200, now=0)
+
+    assert pool.collect_pairs(now=3600) == []
+    assert pool.depths() == {"blitz": 2}
+
+
+def test_longer_waiter_hosts():
+    pool = matchmaker()
+    pool.add("blitz", "high", 1520, now=0)
+    pool.add("blitz", "low", 1500, now=5)
+
+    assert pool.collect_pairs(now=5) == [("high", "low")]
+    assert sorted(pool.wait_times) == [0, 5]
+
+
+def test_nearest_ratings_pair_within_a_game_type():
+    pool = matchmaker()
+    for room_id, game_type, rating in [
+        ("a", "blitz", 1500),
+        ("b", "blitz", 1605),
+        ("c", "blitz", 1510),
+        ("d", "blitz", 1600),
+        ("e", "rapid", 1505),
+    ]:
+        pool.add(game_type, room_id, rating, now=0)
+
+    assert sorted(pool.collect_pairs(now=0)) == [("a", "c"), ("d", "b")]
+    assert pool.depths() == {"rapid": 1}
+    assert pool.matched_total == 4
+
+
+def test_discarded_seeker_is_not_paired():
+    pool = matchmaker()
+    pool.add("blitz", "a", 1500, now=0)
+    pool.add("blitz", "b", 1500, now=0)
+    pool.add("blitz", "c", 1500, now=0)
+
+    pool.discard("b")
+    pool.discard("b")
+
+    assert pool.collect_pairs(now=0) == [("a", "c")]
+    assert pool.seekers == {} and pool.pools == {}
+
+
+def test_readding_moves_a_seeker():
+    pool = matchmaker()
+    pool.add("blitz", "a", 1500, now=0)
+    pool.add("blitz", "b", 1900, now=0)
+
+    pool.add("blitz", "a", 1890, now=10)
+
+    assert pool.collect_pairs(now=10) == [("b", "a")]
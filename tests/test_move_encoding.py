@@ -0,0 +1,73 @@
+import chess
+import pytest
+
+from app.models.room import ActiveBoard
+from app.utils.chess import (
+    TerminationTracker,
+    decode_move,
+    encode_move,
+    move_code,
+    play_move,
+)
+
+# Both kings can still castle to either side
+CAN_CASTLE = "r3k2r/pppq1ppp/2npbn2/2b1p3/2B1P3/2NPBN2/PPPQ1PPP/R3K2R w KQkq - 6 8"
+
+
+@pytest.mark.parametrize(
+    "uci",
+    ["e2e4", "e1g1", "e1c1", "e8g8", "e8c8", "a7a8q", "a7b8r", "h2h1b", "b2a1n"],
+)
+def test_moves_round_trip(uci):
+    assert decode_move(encode_move(uci)) == uci
+    assert encode_move(uci) == move_code(chess.Move.from_uci(uci))
+
+
+def test_promotion_pieces_get_distinct_codes():
+    codes = {encode_move(f"a7a8{piece}") for piece in "qrbn"}
+
+    assert len(codes) == 4
+    assert encode_move("a7a8") not in codes
+
+
+@pytest.mark.parametrize(
+    "uci,played",
+    [("e1g1", "e1g1"), ("e1h1", "e1g1"), ("e1c1", "e1c1"), ("e1a1", "e1c1")],
+)
+def test_castling_as_king_takes_rook_is_played_as_king_move(uci, played):
+    board = chess.Board(CAN_CASTLE)
+    tracker = TerminationTracker(board)
+
+    result = play_move(board, tracker, chess.Move.from_uci(uci), 0)
+
+    assert result is not None
+    assert result[2] == played
+    assert board.peek() == chess.Move.from_uci(played)
+    assert not board.has_castling_rights(chess.WHITE)
+
+
+def test_king_takes_rook_without_castling_rights_is_illegal():
+    board = chess.Board(CAN_CASTLE.replace("KQkq", "kq"))
+    tracker = TerminationTracker(board)
+
+    assert play_move(board, tracker, chess.Move.from_uci("e1h1"), 0) is None
+    assert play_move(board, tracker, chess.Move.from_uci("e1g1"), 0) is None
+
+
+def test_recorded_castling_and_promotion_replay():
+    active_board = ActiveBoard.create("r3k3/6P1/8/8/8/8/8/R3K2R w KQq - 0 1")
+    for uci in ("e1h1", "e8a8", "g7g8n"):
+        active_board.load_board()
+        ply = len(active_board.moves)
+        _, _, played = play_move(
+            active_board.board, active_board.termination, chess.Move.from_uci(uci), ply
+        )
+        active_board.moves.append(played, active_board.start_time + ply)
+    fen = active_board.board.fen()
+
+    # As a board worker or recovery rebuilds it from the stored codes
+    active_board.unload_board()
+    active_board.load_board()
+
+    assert [record.move for record in active_board.moves] == ["e1g1", "e8c8", "g7g8n"]
+    assert active_board.board.fen() == fen
@@ -0,0 +1,72 @@
+import orjson
+import pytest
+
+from app.api import room as room_api
+from app.api.room import INVALID_MESSAGE, ChessRoomManager
+from app.services.encoding import EncodedWebSocket
+
+pytestmark = pytest.mark.anyio
+
+GUEST = "guest.1"
+
+
+class FakeSocket:
+    """Hands out queued client frames, then raises ``error``."""
+
+    def __init__(self, *messages: dict, error: Exception = RuntimeError("lost")):
+        self.incoming = [
+            {"type": "websocket.receive", "text": orjson.dumps(message).decode()}
+            for message in messages
+        ]
+        self.error = error
+        self.sent = []
+        self.query_params = {}
+        self.headers = {}
+        self.scope = {}
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def receive(self):
+        if not self.incoming:
+            raise self.error
+        return self.incoming.pop(0)
+
+    async def send_text(self, text: str):
+        self.sent.append(orjson.loads(text))
+
+    async def send_bytes(self, data: bytes):
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"room_id": "room"},
+        {"move": 5, "room_id": "room"},
+        {"move": ["e2e4"], "room_id": "room"},
+        {"move": "e2e4", "room_id": {"id": 1}},
+    ],
+)
+async def test_malformed_moves_get_invalid_message(message):
+    manager = ChessRoomManager()
+    websocket = FakeSocket()
+
+    await manager.handle_message(EncodedWebSocket(websocket), GUEST, message)
+
+    assert websocket.sent == [INVALID_MESSAGE.message]
+
+
+async def test_connection_is_released_when_the_receive_loop_fails(monkeypatch):
+    manager = ChessRoomManager()
+    monkeypatch.setattr(room_api, "manager", manager)
+    websocket = FakeSocket({"move": 5, "room_id": ["room"]})
+
+    with pytest.raises(RuntimeError):
+        await room_api.websocket_endpoint(websocket, op="none", user_id=GUEST)
+
+    assert websocket.sent == [INVALID_MESSAGE.message]
+    assert GUEST not in manager.user_connections
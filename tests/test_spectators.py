@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from app.services.spectators import SpectatorShard
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSocket:
+    """Records frames, a stalled socket never finishes a send."""
+
+    def __init__(self, stalled: bool = False):
+        self.stalled = stalled
+        self.frames = []
+        self.close_code = None
+
+    async def send_text(self, frame: str):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.frames.append(frame)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+async def test_stalled_spectator_is_dropped_and_closed():
+    shard = SpectatorShard(backlog=8, send_timeout=0.1)
+    healthy, stalled = FakeSocket(), FakeSocket(stalled=True)
+    shard.subscribers.update({healthy, stalled})
+    try:
+        shard.publish("first")
+        await asyncio.sleep(0.05)
+        # The stalled socket does not hold up the others
+        assert healthy.frames == ["first"]
+
+        await asyncio.sleep(0.1)
+        assert shard.subscribers == {healthy}
+        assert shard.dropped == 1
+        assert stalled.close_code == 1013
+        assert not shard.closing
+
+        shard.publish("second")
+        await asyncio.sleep(0.05)
+        assert healthy.frames == ["first", "second"]
+        assert stalled.frames == []
+    finally:
+        shard.close()
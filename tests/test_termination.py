@@ -0,0 +1,114 @@
+import chess
+import chess.polyglot
+import pytest
+
+from app.utils.chess import TerminationTracker, move_code, play_move
+
+OUTCOMES = {
+    "Checkmate! Game Over.": {chess.Termination.CHECKMATE},
+    "Stalemate! The game is a draw.": {chess.Termination.STALEMATE},
+    "Draw! Insufficient material.": {chess.Termination.INSUFFICIENT_MATERIAL},
+    "Draw! 50-move rule.": {
+        chess.Termination.FIFTY_MOVES,
+        chess.Termination.SEVENTYFIVE_MOVES,
+    },
+    "Draw! Threefold repetition.": {
+        chess.Termination.THREEFOLD_REPETITION,
+        chess.Termination.FIVEFOLD_REPETITION,
+    },
+}
+
+GAMES = {
+    # Back to the start position three times, claimable one ply early
+    "repetition": (
+        chess.STARTING_FEN,
+        "g1f3 g8f6 f3g1 f6g8 g1f3 g8f6 f3g1 f6g8 g1f3",
+    ),
+    # The first d5 position allows exd6 e.p., its repeats do not
+    "en passant repetition": (
+        chess.STARTING_FEN,
+        "e2e4 g8f6 e4e5 d7d5 g1f3 b8c6 f3g1 c6b8 g1f3 b8c6 f3g1 c6b8 g1f3",
+    ),
+    "en passant capture": (
+        chess.STARTING_FEN,
+        "e2e4 a7a6 e4e5 d7d5 e5d6 c7d6 d2d4 b7b5 c2c4 b5c4",
+    ),
+    # The rook trip loses the castling right, positions before it never repeat
+    "castling rights": (
+        chess.STARTING_FEN,
+        "e2e4 e7e5 g1f3 b8c6 h1g1 c6b8 g1h1 b8c6 h1g1 c6b8 g1h1 b8c6 "
+        "f1c4 g8f6 e1f1 f8c5 f1e1 e8g8",
+    ),
+    "castling": (
+        chess.STARTING_FEN,
+        "e2e4 e7e5 g1f3 b8c6 f1c4 g8f6 e1g1 f8c5 d2d4 e5d4 b1c3 e8g8",
+    ),
+    "fifty moves": (
+        "8/8/4k3/8/8/4K3/8/R7 w - - 94 80",
+        "a1a2 e6d6 a2a1 d6e6 a1a2 e6d6 a2a3 d6e6 a3a4",
+    ),
+    "promotion": (
+        "1n6/P7/7k/8/8/8/6p1/K7 w - - 0 1",
+        "a7b8q g2g1n b8a7 g1f3 a7a8 h6h7 a8b8 f3d2",
+    ),
+    "underpromotion mate": (
+        "7k/5P1p/8/8/8/8/8/K5R1 w - - 0 1",
+        "f7f8r",
+    ),
+    "fools mate": (chess.STARTING_FEN, "f2f3 e7e5 g2g4 d8h4"),
+    "insufficient material": ("8/8/4k3/8/8/3nK3/8/7Q w - - 0 1", "e3d3"),
+}
+
+
+def assert_matches(board: chess.Board, tracker: TerminationTracker, reason):
+    legal_moves = list(board.legal_moves)
+    assert tracker.zobrist_hash == chess.polyglot.zobrist_hash(board)
+    assert tracker.legal_moves == {move_code(move) for move in legal_moves}
+    assert tracker.can_claim_fifty_moves(
+        board, legal_moves
+    ) == board.can_claim_fifty_moves()
+    assert tracker.can_claim_threefold_repetition(
+        board, legal_moves
+    ) == board.can_claim_threefold_repetition()
+
+    outcome = board.outcome(claim_draw=True)
+    if reason is None:
+        assert outcome is None
+    else:
+        assert outcome.termination in OUTCOMES[reason]
+
+
+@pytest.mark.parametrize("fen,moves", GAMES.values(), ids=GAMES.keys())
+def test_tracker_matches_python_chess_every_ply(fen, moves):
+    board = chess.Board(fen)
+    tracker = TerminationTracker(board)
+    assert_matches(board, tracker, None)
+
+    for ply, uci in enumerate(moves.split()):
+        result = play_move(board, tracker, chess.Move.from_uci(uci), ply)
+        assert result is not None, f"{uci} rejected at ply {ply}"
+        reason, fen_after, played = result
+        assert fen_after == board.fen()
+        assert played == uci
+        assert_matches(board, tracker, reason)
+
+
+def test_rebuilt_tracker_counts_earlier_repetitions():
+    board = chess.Board()
+    for uci in "g1f3 g8f6 f3g1 f6g8 g1f3 g8f6 f3g1".split():
+        board.push_uci(uci)
+
+    # A board rebuilt from its moves, as a board worker or recovery makes
+    tracker = TerminationTracker(board)
+
+    # Black can repeat the start position a third time with Ng8
+    assert_matches(board, tracker, "Draw! Threefold repetition.")
+
+
+def test_illegal_or_out_of_turn_moves_are_rejected():
+    board = chess.Board()
+    tracker = TerminationTracker(board)
+
+    assert play_move(board, tracker, chess.Move.from_uci("e2e5"), 0) is None
+    assert play_move(board, tracker, chess.Move.from_uci("e2e4"), 1) is None
+    assert board.move_stack == []
@@ -0,0 +1,101 @@
+import jwt
+import pytest
+
+from app.schemas.auth import TokenData
+from app.services import auth, token_cache
+from app.services.token_cache import TokenCache
+
+NOW = 1_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Time as seen by the cache, moved by setting ``clock.now``."""
+
+    class Clock:
+        now = NOW
+
+    monkeypatch.setattr(token_cache.time, "time", lambda: Clock.now)
+    return Clock
+
+
+def user(user_id: int) -> TokenData:
+    return TokenData(id=user_id, username=f"user{user_id}")
+
+
+def test_hit_until_expiry(clock):
+    cache = TokenCache()
+    cache.put("token", user(1), NOW + 60)
+
+    clock.now = NOW + 59
+    assert cache.get("token") == user(1)
+
+    clock.now = NOW + 60
+    assert cache.get("token") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_entries_are_evicted_on_put(clock):
+    cache = TokenCache()
+    cache.put("short", user(1), NOW + 10)
+    cache.put("long", user(2), NOW + 100)
+
+    clock.now = NOW + 50
+    cache.put("new", user(3), NOW + 100)
+
+    assert len(cache.entries) == 2
+    assert cache.get("short") is None
+    assert cache.get("long") == user(2)
+
+
+def test_already_expired_tokens_are_not_cached(clock):
+    cache = TokenCache()
+    cache.put("token", user(1), NOW)
+
+    assert not cache.entries
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = TokenCache(max_size=2)
+    cache.put("a", user(1), NOW + 60)
+    cache.put("b", user(2), NOW + 60)
+    cache.get("a")
+
+    cache.put("c", user(3), NOW + 60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == user(1)
+    assert cache.get("c") == user(3)
+
+
+def test_expiry_heap_stays_bounded(clock):
+    cache = TokenCache(max_size=2)
+    for index in range(10):
+        cache.put(f"token{index}", user(index), NOW + 60)
+
+    assert len(cache.entries) == 2
+    assert len(cache.expiries) <= 2 * cache.max_size + 1
+
+
+def test_token_without_exp_is_verified_but_not_cached(monkeypatch):
+    cache = TokenCache()
+    monkeypatch.setattr(auth, "token_cache", cache)
+    token = jwt.encode(
+        {"username": "user1", "id": 1}, auth.SECRET_KEY, algorithm=auth.ALGORITHM
+    )
+
+    assert auth.verify_access_token(token) == user(1)
+    assert not cache.entries
+
+
+def test_verified_token_is_cached_until_its_exp(monkeypatch):
+    cache = TokenCache()
+    monkeypatch.setattr(auth, "token_cache", cache)
+    token = auth.create_access_token({"username": "user1", "id": 1})
+
+    assert auth.verify_access_token(token) == user(1)
+    assert auth.verify_access_token(token) == user(1)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert next(iter(cache.entries.values()))[1] == jwt.decode(
+        token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM]
+    )["exp"]
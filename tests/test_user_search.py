@@ -0,0 +1,140 @@
+import base64
+
+from fastapi import HTTPException
+import orjson
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud
+from app.api import user as user_api
+from app.database import Base
+from app.models.user import User
+from app.schemas.auth import TokenData
+from app.schemas.user import UserCreate
+from app.services.username_index import username_index
+
+# Prefix matches of "ann" come first, then names that only contain it.
+# "anne" twice, the tie on the name is broken by id.
+PREFIX_NAMES = ["Anna", "annabel", "ANNE", "anne", "Annika"]
+SUBSTRING_NAMES = ["hannah", "JoAnna", "marianne", "suzanne"]
+OTHER_NAMES = ["ana", "bob", "a_nn"]
+CURRENT_USER = "annie"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    # The index is a process wide singleton, fill it from this database
+    monkeypatch.setattr(username_index, "entries", [])
+    monkeypatch.setattr(username_index, "loaded", False)
+
+    with sessionmaker(bind=engine)() as session:
+        yield session
+    engine.dispose()
+
+
+def add_users(db, names):
+    users = {}
+    for index, name in enumerate(names):
+        user = UserCreate(
+            username=name, email=f"user{index}@example.com", password="secret"
+        )
+        users[name] = crud.create_user(db, user, hashed_password="hash")
+    return users
+
+
+def search_all(db, current_user: TokenData, query: str, limit: int):
+    pages, cursor = [], None
+    while True:
+        page = user_api.search(
+            query, limit=limit, cursor=cursor, db=db, current_user=current_user
+        )
+        pages.append([user.username for user in page["users"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+        assert len(pages) < 20, "pagination does not end"
+
+
+def expected_order(users):
+    def key(name):
+        return (name.lower(), users[name].id)
+
+    return [
+        name
+        for names in (PREFIX_NAMES, SUBSTRING_NAMES)
+        for name in sorted(names, key=key)
+    ]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_pages_cover_every_match_once(db, limit):
+    names = [CURRENT_USER] + SUBSTRING_NAMES + OTHER_NAMES + PREFIX_NAMES
+    users = add_users(db, names)
+    current_user = TokenData(id=users[CURRENT_USER].id, username=CURRENT_USER)
+
+    pages = search_all(db, current_user, "ann", limit)
+
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+    found = [name for page in pages for name in page]
+    assert found == expected_order(users)
+
+
+def test_short_queries_only_match_prefixes(db):
+    users = add_users(db, [CURRENT_USER] + SUBSTRING_NAMES + PREFIX_NAMES)
+    current_user = TokenData(id=users[CURRENT_USER].id, username=CURRENT_USER)
+
+    pages = search_all(db, current_user, "An", 4)
+
+    found = [name for page in pages for name in page]
+    assert found == expected_order(users)[: len(PREFIX_NAMES)]
+
+
+def test_like_wildcards_are_matched_literally(db):
+    users = add_users(db, [CURRENT_USER] + OTHER_NAMES + SUBSTRING_NAMES)
+    current_user = TokenData(id=users[CURRENT_USER].id, username=CURRENT_USER)
+
+    # Unescaped, "a_n" would also match every "ann" name as a substring
+    assert search_all(db, current_user, "a_n", 5) == [["a_nn"]]
+
+
+def cursor_of(value) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(value)).decode()
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64!",
+        base64.urlsafe_b64encode(b"not json").decode(),
+        cursor_of(None),
+        cursor_of([0, "anna"]),
+        cursor_of([0, "anna", 1, 2]),
+        cursor_of([0, "anna", "one"]),
+        cursor_of([2, "anna", 1]),
+        cursor_of(["0", "anna", 1]),
+        cursor_of([True, "anna", 1]),
+        cursor_of([0, None, 1]),
+        cursor_of({"phase": 0, "name": "anna", "id": 1}),
+    ],
+)
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as raised:
+        user_api.decode_search_cursor(cursor)
+
+    assert raised.value.status_code == 400
+
+
+def test_cursor_round_trips():
+    cursor = (crud.SEARCH_SUBSTRING, "joanna", 7)
+
+    encoded = user_api.encode_search_cursor(cursor)
+    assert user_api.decode_search_cursor(encoded) == cursor